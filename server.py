@@ -1,10 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from src.core.session_manager import SessionConflict
 from src.routes import api, spotify, main
 
 app = FastAPI()
 
+@app.exception_handler(SessionConflict)
+async def session_conflict(request: Request, exc: SessionConflict):
+  """Another request of the same session changed the same data first; the client should reload and retry."""
+  return JSONResponse(status_code=409, content={"detail": str(exc), "field": exc.field})
+
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
 
 app.include_router(main.router)
@@ -26,6 +26,14 @@ class SpotifyConfig(BaseSettings):
   scope: str
   max_album_batch: int = 20 # limit fixed by spotify web api
   max_artist_batch: int = 50 # limit fixed by spotify web api
+  max_track_batch: int = 50 # limit fixed by spotify web api
+  max_concurrency: int = 8 # parallel requests per event loop
+  rate_limit: float = 10 # requests per second, shared by all workers
+  rate_burst: int = 20
+  background_reserve: float = 0.5 # share of the burst only interactive requests may use
+  max_retries: int = 4
+  retry_backoff: float = 0.5 # seconds, doubled per attempt
+  max_retry_wait: float = 30
 
 
 class SessionConfig(BaseSettings):
@@ -42,11 +50,40 @@ class CacheConfig(BaseSettings):
   album_tracks: int = 86400
   artist_pool: int = 86400
   scrape_time_delta_days: int = 30
+  local_max_items: int = 20000 # in-process cache in front of redis
+  local_ttl: int = 600
+  lock_ttl_ms: int = 10000 # single-flight lock per missing key, held SpotifyConfig.max_retry_wait longer
+  lock_poll_ms: int = 50
+  codec: str = "json" # json | columnar | msgpack, see CacheCodec. json decodes fastest, msgpack halves bytes per key
+  session_tracks: int = 604800 # tracks referenced by sessions, resolved by id on load
+  layout: int = 604800 # 1 week
+  layout_max_items: int = 10000 # LRU bound on cached graph layouts
+
+
+class PoolConfig(BaseSettings):
+  model_config = SettingsConfigDict(env_prefix='pool_')
+  refresh_after: int = 64800 # pools older than this are served while src/scripts/pool_refresher.py rebuilds them
+  warm_genres: int = 200 # most requested genres kept built
+  recent_window: int = 86400 # genres requested within this window are kept built as well
+  stale_margin_days: int = 3 # artists are refreshed this long before scrape_time_delta_days runs out
+  interval: int = 60 # seconds between refresher passes
+  heartbeat_ttl: int = 180 # requests build missing pools from the DB only while the refresher is alive
+
+
+class JobConfig(BaseSettings):
+  model_config = SettingsConfigDict(env_prefix='job_')
+  workers: int = 2 # worker processes started by src/scripts/job_worker.py
+  concurrency: int = 4 # jobs run at once per worker process
+  ttl: int = 3600 # job status kept for polling
+  session_lock_ms: int = 60000 # per-session lock, renewed while a job runs
+  poll_interval: float = 0.5 # seconds between cancellation checks and retries of locked sessions
+  worker_ttl: int = 30 # seconds without heartbeat after which a worker's claimed jobs are requeued
 
 
 class Settings(BaseSettings):
   model_config = SettingsConfigDict(env_prefix='settings_')
   decimal_precision: int = 6
+  layout_engine: str = "neato" # neato | stress | force, see LayoutEngine
 
 
 DBConfig = DBConfig()
@@ -54,4 +91,6 @@ RedisConfig = RedisConfig()
 SpotifyConfig = SpotifyConfig()
 SessionConfig = SessionConfig()
 CacheConfig = CacheConfig()
+JobConfig = JobConfig()
+PoolConfig = PoolConfig()
 Settings = Settings()
\ No newline at end of file
@@ -0,0 +1,154 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Tagged payloads start with MAGIC followed by one byte naming the codec.
+# Untagged payloads are the original JSON dumps ("[...]" or "{...}").
+MAGIC = b"\x00RR"
+
+SCALAR, INTERNED, NESTED = "scalar", "interned", "nested"
+
+
+@lru_cache(maxsize=None)
+def field_layout(cls: Type[BaseModel]) -> Tuple[Tuple[str, str, type], ...]:
+  """How each field of a model is stored: as is, as ids into a string table, or as nested tuples."""
+  layout = []
+  for name, field in cls.model_fields.items():
+    args = get_args(field.annotation)
+    inner = args[0] if get_origin(field.annotation) in (list, List) and args else None
+    if inner is str:
+      layout.append((name, INTERNED, str))
+    elif isinstance(inner, type) and issubclass(inner, BaseModel):
+      layout.append((name, NESTED, inner))
+    else:
+      layout.append((name, SCALAR, None))
+  return tuple(layout)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(cls: Type[BaseModel]) -> TypeAdapter:
+  return TypeAdapter(List[cls])
+
+
+class CacheCodec(ABC):
+  """Encodes lists of Spotify models for Redis."""
+  name: str
+  tag: bytes
+
+  @abstractmethod
+  def encode(self, items: List[BaseModel]) -> bytes:
+    pass
+
+  @abstractmethod
+  def decode(self, cls: Type[BaseModel], data: bytes) -> List[BaseModel]:
+    pass
+
+
+class JsonCodec(CacheCodec):
+  """The original format: a JSON array of full model dumps."""
+  name = "json"
+  tag = b""
+
+  def encode(self, items: List[BaseModel]) -> bytes:
+    return json.dumps([item.model_dump() for item in items]).encode()
+
+  def decode(self, cls: Type[BaseModel], data: bytes) -> List[BaseModel]:
+    if data.lstrip().startswith(b"{"):
+      return [cls.model_validate_json(data)]
+    return list_adapter(cls).validate_json(data)
+
+
+class ColumnarCodec(CacheCodec):
+  """
+  Column-packed layout: one list per field instead of one dict per item.
+  String lists (artist ids, genres) are interned into a shared table, nested
+  models (images) are stored as tuples. Rows are rebuilt as dicts and
+  validated in a single pydantic-core call.
+  """
+  name = "columnar"
+  tag = MAGIC + b"\x01"
+
+  def dumps(self, doc: dict) -> bytes:
+    return json.dumps(doc, separators=(",", ":")).encode()
+
+  def loads(self, payload: bytes) -> dict:
+    return json.loads(payload)
+
+  def pack(self, items: List[BaseModel]) -> dict:
+    strings: Dict[str, int] = {}
+    columns = {}
+    for name, kind, inner in field_layout(type(items[0])) if items else ():
+      values = [getattr(item, name) for item in items]
+      if kind == INTERNED:
+        values = [[strings.setdefault(v, len(strings)) for v in value] for value in values]
+      elif kind == NESTED:
+        fields = list(inner.model_fields)
+        values = [[[getattr(v, f) for f in fields] for v in value] for value in values]
+      columns[name] = values
+    return {"n": len(items), "s": list(strings), "c": columns}
+
+  def unpack(self, cls: Type[BaseModel], doc: dict) -> List[BaseModel]:
+    strings = doc["s"]
+    columns = doc["c"]
+    rows = [{} for _ in range(doc["n"])]
+    for name, kind, inner in field_layout(cls):
+      if name not in columns:
+        continue
+      values = columns[name]
+      if kind == INTERNED:
+        values = [[strings[i] for i in value] for value in values]
+      elif kind == NESTED:
+        fields = list(inner.model_fields)
+        values = [[dict(zip(fields, v)) for v in value] for value in values]
+      for row, value in zip(rows, values):
+        row[name] = value
+    return list_adapter(cls).validate_python(rows)
+
+  def encode(self, items: List[BaseModel]) -> bytes:
+    return self.tag + self.dumps(self.pack(items))
+
+  def decode(self, cls: Type[BaseModel], data: bytes) -> List[BaseModel]:
+    return self.unpack(cls, self.loads(data[len(self.tag):]))
+
+
+class MsgpackCodec(ColumnarCodec):
+  """Columnar layout serialized with msgpack instead of JSON."""
+  name = "msgpack"
+  tag = MAGIC + b"\x02"
+
+  def dumps(self, doc: dict) -> bytes:
+    return msgpack.packb(doc, use_bin_type=True)
+
+  def loads(self, payload: bytes) -> dict:
+    return msgpack.unpackb(payload, raw=False)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), ColumnarCodec(), MsgpackCodec())}
+CODECS_BY_TAG = {codec.tag: codec for codec in CODECS.values() if codec.tag}
+
+
+def get_codec(name: str) -> CacheCodec:
+  if name == MsgpackCodec.name and msgpack is None:
+    logger.warning("msgpack is not installed, falling back to the columnar JSON codec.")
+    name = ColumnarCodec.name
+  return CODECS[name]
+
+
+def decode(cls: Type[BaseModel], data: Union[str, bytes]) -> List[BaseModel]:
+  """Decode any supported payload, whichever codec wrote it."""
+  if isinstance(data, str):
+    data = data.encode()
+  if data.startswith(MAGIC):
+    return CODECS_BY_TAG[data[:len(MAGIC) + 1]].decode(cls, data)
+  return CODECS[JsonCodec.name].decode(cls, data)
@@ -0,0 +1,247 @@
+import numpy as np
+import networkx as nx
+from scipy.sparse import csgraph, csr_matrix
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.database.models import RelationshipTypeEnum
+
+EDGE_TYPES = [relationship.value for relationship in RelationshipTypeEnum]
+EDGE_TYPE_CODES = {edge_type: code for code, edge_type in enumerate(EDGE_TYPES)}
+
+NODE_COLUMNS = ("bouncy_value", "organic_value")
+
+
+def gather(offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+  """Positions of all entries in the given CSR rows, and the row each one belongs to."""
+  starts = offsets[rows]
+  counts = offsets[rows + 1] - starts
+  total = int(counts.sum())
+  if not total:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=rows.dtype)
+  positions = np.arange(total) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+  return positions, np.repeat(rows, counts)
+
+
+class GenreCSR:
+  """
+  Compressed sparse row adjacency of a genre graph.
+
+  Nodes are addressed by their position in the sorted node_ids array. Out
+  edges of node i are targets[offsets[i]:offsets[i + 1]], with their edge
+  type codes and weights at the same positions; in edges are stored the
+  same way. Node attributes are float columns, NaN where missing.
+  """
+
+  def __init__(self, node_ids: np.ndarray, present: np.ndarray,
+               offsets: np.ndarray, targets: np.ndarray, edge_types: np.ndarray, weights: np.ndarray,
+               in_offsets: np.ndarray, sources: np.ndarray, in_edge_types: np.ndarray,
+               columns: Dict[str, np.ndarray]):
+    self.node_ids = node_ids
+    self.present = present
+    self.offsets = offsets
+    self.targets = targets
+    self.edge_types = edge_types
+    self.weights = weights
+    self.in_offsets = in_offsets
+    self.sources = sources
+    self.in_edge_types = in_edge_types
+    self.columns = columns
+    self.positions = {int(node): i for i, node in enumerate(node_ids)}
+    self._matrices: Dict[Tuple[Optional[str], bool], csr_matrix] = {}
+
+  @classmethod
+  def build(cls, G: nx.DiGraph, node_ids: Optional[np.ndarray] = None) -> "GenreCSR":
+    """CSR of G. Pass the node_ids of a parent graph to share its node positions."""
+    if node_ids is None:
+      node_ids = np.array(sorted(G.nodes), dtype=np.int64)
+    positions = {int(node): i for i, node in enumerate(node_ids)}
+    n = len(node_ids)
+
+    m = G.number_of_edges()
+    src = np.empty(m, dtype=np.int32)
+    dst = np.empty(m, dtype=np.int32)
+    types = np.empty(m, dtype=np.int8)
+    weights = np.empty(m, dtype=np.float32)
+    for i, (u, v, data) in enumerate(G.edges(data=True)):
+      src[i] = positions[u]
+      dst[i] = positions[v]
+      types[i] = EDGE_TYPE_CODES.get(data.get("type"), -1)
+      weights[i] = data.get("weight") or 0
+
+    out_order = np.lexsort((dst, src))
+    offsets = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+
+    in_order = np.lexsort((src, dst))
+    in_offsets = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(dst, minlength=n), out=in_offsets[1:])
+
+    present = np.zeros(n, dtype=bool)
+    present[[positions[node] for node in G.nodes]] = True
+
+    columns = {}
+    for name in NODE_COLUMNS:
+      values = [G.nodes[node].get(name) if present[i] else None for i, node in enumerate(node_ids.tolist())]
+      columns[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+
+    return cls(
+      node_ids, present,
+      offsets, dst[out_order], types[out_order], weights[out_order],
+      in_offsets, src[in_order], types[in_order],
+      columns
+    )
+
+  @property
+  def nbytes(self) -> int:
+    arrays = [self.node_ids, self.present, self.offsets, self.targets, self.edge_types, self.weights,
+              self.in_offsets, self.sources, self.in_edge_types, *self.columns.values()]
+    return sum(a.nbytes for a in arrays)
+
+  def index(self, nodes: Iterable[int]) -> np.ndarray:
+    """Positions of the given genre ids, skipping ids that are not in the graph."""
+    idx = [self.positions.get(node) for node in nodes]
+    idx = np.array([i for i in idx if i is not None], dtype=np.int32)
+    return idx[self.present[idx]]
+
+  def ids(self, mask_or_idx: np.ndarray) -> Set[int]:
+    if mask_or_idx.dtype == bool:
+      mask_or_idx = np.flatnonzero(mask_or_idx)
+    return set(self.node_ids[mask_or_idx].tolist())
+
+  def column(self, name: str) -> np.ndarray:
+    return self.columns[name]
+
+  def degree(self, edge_type: Optional[str] = None, reverse: bool = False) -> np.ndarray:
+    return np.diff(self.matrix(edge_type, reverse).indptr)
+
+  def matrix(self, edge_type: Optional[str] = None, reverse: bool = False) -> csr_matrix:
+    """Adjacency as a scipy CSR matrix over the same arrays, optionally restricted to one edge type."""
+    key = (edge_type, reverse)
+    if key not in self._matrices:
+      offsets, neighbours, types = (self.in_offsets, self.sources, self.in_edge_types) if reverse \
+        else (self.offsets, self.targets, self.edge_types)
+      if edge_type is not None:
+        keep = types == EDGE_TYPE_CODES[edge_type]
+        rows = np.repeat(np.arange(len(self.node_ids)), np.diff(offsets))[keep]
+        offsets = np.zeros(len(self.node_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=len(self.node_ids)), out=offsets[1:])
+        neighbours = neighbours[keep]
+      n = len(self.node_ids)
+      self._matrices[key] = csr_matrix((np.ones(len(neighbours)), neighbours, offsets), shape=(n, n))
+    return self._matrices[key]
+
+  def levels(self, sources: Iterable[int], edge_type: Optional[str] = None, reverse: bool = False) -> np.ndarray:
+    """BFS distance of every node from the nearest source, -1 if unreachable."""
+    M = self.matrix(edge_type, reverse)
+    levels = np.full(len(self.node_ids), -1, dtype=np.int32)
+    frontier = self.index(sources)
+    depth = 0
+    while frontier.size:
+      frontier = frontier[levels[frontier] < 0]
+      levels[frontier] = depth
+      positions, _ = gather(M.indptr, frontier)
+      neighbours = M.indices[positions]
+      frontier = np.unique(neighbours[levels[neighbours] < 0])
+      depth += 1
+    return levels
+
+  def depths(self, roots: Iterable[int], edge_type: Optional[str] = None) -> np.ndarray:
+    """BFS depth of every node from the first root (in the given order) that reaches it, -1 if none does."""
+    M = self.matrix(edge_type)
+    depths = np.full(len(self.node_ids), -1, dtype=np.int32)
+    for root in self.index(roots):
+      _, parent = csgraph.breadth_first_order(M, root, return_predecessors=True)
+      reached = np.flatnonzero((parent >= 0) & (depths < 0))
+      if depths[root] < 0:
+        depths[root] = 0
+      if not reached.size:
+        continue
+      # Pointer jumping: each pass doubles how far up the BFS tree a node looks
+      parent[root] = root
+      parent[parent < 0] = root
+      distance = (np.arange(len(parent)) != root).astype(np.int32)
+      while (parent[reached] != root).any():
+        distance += distance[parent]
+        parent = parent[parent]
+      depths[reached] = distance[reached]
+    return depths
+
+  def reachable(self, sources: Iterable[int], edge_type: Optional[str] = None, reverse: bool = False) -> np.ndarray:
+    """Mask of the sources and every node reachable from them."""
+    idx = self.index(sources)
+    if len(idx) != 1:
+      return self.levels(self.node_ids[idx].tolist(), edge_type, reverse) >= 0
+    mask = np.zeros(len(self.node_ids), dtype=bool)
+    mask[csgraph.breadth_first_order(self.matrix(edge_type, reverse), idx[0], return_predecessors=False)] = True
+    return mask
+
+  def successors(self, node: int, edge_type: Optional[str] = None) -> List[int]:
+    i = self.positions.get(node)
+    if i is None:
+      return []
+    if edge_type is None:
+      return self.node_ids[self.targets[self.offsets[i]:self.offsets[i + 1]]].tolist()
+    M = self.matrix(edge_type)
+    return self.node_ids[M.indices[M.indptr[i]:M.indptr[i + 1]]].tolist()
+
+  def predecessors(self, node: int, edge_type: Optional[str] = None) -> List[int]:
+    i = self.positions.get(node)
+    if i is None:
+      return []
+    M = self.matrix(edge_type, reverse=True)
+    return self.node_ids[M.indices[M.indptr[i]:M.indptr[i + 1]]].tolist()
+
+  def descendants(self, nodes: Iterable[int], edge_type: Optional[str] = None) -> Set[int]:
+    """The given nodes and all nodes reachable from them."""
+    return self.ids(self.reachable(nodes, edge_type))
+
+  def ancestors(self, nodes: Iterable[int], edge_type: Optional[str] = None) -> Set[int]:
+    """The given nodes and all nodes they can be reached from."""
+    return self.ids(self.reachable(nodes, edge_type, reverse=True))
+
+  def shortest_path(self, source: int, target: int, edge_type: Optional[str] = None) -> Optional[List[int]]:
+    """Unweighted shortest path from source to target as genre ids, None if there is none."""
+    start, goal = self.positions.get(source), self.positions.get(target)
+    if start is None or goal is None or not (self.present[start] and self.present[goal]):
+      return None
+    _, parent = csgraph.breadth_first_order(self.matrix(edge_type), start, return_predecessors=True)
+    if start != goal and parent[goal] < 0:
+      return None
+    path = [goal]
+    while path[-1] != start:
+      path.append(int(parent[path[-1]]))
+    return self.node_ids[path[::-1]].tolist()
+
+  def shortest_paths_between(self, sources: Iterable[int], targets: Iterable[int], edge_type: Optional[str] = None) -> Set[int]:
+    """Genres on one unweighted shortest path from each source to each target it reaches, with one BFS per source."""
+    M = self.matrix(edge_type)
+    goals = self.index(targets)
+    on_path = np.zeros(len(self.node_ids), dtype=bool)
+    for start in self.index(sources).tolist():
+      _, parent = csgraph.breadth_first_order(M, start, return_predecessors=True)
+      # walk the BFS tree up from all reached targets at once, stopping where this tree was walked already
+      walked = np.zeros(len(self.node_ids), dtype=bool)
+      current = np.unique(goals[(parent[goals] >= 0) | (goals == start)])
+      while current.size:
+        walked[current] = True
+        current = parent[current]
+        current = np.unique(current[current >= 0])
+        current = current[~walked[current]]
+      on_path |= walked
+    return self.ids(on_path)
+
+  def shortest_paths_to(self, sources: Iterable[int], target: int, edge_type: Optional[str] = None) -> Set[int]:
+    """Genres on one unweighted shortest path from each source to target, with a single BFS from target."""
+    goal = self.positions.get(target)
+    if goal is None or not self.present[goal]:
+      return set()
+    _, parent = csgraph.breadth_first_order(self.matrix(edge_type, reverse=True), goal, return_predecessors=True)
+    nodes = set()
+    for start in self.index(sources).tolist():
+      if start != goal and parent[start] < 0:
+        continue
+      nodes.add(start)
+      while start != goal:
+        start = int(parent[start])
+        nodes.add(start)
+    return self.ids(np.array(sorted(nodes), dtype=np.int32))
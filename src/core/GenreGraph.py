@@ -1,42 +1,58 @@
+import hashlib
+import numpy as np
 import networkx as nx
 from threading import Lock
-from collections import deque
+from typing import Dict, List
 
 from src.config import Settings
 from src.core.db import SessionLocal
+from src.core.GenreCSR import GenreCSR
+from src.core.GenreIndex import GenreNameIndex
+from src.core.GenreReachability import GenreReachability
 from src.database.models import RelationshipTypeEnum, Genre
 from src.database.selects import get_all_mb_genres, get_all_relationships
 
 
-
-class GenreGraph:
-  G = nx.DiGraph()
-  lock = Lock()
-  subgraphs = {}
-  roots = set()
-
-  def __init__(self, subgraph_type=None):
-    self.subgraph_type = subgraph_type
-
-  def __enter__(self):
-    graph = self.G if self.subgraph_type is None else self.subgraphs[self.subgraph_type]
-    self.lock.acquire()
-    return graph
-
-  def __exit__(self, exc_type, exc_value, traceback):
-    self.lock.release()
-    return False
-
-  def get_genre_id(self, name):
-    with self as g:
-      for genre in g.nodes():
-        if g.nodes[genre]['name'] == name:
-          return genre
-    return None
-
-  def get_genre(self, id):
-    with self as g:
-      return g.nodes[id]
+class GenreGraphSnapshot:
+  """
+  Immutable state of the genre graph: the frozen graph, its per edge type
+  subgraphs, the SUBGENRE_OF roots and the name index. Built once and never
+  modified afterwards, so any number of threads can read it without a lock.
+  """
+
+  def __init__(self, G: nx.DiGraph, subgraphs: Dict[str, nx.DiGraph], roots: List[int], index: GenreNameIndex,
+               csr: GenreCSR, csrs: Dict[str, GenreCSR]):
+    self.G = G
+    self.subgraphs = subgraphs
+    self.roots = roots
+    self.index = index
+    self.csr = csr
+    self.csrs = csrs
+    self._reachability: Dict[str, GenreReachability] = {}
+
+  def graph(self, subgraph_type=None) -> nx.DiGraph:
+    return self.G if subgraph_type is None else self.subgraphs[subgraph_type]
+
+  @property
+  def version(self) -> str:
+    return self.G.graph.get("version", "")
+
+  def adjacency(self, subgraph_type=None) -> GenreCSR:
+    """CSR arrays of graph(subgraph_type), for traversals."""
+    return self.csr if subgraph_type is None else self.csrs[subgraph_type]
+
+  def reachability(self, subgraph_type=None) -> GenreReachability:
+    """
+    Transitive closure over the subgraph_type edges (all edges if None), built
+    on first use. Unlike graph(subgraph_type), which is node-induced, it does
+    not follow edges of other types between those genres.
+    """
+    reachability = self._reachability.get(subgraph_type)
+    if reachability is None:
+      reachability = self._reachability.setdefault(
+        subgraph_type, GenreReachability.build(self.adjacency(subgraph_type), subgraph_type)
+      )
+    return reachability
 
   @staticmethod
   def compute_weight(genre1: Genre, genre2: Genre):
@@ -46,95 +62,140 @@ class GenreGraph:
       return 0
 
   @classmethod
-  def initialize(cls):
-    with SessionLocal() as session:
-      genres = get_all_mb_genres(session)
-      relationships = get_all_relationships(session)
+  def empty(cls) -> "GenreGraphSnapshot":
+    G = nx.freeze(nx.DiGraph())
+    return cls(G, {}, [], GenreNameIndex({}), GenreCSR.build(G), {})
 
-    bouncy_vals = [genre[0].bouncy_value for genre in genres if genre[0].bouncy_value]
-    organic_vals = [genre[0].organic_value for genre in genres if genre[0].organic_value]
+  @classmethod
+  def build(cls, genres: List[Genre], relationships: list) -> "GenreGraphSnapshot":
+    bouncy_vals = [genre.bouncy_value for genre in genres if genre.bouncy_value]
+    organic_vals = [genre.organic_value for genre in genres if genre.organic_value]
 
     # Find the min and max for x and y
     b_min, b_max = min(bouncy_vals), max(bouncy_vals)
     o_min, o_max = min(organic_vals), max(organic_vals)
 
-    with cls.lock:
-      for genre in genres:
-        genre = genre[0]
-        b = round((genre.bouncy_value - b_min) / (b_max - b_min), Settings.decimal_precision) if genre.bouncy_value else None
-        o = round((genre.organic_value - o_min) / (o_max - o_min), Settings.decimal_precision) if genre.organic_value else None
-        cls.G.add_node(
-          genre.id,
-          name=genre.name,
-          bouncy_value=b,
-          organic_value=o,
-          description=genre.description,
-          is_spotify_genre=b is not None and o is not None
-        )
-
-      for rel in relationships:
-        rel = rel[0]
-        g1 = next((genre[0] for genre in genres if genre[0].id == rel.genre1_id), None)
-        g2 = next((genre[0] for genre in genres if genre[0].id == rel.genre2_id), None)
-        weight = cls.compute_weight(g1, g2) if g1 and g2 else 0
-        cls.G.add_edge(rel.genre2_id, rel.genre1_id, weight=weight, type=rel.relationship.value)
-
-      cls._initialize_subgraphs()
-
-      nx.freeze(cls.G)
-
-    G = cls.subgraph(RelationshipTypeEnum.SUBGENRE_OF.value)
-    for node in cls.G.nodes():
-      cls.G.nodes[node]["has_subgenre"] = node in G.nodes and any(G.successors(node))
-
-    cls.roots = [n for n in G.nodes if G.in_degree(n) == 0]
-    depths = {}
-
-    # Perform BFS from each root to assign depths
-    for root in cls.roots:
-      queue = deque([(root, 0)])  # (node, depth)
-      while queue:
-        node, depth = queue.popleft()
-        if node not in depths:  # Only set depth if it's not already set
-          depths[node] = depth
-        # Add neighbors to the queue with incremented depth
-        for neighbor in G.neighbors(node):
-          if neighbor not in depths:
-            queue.append((neighbor, depth + 1))
-
-    # Set the depth as a node attribute
-    nx.set_node_attributes(cls.G, depths, 'depth')
+    G = nx.DiGraph()
+    for genre in genres:
+      b = round((genre.bouncy_value - b_min) / (b_max - b_min), Settings.decimal_precision) if genre.bouncy_value else None
+      o = round((genre.organic_value - o_min) / (o_max - o_min), Settings.decimal_precision) if genre.organic_value else None
+      G.add_node(
+        genre.id,
+        name=genre.name,
+        bouncy_value=b,
+        organic_value=o,
+        # as stored, for models that normalize over other genres (ArtistHandler)
+        bouncy_raw=genre.bouncy_value,
+        organic_raw=genre.organic_value,
+        description=genre.description,
+        is_spotify_genre=b is not None and o is not None
+      )
+
+    genres_by_id = {genre.id: genre for genre in genres}
+    for rel in relationships:
+      g1 = genres_by_id.get(rel.genre1_id)
+      g2 = genres_by_id.get(rel.genre2_id)
+      weight = cls.compute_weight(g1, g2) if g1 and g2 else 0
+      G.add_edge(rel.genre2_id, rel.genre1_id, weight=weight, type=rel.relationship.value)
+
+    subgraphs = cls._build_subgraphs(G)
+
+    csr = GenreCSR.build(G)
+    csrs = {t: GenreCSR.build(g, csr.node_ids) for t, g in subgraphs.items()}
+
+    S = csrs[RelationshipTypeEnum.SUBGENRE_OF.value]
+    has_subgenre = S.degree() > 0
+    roots = S.node_ids[S.present & (S.degree(reverse=True) == 0)].tolist()
+
+    depths = S.depths(roots)
+    csr.columns["depth"] = np.where(depths >= 0, depths, np.nan).astype(np.float32)
+
+    for i, node in enumerate(csr.node_ids.tolist()):
+      G.nodes[node]["has_subgenre"] = bool(has_subgenre[i])
+      if depths[i] >= 0:
+        G.nodes[node]["depth"] = int(depths[i])
+
+    # Identifies the graph content; subgraph views share G.graph
+    G.graph["version"] = hashlib.sha1(
+      repr((sorted(G.nodes), sorted((u, v, d["type"]) for u, v, d in G.edges(data=True)))).encode()
+    ).hexdigest()[:16]
+
+    index = GenreNameIndex({node: data["name"] for node, data in G.nodes(data=True)})
+    return cls(nx.freeze(G), {t: nx.freeze(g) for t, g in subgraphs.items()}, roots, index, csr, csrs)
 
-  @classmethod
-  def _initialize_subgraphs(cls):
-    cls.subgraphs.clear()
+  @staticmethod
+  def _build_subgraphs(G: nx.DiGraph) -> Dict[str, nx.DiGraph]:
+    subgraphs = {}
     edge_types = [relationship.value for relationship in RelationshipTypeEnum]
     for edge_type in edge_types:
       nodes = {
-                u for u, v, d in cls.G.edges(data=True) if d.get("type") == edge_type
+                u for u, v, d in G.edges(data=True) if d.get("type") == edge_type
               } | {
-                v for u, v, d in cls.G.edges(data=True) if d.get("type") == edge_type
+                v for u, v, d in G.edges(data=True) if d.get("type") == edge_type
               }
 
-      subgraph = cls.G.subgraph(nodes).copy()
-      cls.subgraphs[edge_type] = subgraph
+      subgraphs[edge_type] = G.subgraph(nodes).copy()
+    return subgraphs
+
+
+class GenreGraph:
+  """
+  Read access to the current GenreGraphSnapshot.
+
+  Readers never lock: each GenreGraph instance pins the snapshot that was
+  current when it was created. reload() builds a new snapshot from Postgres
+  and swaps it in with a single reference assignment.
+  """
+  _snapshot = GenreGraphSnapshot.empty()
+  _reload_lock = Lock()
+
+  def __init__(self, subgraph_type=None):
+    self.subgraph_type = subgraph_type
+    self.snapshot = self._snapshot
+
+  def __enter__(self):
+    return self.snapshot.graph(self.subgraph_type)
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    return False
 
   @classmethod
-  def subgraph(cls, graph_type):
-    """ Context manager to switch to a specific edge type subgraph. """
-    if graph_type not in cls.subgraphs:
-      return None
+  def current(cls) -> GenreGraphSnapshot:
+    return cls._snapshot
+
+  def get_genre_id(self, name):
+    return self.snapshot.index.get(name)
 
-    return cls.subgraphs[graph_type]
+  def search(self, query: str, limit: int = 10):
+    """Ranked (genre_id, score) candidates for autocomplete."""
+    return self.snapshot.index.search(query, limit)
+
+  def get_genre(self, id):
+    return self.snapshot.G.nodes[id]
+
+  @classmethod
+  def initialize(cls):
+    cls.reload()
+
+  @classmethod
+  def reload(cls):
+    """Build a fresh snapshot from the database and swap it in atomically."""
+    with cls._reload_lock:
+      with SessionLocal() as session:
+        genres = [row[0] for row in get_all_mb_genres(session)]
+        relationships = [row[0] for row in get_all_relationships(session)]
+      cls._snapshot = GenreGraphSnapshot.build(genres, relationships)
+
+  @classmethod
+  def subgraph(cls, graph_type):
+    """Subgraph containing only edges of a specific type."""
+    return cls._snapshot.subgraphs.get(graph_type)
 
   @classmethod
   def shortest_path(cls, start, end, edge_type: RelationshipTypeEnum):
     """Find shortest path using only a specific edge type."""
-    subgraph = cls.subgraph(edge_type)
-    try:
-      return nx.shortest_path(subgraph, source=start, target=end)
-    except nx.NetworkXNoPath:
-      return None
+    csr = cls._snapshot.csrs.get(edge_type)
+    return csr.shortest_path(start, end) if csr else None
 
 
-GenreGraph.initialize()
\ No newline at end of file
+GenreGraph.initialize()
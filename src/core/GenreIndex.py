@@ -0,0 +1,87 @@
+import heapq
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from src.scraping.helper import normalize_genre_name
+
+
+def normalize(name: str) -> str:
+  return normalize_genre_name(name)[0]
+
+
+def trigrams(name: str) -> set:
+  padded = f"  {name} "
+  return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class GenreNameIndex:
+  """
+  Name lookups for the genre graph, built once per graph.
+
+  Exact lookups go by name and by normalize_genre_name, autocomplete by
+  prefix over the sorted normalized names and by trigram similarity.
+  """
+
+  def __init__(self, names: Dict[int, str]):
+    self.names = dict(names)
+    self.by_name: Dict[str, int] = {}
+    self.by_normalized: Dict[str, int] = {}
+    self.trigrams: Dict[str, List[int]] = defaultdict(list)
+    self.trigram_count: Dict[int, int] = {}
+
+    for genre_id, name in self.names.items():
+      self.by_name.setdefault(name, genre_id)
+      norm = normalize(name)
+      self.by_normalized.setdefault(norm, genre_id)
+      grams = trigrams(norm)
+      self.trigram_count[genre_id] = len(grams)
+      for gram in grams:
+        self.trigrams[gram].append(genre_id)
+
+    self.sorted_names: List[Tuple[str, int]] = sorted((normalize(name), gid) for gid, name in self.names.items())
+    self._sorted_keys = [name for name, _ in self.sorted_names]
+
+  def get(self, name: str) -> Optional[int]:
+    """Genre id by exact name, falling back to the normalized name."""
+    genre_id = self.by_name.get(name)
+    if genre_id is None:
+      genre_id = self.by_normalized.get(normalize(name))
+    return genre_id
+
+  def prefix(self, query: str, limit: int = 10) -> List[int]:
+    """Genres whose normalized name starts with the query, shortest names first."""
+    query = normalize(query)
+    if not query:
+      return []
+    matches = []
+    for i in range(bisect_left(self._sorted_keys, query), len(self.sorted_names)):
+      name, genre_id = self.sorted_names[i]
+      if not name.startswith(query):
+        break
+      matches.append((len(name), name, genre_id))
+    return [genre_id for _, _, genre_id in sorted(matches)[:limit]]
+
+  def fuzzy(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+    """Genres ranked by trigram similarity (Dice coefficient) to the query."""
+    grams = trigrams(normalize(query))
+    shared = Counter(genre_id for gram in grams for genre_id in self.trigrams.get(gram, ()))
+    scored = heapq.nlargest(limit, (
+      (2 * count / (len(grams) + self.trigram_count[genre_id]), genre_id)
+      for genre_id, count in shared.items()
+    ))
+    return [(genre_id, round(score, 4)) for score, genre_id in scored]
+
+  def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+    """Autocomplete: exact match, then prefix matches, then fuzzy matches."""
+    results: Dict[int, float] = {}
+    exact = self.get(query)
+    if exact is not None:
+      results[exact] = 1.0
+    for genre_id in self.prefix(query, limit):
+      results.setdefault(genre_id, 1.0 if genre_id == exact else 0.99)
+    for genre_id, score in self.fuzzy(query, limit):
+      if len(results) >= limit:
+        break
+      results.setdefault(genre_id, score)
+    return list(results.items())[:limit]
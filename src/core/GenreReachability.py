@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Iterable, List, Optional, Set
+
+from scipy.sparse import csgraph
+
+from src.core.GenreCSR import GenreCSR
+
+
+class GenreReachability:
+  """
+  Transitive closure of a genre graph as one Python int bitset per node,
+  over the edges of one type or of all types.
+
+  Bit i of descendants[node] is set if the genre at CSR position i can be
+  reached from node, ancestors the other way round; both include the node
+  itself. Strongly connected components are collapsed first so the closure
+  is a single pass over the condensation in topological order.
+  """
+
+  def __init__(self, csr: GenreCSR, descendants: List[int], ancestors: List[int], edge_type: Optional[str] = None):
+    self.csr = csr
+    self.descendants = descendants
+    self.ancestors = ancestors
+    self.edge_type = edge_type
+
+  @classmethod
+  def build(cls, csr: GenreCSR, edge_type: Optional[str] = None) -> "GenreReachability":
+    n = len(csr.node_ids)
+    M = csr.matrix(edge_type)
+    n_components, labels = csgraph.connected_components(M, directed=True, connection="strong")
+
+    members = [0] * n_components
+    for i, label in enumerate(labels.tolist()):
+      members[label] |= 1 << i
+
+    rows = np.repeat(np.arange(n), np.diff(M.indptr))
+    src, dst = labels[rows], labels[M.indices]
+    between = src != dst
+    edges = set(zip(src[between].tolist(), dst[between].tolist()))
+    children = [[] for _ in range(n_components)]
+    parents = [[] for _ in range(n_components)]
+    for u, v in edges:
+      children[u].append(v)
+      parents[v].append(u)
+
+    order = cls._topological_order(children, parents)
+
+    down = list(members)
+    for c in reversed(order):
+      for child in children[c]:
+        down[c] |= down[child]
+    up = list(members)
+    for c in order:
+      for parent in parents[c]:
+        up[c] |= up[parent]
+
+    labels = labels.tolist()
+    return cls(csr, [down[label] for label in labels], [up[label] for label in labels], edge_type)
+
+  @staticmethod
+  def _topological_order(children: List[List[int]], parents: List[List[int]]) -> List[int]:
+    in_degree = [len(p) for p in parents]
+    order = [c for c, d in enumerate(in_degree) if d == 0]
+    for c in order:
+      for child in children[c]:
+        in_degree[child] -= 1
+        if not in_degree[child]:
+          order.append(child)
+    return order
+
+  def _union(self, bitsets: List[int], nodes: Iterable[int]) -> int:
+    bits = 0
+    for i in self.csr.index(nodes).tolist():
+      bits |= bitsets[i]
+    return bits
+
+  def ids(self, bits: int) -> Set[int]:
+    if not bits:
+      return set()
+    n = len(self.csr.node_ids)
+    mask = np.unpackbits(np.frombuffer(bits.to_bytes((n + 7) // 8, "little"), dtype=np.uint8), bitorder="little")[:n]
+    return set(self.csr.node_ids[mask.astype(bool)].tolist())
+
+  def between(self, source: Iterable[int], target: Iterable[int]) -> Set[int]:
+    """Genres on any path from a source genre to a target genre, the endpoints included."""
+    return self.ids(self._union(self.descendants, source) & self._union(self.ancestors, target))
+
+  def shortest_paths(self, source: Iterable[int], target: Iterable[int]) -> Set[int]:
+    """
+    Genres on one shortest path from every source genre to every target genre
+    it reaches, the endpoints included. Only sources that reach a target are searched.
+    """
+    targets = 0
+    for i in self.csr.index(target).tolist():
+      targets |= 1 << i
+    sources = [
+      int(self.csr.node_ids[i]) for i in self.csr.index(source).tolist()
+      if self.descendants[i] & targets
+    ]
+    return self.csr.shortest_paths_between(sources, target, self.edge_type)
+
+  def reaches(self, source: int, target: int) -> bool:
+    idx = self.csr.index([source, target]).tolist()
+    return len(idx) == 2 and bool(self.descendants[idx[0]] >> idx[1] & 1)
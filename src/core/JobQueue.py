@@ -0,0 +1,166 @@
+import time
+import uuid
+import logging
+from typing import Any, Literal, Optional
+from pydantic import BaseModel, Field
+
+from src.config import JobConfig
+from src.core.redis_client import redis_client
+from src.core.SingleFlight import RELEASE_LOCKS
+
+logger = logging.getLogger(__name__)
+
+# PEXPIRE KEYS[1] to ARGV[2] ms only while it still holds the token ARGV[1]
+RENEW_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+JobType = Literal["sample_tracks", "sample_artists", "update_playlist"]
+JobStatus = Literal["queued", "running", "done", "failed", "cancelled"]
+
+
+class Job(BaseModel):
+  id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+  type: JobType
+  session_id: str
+  params: dict = Field(default_factory=dict)
+  status: JobStatus = "queued"
+  created: float = Field(default_factory=time.time)
+  started: Optional[float] = None
+  finished: Optional[float] = None
+  error: Optional[str] = None
+  result: Any = None
+
+  @property
+  def is_finished(self) -> bool:
+    return self.status in ("done", "failed", "cancelled")
+
+
+class JobQueue:
+  """
+  Redis list of job ids, worked off by src/scripts/job_worker.py.
+
+  Each job is stored as JSON under "job:{id}" for JobConfig.ttl so clients can
+  poll it. Cancelling sets "job:{id}:cancel"; queued jobs are dropped when
+  popped, running ones are cancelled at the worker's next check. Workers hold
+  "job:lock:{session_id}" while a job runs, so jobs of one session never work
+  on the same SessionData at once.
+
+  Popping moves a job id into the worker's "jobs:processing:{worker}" list,
+  where it stays until the worker is done with it. Workers keep
+  "jobs:worker:{worker}" alive; the claimed jobs of a worker whose heartbeat
+  ran out are moved back to the queue by recover().
+  """
+  queue_key = "jobs:queue"
+  workers_key = "jobs:workers"
+
+  def __init__(self):
+    self.redis = redis_client
+    self._release = self.redis.register_script(RELEASE_LOCKS)
+    self._renew = self.redis.register_script(RENEW_LOCK)
+
+  @staticmethod
+  def processing_key(worker_id: str) -> str:
+    return f"jobs:processing:{worker_id}"
+
+  @staticmethod
+  def heartbeat_key(worker_id: str) -> str:
+    return f"jobs:worker:{worker_id}"
+
+  @staticmethod
+  def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+  @staticmethod
+  def cancel_key(job_id: str) -> str:
+    return f"job:{job_id}:cancel"
+
+  @staticmethod
+  def lock_key(session_id: str) -> str:
+    return f"job:lock:{session_id}"
+
+  async def submit(self, type: JobType, session_id: str, params: dict) -> Job:
+    job = Job(type=type, session_id=session_id, params=params)
+    async with self.redis.pipeline(transaction=False) as pipe:
+      pipe.setex(self.job_key(job.id), JobConfig.ttl, job.model_dump_json())
+      pipe.rpush(self.queue_key, job.id)
+      await pipe.execute()
+    logger.info(f"Queued job {job.type} {job.id} for session {session_id}")
+    return job
+
+  async def get(self, job_id: str) -> Optional[Job]:
+    data = await self.redis.get(self.job_key(job_id))
+    return Job.model_validate_json(data) if data else None
+
+  async def save(self, job: Job):
+    await self.redis.setex(self.job_key(job.id), JobConfig.ttl, job.model_dump_json())
+
+  async def cancel(self, job_id: str) -> Optional[Job]:
+    job = await self.get(job_id)
+    if job is None or job.is_finished:
+      return job
+    await self.redis.setex(self.cancel_key(job_id), JobConfig.ttl, 1)
+    if job.status == "queued":
+      job.status = "cancelled"
+      job.finished = time.time()
+      await self.save(job)
+    return job
+
+  async def cancel_requested(self, job_id: str) -> bool:
+    return bool(await self.redis.exists(self.cancel_key(job_id)))
+
+  async def pop(self, worker_id: str, timeout: float) -> Optional[Job]:
+    """
+    Next job, claimed by worker_id until ack() or requeue(), waiting up to
+    timeout seconds. Jobs that expired meanwhile are skipped.
+    """
+    job_id = await self.redis.blmove(self.queue_key, self.processing_key(worker_id), timeout, "LEFT", "RIGHT")
+    if job_id is None:
+      return None
+    job = await self.get(job_id)
+    if job is None:
+      await self.ack(worker_id, job_id)
+    return job
+
+  async def ack(self, worker_id: str, job_id: str):
+    await self.redis.lrem(self.processing_key(worker_id), 1, job_id)
+
+  async def requeue(self, worker_id: str, job: Job):
+    async with self.redis.pipeline(transaction=True) as pipe:
+      pipe.rpush(self.queue_key, job.id)
+      pipe.lrem(self.processing_key(worker_id), 1, job.id)
+      await pipe.execute()
+
+  async def heartbeat(self, worker_id: str):
+    async with self.redis.pipeline(transaction=False) as pipe:
+      pipe.sadd(self.workers_key, worker_id)
+      pipe.setex(self.heartbeat_key(worker_id), JobConfig.worker_ttl, 1)
+      await pipe.execute()
+
+  async def recover(self) -> int:
+    """Moves the claimed jobs of workers without heartbeat back to the queue."""
+    recovered = 0
+    for worker_id in await self.redis.smembers(self.workers_key):
+      if await self.redis.exists(self.heartbeat_key(worker_id)):
+        continue
+      while await self.redis.lmove(self.processing_key(worker_id), self.queue_key, "LEFT", "RIGHT"):
+        recovered += 1
+      await self.redis.srem(self.workers_key, worker_id)
+      logger.warning(f"Worker {worker_id} is gone, requeued its jobs")
+    return recovered
+
+  async def lock_session(self, session_id: str, token: str) -> bool:
+    return bool(await self.redis.set(self.lock_key(session_id), token, nx=True, px=JobConfig.session_lock_ms))
+
+  async def renew_session_lock(self, session_id: str, token: str) -> bool:
+    """Extends the lock while it is still held with token; False if it was lost."""
+    return bool(await self._renew(keys=[self.lock_key(session_id)], args=[token, JobConfig.session_lock_ms]))
+
+  async def unlock_session(self, session_id: str, token: str):
+    await self._release(keys=[self.lock_key(session_id)], args=[token])
+
+
+job_queue = JobQueue()
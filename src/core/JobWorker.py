@@ -0,0 +1,179 @@
+import time
+import uuid
+import socket
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+from fastapi.encoders import jsonable_encoder
+
+from src.config import JobConfig
+from src.core.JobQueue import Job, JobType, job_queue
+from src.core.session_manager import SessionData, get_session_from_id, store_session
+from src.core.spotify_client import SpotifyUserClient
+from src.models.ObjectSampling import SamplingConfig
+from src.models.SongSampler import CombinedSamplerConfig
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[SessionData, dict], Awaitable[dict]]
+
+
+async def sample_artists(session: SessionData, params: dict) -> dict:
+  config = SamplingConfig.model_validate(params["config"])
+  # builds the artist pool first if it is not cached
+  await asyncio.to_thread(session.factory.sample_artists, params["genre_id"], config)
+  session.bump("artists", "factory")
+  return {"sampled": session.factory.sampled_artists(params["genre_id"])}
+
+
+async def sample_tracks(session: SessionData, params: dict) -> dict:
+  sampler = CombinedSamplerConfig.model_validate(params["sampler"])
+  await session.factory.sample_tracks(params["genre_id"], sampler)
+  session.bump("factory")
+  return {"tracks": len(session.factory.genres[params["genre_id"]].tracks.sampled)}
+
+
+async def update_playlist(session: SessionData, params: dict) -> dict:
+  sp = await asyncio.to_thread(SpotifyUserClient(session.id).get_spotify_client)
+  if sp is None:
+    raise ValueError("Not logged in to Spotify")
+
+  factory = session.factory
+  if params.get("name") and (factory.playlist is None or factory.playlist.id is None):
+    await asyncio.to_thread(factory.create_playlist, sp, params["name"])
+  if factory.playlist is None:
+    raise ValueError("No playlist to update")
+
+  factory.playlist.set_spotify(sp)
+  await asyncio.to_thread(factory.update_playlist)
+  session.bump("factory")
+  return await asyncio.to_thread(factory.playlist.to_frontend)
+
+
+HANDLERS: Dict[JobType, Handler] = {
+  "sample_artists": sample_artists,
+  "sample_tracks": sample_tracks,
+  "update_playlist": update_playlist,
+}
+
+
+class JobWorker:
+  """
+  Runs up to JobConfig.concurrency jobs from the job queue at once.
+
+  A job runs only while its worker holds the session's lock; jobs of a
+  locked session go back to the end of the queue. The session is loaded
+  after taking the lock and stored when the handler is done, so a cancelled
+  or failed job leaves the session unchanged.
+
+  Popped jobs stay claimed in the worker's processing list until they are
+  finished or requeued. Every worker keeps a heartbeat and requeues the
+  claimed jobs of workers whose heartbeat ran out.
+  """
+
+  def __init__(self, concurrency: int = JobConfig.concurrency):
+    self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    self.slots = asyncio.Semaphore(concurrency)
+    self.running = set()
+
+  async def run(self):
+    await job_queue.heartbeat(self.id)
+    heartbeat = asyncio.create_task(self.keep_alive())
+    logger.info(f"Job worker {self.id} started")
+    try:
+      await self.work()
+    finally:
+      heartbeat.cancel()
+
+  async def keep_alive(self):
+    while True:
+      try:
+        await job_queue.heartbeat(self.id)
+        recovered = await job_queue.recover()
+        if recovered:
+          logger.info(f"Requeued {recovered} jobs of stale workers")
+      except Exception:
+        logger.exception("Job worker heartbeat failed")
+      await asyncio.sleep(JobConfig.worker_ttl / 3)
+
+  async def work(self):
+    while True:
+      await self.slots.acquire()
+      job = await job_queue.pop(self.id, timeout=1)
+      if job is None:
+        self.slots.release()
+        continue
+      task = asyncio.create_task(self.process(job))
+      self.running.add(task)
+      task.add_done_callback(self._done)
+
+  def _done(self, task: asyncio.Task):
+    self.running.discard(task)
+    self.slots.release()
+
+  async def process(self, job: Job):
+    if job.is_finished:
+      await job_queue.ack(self.id, job.id)
+      return
+    if await job_queue.cancel_requested(job.id):
+      await self.finish(job, "cancelled")
+      await job_queue.ack(self.id, job.id)
+      return
+
+    token = uuid.uuid4().hex
+    if not await job_queue.lock_session(job.session_id, token):
+      await asyncio.sleep(JobConfig.poll_interval)
+      await job_queue.requeue(self.id, job)
+      return
+
+    try:
+      job.status = "running"
+      job.started = time.time()
+      await job_queue.save(job)
+      logger.info(f"Running job {job.type} {job.id}")
+
+      task = asyncio.create_task(self.execute(job))
+      while not task.done():
+        await asyncio.wait({task}, timeout=JobConfig.poll_interval)
+        if task.done():
+          break
+        if not await job_queue.renew_session_lock(job.session_id, token):
+          # another worker may hold the session now: stop before storing over it
+          logger.warning(f"Lost session lock of job {job.id}, requeueing")
+          task.cancel()
+          await asyncio.wait({task})
+          job.status = "queued"
+          await job_queue.save(job)
+          await job_queue.requeue(self.id, job)
+          return
+        if await job_queue.cancel_requested(job.id):
+          task.cancel()
+          await asyncio.wait({task})
+
+      if task.cancelled():
+        await self.finish(job, "cancelled")
+      elif task.exception() is not None:
+        logger.exception(f"Job {job.id} failed", exc_info=task.exception())
+        await self.finish(job, "failed", error=str(task.exception()))
+      else:
+        await self.finish(job, "done", result=task.result())
+      await job_queue.ack(self.id, job.id)
+    finally:
+      await job_queue.unlock_session(job.session_id, token)
+
+  @staticmethod
+  async def execute(job: Job):
+    session = await get_session_from_id(job.session_id)
+    result = await HANDLERS[job.type](session, job.params)
+    await store_session(session)
+    return jsonable_encoder(result)
+
+  @staticmethod
+  async def finish(job: Job, status: str, error: str = None, result=None):
+    job.status = status
+    job.finished = time.time()
+    job.error = error
+    job.result = result
+    await job_queue.save(job)
+    logger.info(f"Job {job.type} {job.id} {status}")
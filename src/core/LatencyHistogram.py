@@ -0,0 +1,61 @@
+import bisect
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, List, Optional
+
+
+class LatencyHistogram:
+  """
+  Counts durations into fixed buckets, doubling from 0.125 ms to about 4 s.
+  Percentiles are estimated as the upper bound of the bucket they fall in.
+  """
+  bounds_ms: List[float] = [0.125 * 2 ** i for i in range(16)]
+
+  def __init__(self):
+    self._lock = Lock()
+    self._counts = [0] * (len(self.bounds_ms) + 1)
+    self._sum_ms = 0.0
+    self._max_ms = 0.0
+
+  def observe(self, seconds: float):
+    ms = seconds * 1000
+    with self._lock:
+      self._counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+      self._sum_ms += ms
+      self._max_ms = max(self._max_ms, ms)
+
+  @contextmanager
+  def time(self) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - start)
+
+  def labels(self) -> List[str]:
+    return [f"le_{bound:g}ms" for bound in self.bounds_ms] + ["le_inf"]
+
+  def percentile(self, q: float) -> Optional[float]:
+    total = sum(self._counts)
+    if not total:
+      return None
+    seen = 0
+    for i, count in enumerate(self._counts):
+      seen += count
+      if seen >= q * total:
+        return min(self.bounds_ms[i], round(self._max_ms, 3)) if i < len(self.bounds_ms) else round(self._max_ms, 3)
+    return round(self._max_ms, 3)
+
+  def stats(self) -> Dict:
+    with self._lock:
+      count = sum(self._counts)
+      return {
+        "count": count,
+        "mean_ms": round(self._sum_ms / count, 3) if count else None,
+        "p50_ms": self.percentile(0.5),
+        "p95_ms": self.percentile(0.95),
+        "p99_ms": self.percentile(0.99),
+        "max_ms": round(self._max_ms, 3),
+        "buckets": {label: n for label, n in zip(self.labels(), self._counts) if n},
+      }
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from src.config import CacheConfig, SessionConfig
+from src.core.LayoutEngine import Layout
+from src.core.redis_client import redis_sync
+
+logger = logging.getLogger(__name__)
+
+# Drops the least recently used layouts beyond ARGV[1] entries.
+EVICT = """
+local excess = redis.call('zcard', KEYS[1]) - tonumber(ARGV[1])
+if excess <= 0 then
+  return 0
+end
+local oldest = redis.call('zpopmin', KEYS[1], excess)
+for i = 1, #oldest, 2 do
+  redis.call('del', oldest[i])
+end
+return excess
+"""
+
+
+class LayoutCache:
+  """
+  Graph layouts in Redis, keyed by a hash of the displayed node set.
+
+  The subgraph shown is induced by its nodes, so graph version + node set
+  identify it. Recency is tracked in the "layout:lru" sorted set and layouts
+  beyond CacheConfig.layout_max_items are evicted oldest first. Each session
+  remembers its last layout so the next one can start from it.
+  """
+  prefix = "layout:"
+  lru_key = "layout:lru"
+
+  def __init__(self):
+    self.redis = redis_sync
+    self._evict = self.redis.register_script(EVICT)
+    self._stats = defaultdict(int)
+
+  def key(self, version: str, nodes: Iterable[int], variant: str = "") -> str:
+    digest = hashlib.sha1(",".join(map(str, sorted(nodes))).encode())
+    digest.update(f"|{version}|{variant}".encode())
+    return f"{self.prefix}{digest.hexdigest()}"
+
+  @staticmethod
+  def last_key(session_id: str) -> str:
+    return f"layout:last:{session_id}"
+
+  def _load(self, key: Optional[str]) -> Optional[Layout]:
+    if not key:
+      return None
+    with self.redis.pipeline(transaction=False) as pipe:
+      pipe.get(key)
+      pipe.zadd(self.lru_key, {key: time.time()}, xx=True)
+      data, _ = pipe.execute()
+    if data is None:
+      return None
+    return {int(node): tuple(pos) for node, pos in json.loads(data).items()}
+
+  def get(self, key: str) -> Optional[Layout]:
+    layout = self._load(key)
+    self._stats["hits" if layout is not None else "misses"] += 1
+    return layout
+
+  def peek(self, key: str) -> Optional[Layout]:
+    """get() without counting a hit or miss, for lookups of layouts already sent."""
+    return self._load(key)
+
+  def set(self, key: str, layout: Layout):
+    with self.redis.pipeline(transaction=False) as pipe:
+      pipe.setex(key, CacheConfig.layout, json.dumps(layout))
+      pipe.zadd(self.lru_key, {key: time.time()})
+      pipe.execute()
+    evicted = self._evict(keys=[self.lru_key], args=[CacheConfig.layout_max_items])
+    self._stats["evicted"] += evicted or 0
+
+  def last(self, session_id: str) -> Optional[Layout]:
+    """The layout last shown to this session."""
+    return self._load(self.redis.get(self.last_key(session_id)))
+
+  def set_last(self, session_id: str, key: str):
+    self.redis.setex(self.last_key(session_id), SessionConfig.ttl, key)
+
+  def stats(self) -> dict:
+    stats = dict(self._stats)
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 4) if lookups else None
+    return stats
+
+
+layout_cache = LayoutCache()
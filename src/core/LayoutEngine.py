@@ -0,0 +1,215 @@
+import random
+import numpy as np
+import networkx as nx
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from networkx.drawing.nx_agraph import graphviz_layout
+from scipy.sparse import csgraph
+
+Layout = Dict[int, Tuple[float, float]]
+
+EDGE_LENGTH = 72.0 # neato's default edge length of one inch, in points
+
+
+def propagate_seed(graph: nx.DiGraph, seed: Layout) -> Layout:
+  """Positions from seed, new nodes placed next to their already placed neighbours."""
+  placed = {node: seed[node] for node in graph.nodes if node in seed}
+  pending = [node for node in graph.nodes if node not in placed]
+  while pending:
+    remaining = []
+    for node in pending:
+      neighbours = [placed[n] for n in nx.all_neighbors(graph, node) if n in placed]
+      if not neighbours:
+        remaining.append(node)
+        continue
+      placed[node] = (
+        sum(p[0] for p in neighbours) / len(neighbours) + random.uniform(-10, 10),
+        sum(p[1] for p in neighbours) / len(neighbours) + random.uniform(-10, 10)
+      )
+    if len(remaining) == len(pending):
+      break
+    pending = remaining
+  return placed
+
+
+def graph_distances(graph: nx.DiGraph) -> np.ndarray:
+  """Undirected hop distances times EDGE_LENGTH; disconnected pairs one hop further than the farthest pair."""
+  A = nx.to_scipy_sparse_array(graph, weight=None, format="csr")
+  D = csgraph.shortest_path(A, directed=False, unweighted=True)
+  finite = np.isfinite(D)
+  D[~finite] = D[finite].max() + 1 if finite.any() else 1
+  return D * EDGE_LENGTH
+
+
+def stress(positions: np.ndarray, D: np.ndarray) -> float:
+  """Normalized stress of positions against target distances D, after optimal scaling."""
+  i, j = np.triu_indices(len(D), k=1)
+  d = D[i, j]
+  w = 1 / d ** 2
+  x = np.linalg.norm(positions[i] - positions[j], axis=1)
+  alpha = (w * d * x).sum() / max((w * x * x).sum(), 1e-12)
+  return float((w * (alpha * x - d) ** 2).sum() / (w * d * d).sum())
+
+
+class LayoutEngine(ABC):
+  """Computes node positions for the displayed genre subgraph."""
+  name: str
+  pins: bool = True # whether display strategies pin their fixed nodes (see DisplayStrategy.pinned_positions)
+
+  @abstractmethod
+  def layout(self, graph: nx.DiGraph, seed: Optional[Layout] = None, pinned: Optional[Layout] = None) -> Layout:
+    """
+    seed: start positions, e.g. the previous layout shown to the session.
+    pinned: nodes that must stay exactly at the given positions.
+    """
+    pass
+
+
+class NeatoLayout(LayoutEngine):
+  """graphviz neato in a subprocess, seeded through the pos attribute."""
+  name = "neato"
+  pins = False # the default engine lays out as before the NumPy engines; pinned is only honoured when passed explicitly
+
+  def layout(self, graph: nx.DiGraph, seed: Optional[Layout] = None, pinned: Optional[Layout] = None) -> Layout:
+    if seed or pinned:
+      start = propagate_seed(graph, {**(seed or {}), **(pinned or {})})
+      graph = graph.copy()
+      for node, (x, y) in start.items():
+        graph.nodes[node]["pos"] = f"{x},{y}" + ("!" if pinned and node in pinned else "")
+    return graphviz_layout(graph, prog="neato")
+
+
+class NumpyLayout(LayoutEngine):
+  """In-process layouts on dense NumPy arrays, for subgraphs of up to a few thousand genres."""
+
+  def layout(self, graph: nx.DiGraph, seed: Optional[Layout] = None, pinned: Optional[Layout] = None) -> Layout:
+    nodes = list(graph.nodes)
+    if not nodes:
+      return {}
+    D = graph_distances(graph)
+    pinned = {node: pos for node, pos in (pinned or {}).items() if node in graph}
+    fixed = np.array([node in pinned for node in nodes])
+    positions = self.initial_positions(graph, nodes, D, {**(seed or {}), **pinned})
+    positions = self.optimize(graph, nodes, D, positions, fixed, warm=bool(seed))
+    return {node: (float(x), float(y)) for node, (x, y) in zip(nodes, positions)}
+
+  @staticmethod
+  def initial_positions(graph: nx.DiGraph, nodes: list, D: np.ndarray, seed: Layout) -> np.ndarray:
+    """Seeded positions where known, pivot MDS of the graph distances for the rest."""
+    n = len(nodes)
+    pivots = np.random.default_rng(0).choice(n, size=min(n, 50), replace=False)
+    C = D[:, pivots] ** 2
+    C = -0.5 * (C - C.mean(axis=0) - C.mean(axis=1, keepdims=True) + C.mean())
+    U, S, _ = np.linalg.svd(C, full_matrices=False)
+    positions = U[:, :2] * np.sqrt(S[:2])
+    if positions.shape[1] < 2:
+      positions = np.hstack([positions, np.zeros((n, 2 - positions.shape[1]))])
+
+    positions += np.random.default_rng(1).normal(scale=1e-3, size=positions.shape)
+
+    placed = propagate_seed(graph, seed) if seed else {}
+    known = np.array([node in placed for node in nodes])
+    if known.any():
+      seeded = np.array([placed[node] for node in nodes if node in placed])
+      # Move the MDS positions of unplaced nodes onto the seeded frame by a least-squares affine fit
+      if known.sum() >= 3 and not known.all():
+        A = np.hstack([positions[known], np.ones((known.sum(), 1))])
+        T, *_ = np.linalg.lstsq(A, seeded, rcond=None)
+        positions = np.hstack([positions, np.ones((n, 1))]) @ T
+      positions[known] = seeded
+    return positions
+
+  @staticmethod
+  def distances(positions: np.ndarray) -> np.ndarray:
+    """Pairwise euclidean distances, via the Gram matrix."""
+    squared = (positions ** 2).sum(axis=1)
+    d2 = squared[:, None] + squared[None, :] - 2 * positions @ positions.T
+    return np.sqrt(np.maximum(d2, 0))
+
+  @abstractmethod
+  def optimize(self, graph: nx.DiGraph, nodes: list, D: np.ndarray, positions: np.ndarray, fixed: np.ndarray, warm: bool) -> np.ndarray:
+    pass
+
+
+class StressLayout(NumpyLayout):
+  """
+  Stress majorization (SMACOF) with w_ij = d_ij^-2, the model neato uses by
+  default. Pinned nodes are held fixed by solving only for the free rows.
+  """
+  name = "stress"
+
+  def __init__(self, max_iterations: int = 300, tolerance: float = 1e-3):
+    self.max_iterations = max_iterations
+    self.tolerance = tolerance
+
+  def optimize(self, graph: nx.DiGraph, nodes: list, D: np.ndarray, positions: np.ndarray, fixed: np.ndarray, warm: bool) -> np.ndarray:
+    n = len(nodes)
+    if n < 3:
+      return positions
+    W = np.zeros_like(D)
+    off = ~np.eye(n, dtype=bool)
+    W[off] = D[off] ** -2
+    Lw = np.diag(W.sum(axis=1)) - W
+    free = ~fixed
+    if fixed.any():
+      solve = np.linalg.inv(Lw[np.ix_(free, free)])
+      pinned_term = Lw[np.ix_(free, fixed)] @ positions[fixed]
+    else:
+      # Lw is singular along translations; adding 11^T/n fixes the centroid
+      solve = np.linalg.inv(Lw + 1.0 / n)
+
+    WD = W * D
+    np.fill_diagonal(WD, 0)
+    previous = np.inf
+    for _ in range(self.max_iterations):
+      dist = self.distances(positions)
+      # B(Z) of the majorizing function; rows sum to zero
+      B = np.where(dist > 1e-9, -WD / np.maximum(dist, 1e-9), 0)
+      B[np.diag_indices(n)] = -B.sum(axis=1)
+      target = B @ positions
+      if fixed.any():
+        positions[free] = solve @ (target[free] - pinned_term)
+      else:
+        positions = solve @ target
+
+      current = (W * (dist - D) ** 2).sum()
+      if previous - current < self.tolerance * current:
+        break
+      previous = current
+    return positions
+
+
+class ForceLayout(NumpyLayout):
+  """Fruchterman-Reingold with a linear cooling schedule and edge length EDGE_LENGTH."""
+  name = "force"
+
+  def __init__(self, iterations: int = 100):
+    self.iterations = iterations
+
+  def optimize(self, graph: nx.DiGraph, nodes: list, D: np.ndarray, positions: np.ndarray, fixed: np.ndarray, warm: bool) -> np.ndarray:
+    A = (D <= EDGE_LENGTH) & ~np.eye(len(nodes), dtype=bool) # adjacent pairs
+    k = EDGE_LENGTH
+    # A warm start is already close, so it only needs local moves
+    temperature = k / 10 if warm else 0.1 * np.ptp(positions, axis=0).max() + k
+    iterations = self.iterations // 2 if warm else self.iterations
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+      dist = np.maximum(self.distances(positions), 0.01)
+      force = k * k / dist ** 2 - A * dist / k
+      np.fill_diagonal(force, 0)
+      # sum_j force_ij * (p_i - p_j)
+      displacement = force.sum(axis=1)[:, None] * positions - force @ positions
+      length = np.maximum(np.linalg.norm(displacement, axis=1), 0.01)
+      displacement *= (np.minimum(length, temperature) / length)[:, None]
+      displacement[fixed] = 0
+      positions = positions + displacement
+      temperature -= cooling
+    return positions
+
+
+LAYOUT_ENGINES = {engine.name: engine for engine in (NeatoLayout(), StressLayout(), ForceLayout())}
+
+
+def get_layout_engine(name: str) -> LayoutEngine:
+  return LAYOUT_ENGINES[name]
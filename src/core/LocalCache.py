@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from src.config import CacheConfig
+
+
+class LocalCache:
+  """
+  Bounded in-process LRU cache with per-entry TTL.
+
+  Sits in front of Redis and holds already decoded objects, so repeated
+  lookups of the same key within a worker skip the round trip and the
+  pydantic validation. Hits and misses are counted per key family, i.e.
+  the key without its trailing id ("album:tracks:123" -> "album:tracks").
+  """
+
+  def __init__(self, max_items: int, max_ttl: int):
+    self.max_items = max_items
+    self.max_ttl = max_ttl
+    self._entries: OrderedDict[str, tuple] = OrderedDict()
+    self._lock = Lock()
+    self._hits = defaultdict(int)
+    self._misses = defaultdict(int)
+    self._evictions = 0
+
+  @staticmethod
+  def family(key: str) -> str:
+    return key.rsplit(":", 1)[0]
+
+  @staticmethod
+  def _copy(value: Any) -> Any:
+    # hand out shallow copies of lists so callers can't mutate the cached entry
+    return list(value) if isinstance(value, list) else value
+
+  def _lookup(self, key: str, now: float) -> Optional[Any]:
+    entry = self._entries.get(key)
+    if entry is None:
+      self._misses[self.family(key)] += 1
+      return None
+
+    expires_at, value = entry
+    if expires_at <= now:
+      del self._entries[key]
+      self._misses[self.family(key)] += 1
+      return None
+
+    self._entries.move_to_end(key)
+    self._hits[self.family(key)] += 1
+    return value
+
+  def get(self, key: str) -> Optional[Any]:
+    with self._lock:
+      value = self._lookup(key, time.monotonic())
+    return self._copy(value)
+
+  def get_many(self, keys: List[str]) -> Dict[str, Any]:
+    """Return the cached values for all keys that are present and not expired."""
+    now = time.monotonic()
+    found = {}
+    with self._lock:
+      for key in keys:
+        value = self._lookup(key, now)
+        if value is not None:
+          found[key] = self._copy(value)
+    return found
+
+  def set(self, key: str, value: Any, ttl: int):
+    """Store a value; its lifetime is the Redis TTL capped by max_ttl."""
+    if value is None or self.max_items <= 0:
+      return
+    expires_at = time.monotonic() + min(ttl, self.max_ttl)
+    with self._lock:
+      self._entries[key] = (expires_at, self._copy(value))
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_items:
+        self._entries.popitem(last=False)
+        self._evictions += 1
+
+  def delete(self, key: str):
+    with self._lock:
+      self._entries.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self) -> dict:
+    with self._lock:
+      families = set(self._hits) | set(self._misses)
+      return {
+        "size": len(self._entries),
+        "max_items": self.max_items,
+        "evictions": self._evictions,
+        "families": {
+          family: {
+            "hits": self._hits[family],
+            "misses": self._misses[family],
+            "hit_rate": round(self._hits[family] / max(self._hits[family] + self._misses[family], 1), 4),
+          }
+          for family in sorted(families)
+        }
+      }
+
+
+local_cache = LocalCache(max_items=CacheConfig.local_max_items, max_ttl=CacheConfig.local_ttl)
@@ -0,0 +1,88 @@
+import time
+import logging
+from typing import Iterable, List, Optional
+
+from src.config import PoolConfig
+from src.core.redis_client import redis_sync
+
+logger = logging.getLogger(__name__)
+
+
+class PoolRefresher:
+  """
+  Bookkeeping for building artist pools ahead of requests.
+
+  Requests record which genres they use ("pool:hits" counts, "pool:access"
+  last use) and ask for a rebuild of pools older than PoolConfig.refresh_after
+  ("pool:refresh"). They keep serving the old pool meanwhile. src/scripts/pool_refresher.py
+  rebuilds the requested pools and those of the most used and recently used
+  genres before they age out, and sets "pool:refresher" while it runs.
+  """
+  hits_key = "pool:hits"
+  access_key = "pool:access"
+  built_key = "pool:built"
+  refresh_key = "pool:refresh"
+  heartbeat_key = "pool:refresher"
+
+  def __init__(self):
+    self.redis = redis_sync
+
+  def touch(self, genre_ids: Iterable[int]):
+    now = time.time()
+    with self.redis.pipeline(transaction=False) as pipe:
+      for genre_id in genre_ids:
+        pipe.zincrby(self.hits_key, 1, genre_id)
+        pipe.zadd(self.access_key, {genre_id: now})
+      pipe.execute()
+
+  def built(self, genre_id: int, built_at: float):
+    self.redis.zadd(self.built_key, {genre_id: built_at})
+
+  def built_at(self, genre_ids: List[int]) -> List[Optional[float]]:
+    """When the stored pools of the genres were built, None where no pool was."""
+    if not genre_ids:
+      return []
+    return self.redis.zmscore(self.built_key, genre_ids)
+
+  @staticmethod
+  def is_stale(built_at: float) -> bool:
+    return time.time() - built_at > PoolConfig.refresh_after
+
+  def request(self, genre_ids: Iterable[int]):
+    genre_ids = list(genre_ids)
+    if genre_ids:
+      self.redis.sadd(self.refresh_key, *genre_ids)
+
+  def alive(self) -> bool:
+    return bool(self.redis.exists(self.heartbeat_key))
+
+  def heartbeat(self):
+    self.redis.setex(self.heartbeat_key, PoolConfig.heartbeat_ttl, int(time.time()))
+
+  def due(self) -> List[int]:
+    """Requested genres first, then warm genres whose pool is missing or stale."""
+    now = time.time()
+    with self.redis.pipeline(transaction=False) as pipe:
+      pipe.spop(self.refresh_key, 10000)
+      pipe.zrevrange(self.hits_key, 0, PoolConfig.warm_genres - 1)
+      pipe.zrangebyscore(self.access_key, now - PoolConfig.recent_window, "+inf")
+      pipe.zremrangebyscore(self.access_key, "-inf", now - PoolConfig.recent_window)
+      # keep the hit counts of the genres that can still get warm
+      pipe.zremrangebyrank(self.hits_key, 0, -10 * PoolConfig.warm_genres - 1)
+      requested, hot, recent, _, _ = pipe.execute()
+
+    warm = list(dict.fromkeys(int(genre_id) for genre_id in hot + recent))
+    with self.redis.pipeline(transaction=False) as pipe:
+      for genre_id in warm:
+        pipe.zscore(self.built_key, genre_id)
+      built = pipe.execute()
+
+    due = [int(genre_id) for genre_id in requested]
+    due += [
+      genre_id for genre_id, built_at in zip(warm, built)
+      if genre_id not in due and (built_at is None or self.is_stale(built_at))
+    ]
+    return due
+
+
+pool_refresher = PoolRefresher()
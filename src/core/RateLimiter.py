@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional
+
+from spotipy import SpotifyException
+
+from src.config import SpotifyConfig
+from src.core.redis_client import redis_client, redis_sync
+
+logger = logging.getLogger(__name__)
+
+Priority = Literal["interactive", "background"]
+
+# Token bucket shared by all workers. Returns 0 if a token was taken,
+# otherwise the number of milliseconds to wait before trying again.
+TAKE_TOKEN = """
+local blocked = redis.call('pttl', KEYS[2])
+if blocked > 0 then
+  return blocked
+end
+
+local t = redis.call('time')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate / 1000)
+
+local wait = 0
+if tokens - 1 >= reserve then
+  tokens = tokens - 1
+else
+  wait = math.ceil((reserve + 1 - tokens) * 1000 / rate)
+end
+
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('pexpire', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+# Blocks the bucket for ARGV[1] ms, unless it is blocked for longer already
+BLOCK = """
+if redis.call('pttl', KEYS[1]) < tonumber(ARGV[1]) then
+  redis.call('set', KEYS[1], 1, 'px', ARGV[1])
+end
+return 0
+"""
+
+
+class SpotifyRateLimiter:
+  """
+  Global rate limit for Spotify Web API calls across all uvicorn workers.
+
+  Tokens are taken from a Redis token bucket. Background calls may only take
+  a token while more than SpotifyConfig.background_reserve of the burst is
+  left, so interactive requests always go first. A 429 blocks the bucket for
+  all workers for the duration of its Retry-After header, also when the call
+  is not retried; 429s and 5xx errors are retried with jittered backoff.
+  """
+  bucket_key = "spotify:ratelimit:bucket"
+  block_key = "spotify:ratelimit:blocked"
+
+  def __init__(self):
+    self._take_sync = redis_sync.register_script(TAKE_TOKEN)
+    self._take_async = redis_client.register_script(TAKE_TOKEN)
+    self._block_sync = redis_sync.register_script(BLOCK)
+    self._block_async = redis_client.register_script(BLOCK)
+    self._stats: Dict[str, int] = defaultdict(int)
+
+  def _args(self, priority: Priority) -> list:
+    reserve = SpotifyConfig.rate_burst * SpotifyConfig.background_reserve if priority == "background" else 0
+    return [SpotifyConfig.rate_limit, SpotifyConfig.rate_burst, reserve]
+
+  @staticmethod
+  def _jitter(delay: float) -> float:
+    return delay * random.uniform(0.5, 1.5)
+
+  def _retry_after(self, e: SpotifyException, attempt: int) -> Optional[float]:
+    """Seconds Spotify asks all callers to wait after a 429, None for other errors."""
+    if e.http_status != 429:
+      return None
+    self._stats["rate_limited"] += 1
+    retry_after = (e.headers or {}).get("Retry-After")
+    return float(retry_after) if retry_after else SpotifyConfig.retry_backoff * 2 ** attempt
+
+  def _retry_delay(self, e: SpotifyException, attempt: int, retry_after: Optional[float]) -> Optional[float]:
+    """Seconds to wait before retrying a failed call, None if it should not be retried."""
+    if attempt >= SpotifyConfig.max_retries:
+      return None
+
+    if retry_after is not None:
+      delay = retry_after + random.uniform(0, 1)
+    elif e.http_status and e.http_status >= 500:
+      delay = self._jitter(SpotifyConfig.retry_backoff * 2 ** attempt)
+    else:
+      return None
+
+    return delay if delay <= SpotifyConfig.max_retry_wait else None
+
+  def _block_all(self, delay: float):
+    self._block_sync(keys=[self.block_key], args=[int(delay * 1000)])
+
+  async def _ablock_all(self, delay: float):
+    await self._block_async(keys=[self.block_key], args=[int(delay * 1000)])
+
+  def acquire(self, priority: Priority = "interactive"):
+    while True:
+      wait = self._take_sync(keys=[self.bucket_key, self.block_key], args=self._args(priority))
+      if not wait:
+        self._stats[f"{priority}_granted"] += 1
+        return
+      self._stats[f"{priority}_throttled"] += 1
+      time.sleep(self._jitter(wait / 1000))
+
+  async def aacquire(self, priority: Priority = "interactive"):
+    while True:
+      wait = await self._take_async(keys=[self.bucket_key, self.block_key], args=self._args(priority))
+      if not wait:
+        self._stats[f"{priority}_granted"] += 1
+        return
+      self._stats[f"{priority}_throttled"] += 1
+      await asyncio.sleep(self._jitter(wait / 1000))
+
+  def call(self, fn: Callable[..., Any], *args, priority: Priority = "interactive", **kwargs) -> Any:
+    """Call a blocking Spotipy method under the rate limit, retrying on 429/5xx."""
+    attempt = 0
+    while True:
+      self.acquire(priority)
+      try:
+        return fn(*args, **kwargs)
+      except SpotifyException as e:
+        retry_after = self._retry_after(e, attempt)
+        if retry_after is not None:
+          # before deciding on a retry: the longest bans are the ones not retried
+          self._block_all(retry_after)
+        delay = self._retry_delay(e, attempt, retry_after)
+        if delay is None:
+          self._stats["failed"] += 1
+          raise
+        logger.warning(f"Spotify returned {e.http_status}, retrying in {delay:.1f}s ({priority})")
+        self._stats["retries"] += 1
+        attempt += 1
+        time.sleep(delay)
+
+  async def acall(self, fn: Callable[..., Awaitable[Any]], *args, priority: Priority = "interactive", **kwargs) -> Any:
+    """Await fn under the rate limit, retrying on 429/5xx."""
+    attempt = 0
+    while True:
+      await self.aacquire(priority)
+      try:
+        return await fn(*args, **kwargs)
+      except SpotifyException as e:
+        retry_after = self._retry_after(e, attempt)
+        if retry_after is not None:
+          # before deciding on a retry: the longest bans are the ones not retried
+          await self._ablock_all(retry_after)
+        delay = self._retry_delay(e, attempt, retry_after)
+        if delay is None:
+          self._stats["failed"] += 1
+          raise
+        logger.warning(f"Spotify returned {e.http_status}, retrying in {delay:.1f}s ({priority})")
+        self._stats["retries"] += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+  def stats(self) -> dict:
+    return dict(self._stats)
+
+
+rate_limiter = SpotifyRateLimiter()
@@ -0,0 +1,36 @@
+import json
+import logging
+from typing import Tuple, Union
+
+from src.core.CacheCodec import msgpack
+
+logger = logging.getLogger(__name__)
+
+# Session payloads: SESSION_MAGIC, one version byte, one format byte, the document.
+# Untagged payloads are the original model_dump_json of SessionData (version 0).
+SESSION_MAGIC = b"\x00RS"
+VERSION = 1
+MSGPACK, JSON = b"m", b"j"
+
+
+def encode(doc: dict) -> bytes:
+  """Versioned binary session document, msgpack if installed, else compact JSON."""
+  if msgpack is not None:
+    return SESSION_MAGIC + bytes([VERSION]) + MSGPACK + msgpack.packb(doc, use_bin_type=True)
+  return SESSION_MAGIC + bytes([VERSION]) + JSON + json.dumps(doc, separators=(",", ":")).encode()
+
+
+def decode(data: Union[str, bytes]) -> Tuple[int, dict]:
+  """The format version and document of a stored session."""
+  if isinstance(data, str):
+    data = data.encode()
+  if not data.startswith(SESSION_MAGIC):
+    return 0, json.loads(data)
+
+  header = len(SESSION_MAGIC)
+  version, fmt, payload = data[header], data[header + 1:header + 2], data[header + 2:]
+  if version > VERSION:
+    raise ValueError(f"Unknown session format version {version}")
+  if fmt == MSGPACK:
+    return version, msgpack.unpackb(payload, raw=False, strict_map_key=False)
+  return version, json.loads(payload)
@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from src.config import CacheConfig, SpotifyConfig
+from src.core.redis_client import redis_client, redis_sync
+
+FetchMany = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+SyncFetchMany = Callable[[List[str]], Dict[str, Any]]
+
+# A fetch may sit in the rate limiter for up to max_retry_wait before its call
+# goes out; the lock has to outlive that or other workers fetch the key as well.
+LOCK_TTL_MS = int(SpotifyConfig.max_retry_wait * 1000) + CacheConfig.lock_ttl_ms
+
+RELEASE_LOCKS = """
+local released = 0
+for i, key in ipairs(KEYS) do
+  if redis.call('get', key) == ARGV[1] then
+    released = released + redis.call('del', key)
+  end
+end
+return released
+"""
+
+
+class BaseSingleFlight:
+  """Lock naming and counters shared by the sync and async single-flight."""
+  _stats = defaultdict(int)
+
+  def __init__(self, redis, lock_ttl_ms: int, poll_interval_ms: int):
+    self.redis = redis
+    self.lock_ttl_ms = lock_ttl_ms
+    self.poll_interval = poll_interval_ms / 1000
+    self._release = self.redis.register_script(RELEASE_LOCKS)
+
+  @staticmethod
+  def lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+  def stats(self) -> dict:
+    """Counters of both the sync and async single-flight of this worker."""
+    fetched = self._stats["fetched"]
+    coalesced = self._stats["coalesced_local"] + self._stats["coalesced_remote"]
+    return {
+      **{name: self._stats[name] for name in ("fetched", "coalesced_local", "coalesced_remote", "remote_timeouts")},
+      "coalesced_rate": round(coalesced / max(fetched + coalesced, 1), 4),
+    }
+
+
+class AsyncSingleFlight(BaseSingleFlight):
+  """
+  Coalesces concurrent cache misses so only one caller fetches a key.
+
+  Inside a worker, callers missing a key that is already being fetched await
+  the running fetch. Across workers, the fetching caller holds a short-lived
+  Redis lock "lock:{key}"; others poll the cache until the value appears, and
+  fetch it themselves only if the lock expires without a result.
+  """
+
+  def __init__(self, lock_ttl_ms: int, poll_interval_ms: int):
+    super().__init__(redis_client, lock_ttl_ms, poll_interval_ms)
+    self._inflight: Dict[str, asyncio.Future] = {}
+
+  async def _acquire(self, keys: List[str], token: str) -> Tuple[List[str], List[str]]:
+    async with self.redis.pipeline(transaction=False) as pipe:
+      for key in keys:
+        pipe.set(self.lock_key(key), token, nx=True, px=self.lock_ttl_ms)
+      acquired = await pipe.execute()
+    owned = [key for key, ok in zip(keys, acquired) if ok]
+    others = [key for key, ok in zip(keys, acquired) if not ok]
+    return owned, others
+
+  async def _wait_remote(self, keys: List[str], load: FetchMany) -> Dict[str, Any]:
+    """Poll the cache until other workers have stored the keys or their locks are gone."""
+    results = {}
+    pending = list(keys)
+    deadline = time.monotonic() + self.lock_ttl_ms / 1000
+    while pending and time.monotonic() < deadline:
+      await asyncio.sleep(self.poll_interval)
+      results.update(await load(pending))
+      pending = [key for key in pending if key not in results]
+      if pending:
+        locked = await self.redis.exists(*(self.lock_key(key) for key in pending))
+        if locked == 0:
+          break
+    return results
+
+  async def do_many(self, keys: List[str], fetch: FetchMany, load: FetchMany) -> Dict[str, Any]:
+    """
+    Resolve cache misses for keys with at most one fetch per key.
+
+    fetch(keys) must fetch, store and return the values; load(keys) returns the
+    values that are already cached. Keys without a value map to None.
+    """
+    loop = asyncio.get_running_loop()
+    joined = {key: self._inflight[key] for key in dict.fromkeys(keys) if key in self._inflight}
+    own = [key for key in dict.fromkeys(keys) if key not in joined]
+    futures = {key: loop.create_future() for key in own}
+    self._inflight.update(futures)
+
+    results = {}
+    owned = []
+    token = uuid.uuid4().hex
+    try:
+      if own:
+        owned, others = await self._acquire(own, token)
+        if owned:
+          # another worker may have stored the value between our miss and the lock
+          results.update(await load(owned))
+          missing = [key for key in owned if key not in results]
+          if missing:
+            self._stats["fetched"] += len(missing)
+            results.update(await fetch(missing))
+        if others:
+          self._stats["coalesced_remote"] += len(others)
+          results.update(await self._wait_remote(others, load))
+          timed_out = [key for key in others if key not in results]
+          if timed_out:
+            self._stats["remote_timeouts"] += len(timed_out)
+            results.update(await fetch(timed_out))
+    finally:
+      if owned:
+        await self._release(keys=[self.lock_key(key) for key in owned], args=[token])
+      for key, future in futures.items():
+        self._inflight.pop(key, None)
+        if not future.done():
+          future.set_result(results.get(key))
+
+    if joined:
+      self._stats["coalesced_local"] += len(joined)
+      for key, future in joined.items():
+        results[key] = await asyncio.shield(future)
+
+    return {key: results.get(key) for key in keys}
+
+  async def do(self, key: str, fetch: Callable[[], Awaitable[Any]], load: Callable[[], Awaitable[Any]]) -> Any:
+    """Single-key variant of do_many."""
+    async def fetch_one(_):
+      return {key: await fetch()}
+
+    async def load_one(_):
+      value = await load()
+      return {} if value is None else {key: value}
+
+    return (await self.do_many([key], fetch_one, load_one))[key]
+
+
+class SingleFlight(BaseSingleFlight):
+  """
+  Blocking counterpart of AsyncSingleFlight for the sync SpotifyCache.
+
+  Threads of a worker missing a key that another thread is fetching wait for
+  its result; across workers the same Redis locks are used, so sync and async
+  callers coalesce with each other.
+  """
+
+  def __init__(self, lock_ttl_ms: int, poll_interval_ms: int):
+    super().__init__(redis_sync, lock_ttl_ms, poll_interval_ms)
+    self._inflight: Dict[str, Future] = {}
+    self._mutex = threading.Lock()
+
+  def _acquire(self, keys: List[str], token: str) -> Tuple[List[str], List[str]]:
+    with self.redis.pipeline(transaction=False) as pipe:
+      for key in keys:
+        pipe.set(self.lock_key(key), token, nx=True, px=self.lock_ttl_ms)
+      acquired = pipe.execute()
+    owned = [key for key, ok in zip(keys, acquired) if ok]
+    others = [key for key, ok in zip(keys, acquired) if not ok]
+    return owned, others
+
+  def _wait_remote(self, keys: List[str], load: SyncFetchMany) -> Dict[str, Any]:
+    """Poll the cache until other workers have stored the keys or their locks are gone."""
+    results = {}
+    pending = list(keys)
+    deadline = time.monotonic() + self.lock_ttl_ms / 1000
+    while pending and time.monotonic() < deadline:
+      time.sleep(self.poll_interval)
+      results.update(load(pending))
+      pending = [key for key in pending if key not in results]
+      if pending and self.redis.exists(*(self.lock_key(key) for key in pending)) == 0:
+        break
+    return results
+
+  def do_many(self, keys: List[str], fetch: SyncFetchMany, load: SyncFetchMany) -> Dict[str, Any]:
+    """Blocking do_many, see AsyncSingleFlight.do_many."""
+    with self._mutex:
+      joined = {key: self._inflight[key] for key in dict.fromkeys(keys) if key in self._inflight}
+      futures = {key: Future() for key in dict.fromkeys(keys) if key not in joined}
+      self._inflight.update(futures)
+    own = list(futures)
+
+    results = {}
+    owned = []
+    token = uuid.uuid4().hex
+    try:
+      if own:
+        owned, others = self._acquire(own, token)
+        if owned:
+          results.update(load(owned))
+          missing = [key for key in owned if key not in results]
+          if missing:
+            self._stats["fetched"] += len(missing)
+            results.update(fetch(missing))
+        if others:
+          self._stats["coalesced_remote"] += len(others)
+          results.update(self._wait_remote(others, load))
+          timed_out = [key for key in others if key not in results]
+          if timed_out:
+            self._stats["remote_timeouts"] += len(timed_out)
+            results.update(fetch(timed_out))
+    finally:
+      if owned:
+        self._release(keys=[self.lock_key(key) for key in owned], args=[token])
+      with self._mutex:
+        for key in futures:
+          self._inflight.pop(key, None)
+      for key, future in futures.items():
+        future.set_result(results.get(key))
+
+    if joined:
+      self._stats["coalesced_local"] += len(joined)
+      for key, future in joined.items():
+        results[key] = future.result()
+
+    return {key: results.get(key) for key in keys}
+
+  def do(self, key: str, fetch: Callable[[], Any], load: Callable[[], Any]) -> Any:
+    """Single-key variant of do_many."""
+    def load_one(_):
+      value = load()
+      return {} if value is None else {key: value}
+
+    return self.do_many([key], lambda _: {key: fetch()}, load_one)[key]
+
+
+single_flight = AsyncSingleFlight(lock_ttl_ms=LOCK_TTL_MS, poll_interval_ms=CacheConfig.lock_poll_ms)
+sync_single_flight = SingleFlight(lock_ttl_ms=LOCK_TTL_MS, poll_interval_ms=CacheConfig.lock_poll_ms)
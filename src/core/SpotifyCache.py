@@ -1,11 +1,16 @@
-import json
+import asyncio
+import weakref
 from pydantic import BaseModel, Field
 from spotipy import SpotifyException
-from typing import List, Literal, Optional, Type
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Type, Union
 import logging
 
 from src.config import CacheConfig, SpotifyConfig
-from src.core.redis_client import redis_sync
+from src.core.LocalCache import local_cache
+from src.core.SingleFlight import single_flight, sync_single_flight
+from src.core.RateLimiter import Priority, rate_limiter
+from src.core.redis_client import redis_client_raw, redis_sync_raw
+from src.core.CacheCodec import CacheCodec, get_codec, decode as decode_cached
 from src.core.spotify_client import SpotifyClient, SpotifyUserClient
 
 logger = logging.getLogger(__name__)
@@ -124,20 +129,84 @@ class DataConverter:
       images=DataConverter.to_image_objects(user_data['images'])
     )
 
+  codec: CacheCodec = get_codec(CacheConfig.codec)
+
+  @classmethod
+  def serialize(cls, items: List[BaseModel]) -> bytes:
+    return cls.codec.encode(items)
+
   @staticmethod
-  def serialize(items: List[BaseModel]) -> str:
-    return json.dumps([item.model_dump() for item in items])
+  def deserialize(cls: Type[BaseModel], data: Union[str, bytes]) -> List[BaseModel]:
+    return decode_cached(cls, data)
+
+  @classmethod
+  def serialize_one(cls, item: BaseModel) -> bytes:
+    return cls.codec.encode([item])
 
   @staticmethod
-  def deserialize(cls: Type[BaseModel], data: str) -> List[BaseModel]:
-    return [cls.model_validate(item) for item in json.loads(data)]
+  def deserialize_one(cls: Type[BaseModel], data: Union[str, bytes]) -> Optional[BaseModel]:
+    items = decode_cached(cls, data)
+    return items[0] if items else None
 
 
 class SpotifyCache:
-  def __init__(self):
-    self.redis = redis_sync
+  """
+  Blocking Spotify lookups cached in Redis and the in-process cache.
+
+  Concurrent misses of the same key, from threads of this worker or from other
+  workers, are fetched once, see SingleFlight.
+  """
+
+  def __init__(self, priority: Priority = "interactive"):
+    self.redis = redis_sync_raw
     self.spotify = SpotifyClient().get_spotify_client()
     self.converter = DataConverter()
+    self.priority = priority
+
+  def _call(self, fn, *args, **kwargs):
+    """Call Spotipy under the global rate limit."""
+    return rate_limiter.call(fn, *args, priority=self.priority, **kwargs)
+
+  def _load(self, key: str, decode: Callable[[str], Any], ttl: int):
+    """Look up a key in the local cache first, then in Redis."""
+    value = local_cache.get(key)
+    if value is not None:
+      return value
+
+    data = self.redis.get(key)
+    if data:
+      value = decode(data)
+      local_cache.set(key, value, ttl)
+      return value
+    return None
+
+  def _store(self, key: str, value, data: str, ttl: int):
+    self.redis.setex(key, ttl, data)
+    local_cache.set(key, value, ttl)
+
+  def _load_many(self, keys: List[str], decode: Callable[[str], Any], ttl: int) -> Dict[str, Any]:
+    """Look up keys in the local cache, then fetch the rest with a single MGET."""
+    found = local_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if not missing:
+      return found
+
+    for key, data in zip(missing, self.redis.mget(missing)):
+      if data:
+        found[key] = decode(data)
+        local_cache.set(key, found[key], ttl)
+    return found
+
+  def _store_many(self, entries: List[tuple]):
+    """Write (key, value, data, ttl) entries through a single Redis pipeline."""
+    if not entries:
+      return
+    with self.redis.pipeline(transaction=False) as pipe:
+      for key, _, data, ttl in entries:
+        pipe.setex(key, ttl, data)
+      pipe.execute()
+    for key, value, _, ttl in entries:
+      local_cache.set(key, value, ttl)
 
   def get_current_user(self, session_id: str) -> Optional[SpotifyUser]:
     key = f"spotify:user:{session_id}"
@@ -162,166 +231,497 @@ class SpotifyCache:
 
   def get_track(self, track_id: str) -> Optional[Track]:
     key = f"track:{track_id}"
-    data = self.redis.get(key)
-    if data:
-        return Track.model_validate_json(data)
-    try:
+    load = lambda: self._load(key, lambda d: self.converter.deserialize_one(Track, d), CacheConfig.single_object)
+    cached = load()
+    if cached:
+      return cached
+
+    def fetch() -> Optional[Track]:
+      try:
         logger.info(f"Caching Track: {track_id}")
-        track = self.spotify.track(track_id)
-        data = self.converter.to_track(track)
-        self.redis.setex(key, CacheConfig.single_object, data.model_dump_json())
+        data = self.converter.to_track(self._call(self.spotify.track, track_id))
+        self._store(key, data, self.converter.serialize_one(data), CacheConfig.single_object)
         return data
-    except SpotifyException as e:
+      except SpotifyException as e:
         logger.warning(f"SpotifyException in get_track: {e}")
-    except Exception as e:
+      except Exception as e:
         logger.error(f"Unhandled error in get_track: {e}")
-    return None
+      return None
+
+    return sync_single_flight.do(key, fetch, load)
 
   def get_album(self, album_id: str) -> Optional[Album]:
     key = f"album:{album_id}"
-    data = self.redis.get(key)
-    if data:
-      return Album.model_validate_json(data)
+    load = lambda: self._load(key, lambda d: self.converter.deserialize_one(Album, d), CacheConfig.single_object)
+    cached = load()
+    if cached:
+      return cached
 
-    try:
-      logger.info(f"Caching Album: {album_id}")
-      album = self.spotify.album(album_id)
-      data = self.converter.to_album(album)
-      self.redis.setex(key, CacheConfig.single_object, data.model_dump_json())
-      return data
-    except SpotifyException as e:
+    def fetch() -> Optional[Album]:
+      try:
+        logger.info(f"Caching Album: {album_id}")
+        data = self.converter.to_album(self._call(self.spotify.album, album_id))
+        self._store(key, data, self.converter.serialize_one(data), CacheConfig.single_object)
+        return data
+      except SpotifyException as e:
         logger.warning(f"SpotifyException in get_album: {e}")
-    except Exception as e:
+      except Exception as e:
         logger.error(f"Unhandled error in get_album: {e}")
-    return None
+      return None
+
+    return sync_single_flight.do(key, fetch, load)
 
   def get_artist(self, artist_id: str) -> Optional[Artist]:
     key = f"artist:{artist_id}"
-    data = self.redis.get(key)
-    if data:
-      return Artist.model_validate_json(data)
+    load = lambda: self._load(key, lambda d: self.converter.deserialize_one(Artist, d), CacheConfig.single_object)
+    cached = load()
+    if cached:
+      return cached
 
-    try:
-      logger.info(f"Caching Artist: {artist_id}")
-      artist = self.spotify.artist(artist_id)
-      data = self.converter.to_artist(artist)
-      self.redis.setex(key, CacheConfig.single_object, data.model_dump_json())
-      return data
-    except SpotifyException as e:
-      logger.warning(f"SpotifyException in get_artist: {e}")
-    except Exception as e:
-      logger.error(f"Unhandled error in get_artist: {e}")
-    return None
+    def fetch() -> Optional[Artist]:
+      try:
+        logger.info(f"Caching Artist: {artist_id}")
+        data = self.converter.to_artist(self._call(self.spotify.artist, artist_id))
+        self._store(key, data, self.converter.serialize_one(data), CacheConfig.single_object)
+        return data
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_artist: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_artist: {e}")
+      return None
+
+    return sync_single_flight.do(key, fetch, load)
+
+  def _get_batched(self, ids: List[str], kind: str, model: Type[SpotifyModel],
+                   fetch_batch: Callable[[List[str]], List[dict]], convert: Callable[[dict], SpotifyModel],
+                   batch_size: int) -> List[SpotifyModel]:
+    """
+    Objects by id with one MGET. Misses are fetched in batches, each batch
+    under its own single-flight locks so a lock covers a single Spotify call.
+    """
+    keys = [f"{kind}:{oid}" for oid in ids]
+    load = lambda k: self._load_many(k, lambda d: self.converter.deserialize_one(model, d), CacheConfig.single_object)
+    found = load(keys)
+
+    def fetch(missing_keys: List[str]) -> Dict[str, SpotifyModel]:
+      batch = [key.removeprefix(f"{kind}:") for key in missing_keys]
+      logger.info(f"Caching {kind.capitalize()} Batch: {batch}")
+      try:
+        fetched = {f"{kind}:{obj.id}": obj for obj in map(convert, filter(None, fetch_batch(batch)))}
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_{kind}s: {e}")
+        return {}
+      self._store_many([
+        (key, obj, self.converter.serialize_one(obj), CacheConfig.single_object)
+        for key, obj in fetched.items()
+      ])
+      return fetched
+
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+    for i in range(0, len(missing), batch_size):
+      found.update(sync_single_flight.do_many(missing[i:i + batch_size], fetch, load))
+
+    return [found[key] for key in keys if found.get(key)]
 
   def get_albums(self, album_ids: List[str]) -> List[Album]:
-    keys = [f"album:{aid}" for aid in album_ids]
-    cached_data = self.redis.mget(keys)
+    return self._get_batched(
+      album_ids, "album", Album,
+      lambda batch: self._call(self.spotify.albums, batch)['albums'],
+      self.converter.to_album, SpotifyConfig.max_album_batch
+    )
 
-    results = []
-    uncached_ids = []
+  def get_artists(self, artist_ids: List[str]) -> List[Artist]:
+    return self._get_batched(
+      artist_ids, "artist", Artist,
+      lambda batch: self._call(self.spotify.artists, batch)['artists'],
+      self.converter.to_artist, SpotifyConfig.max_artist_batch
+    )
 
-    for album_id, data in zip(album_ids, cached_data):
-      if data:
-        results.append(Album.model_validate_json(data))
-      else:
-        uncached_ids.append(album_id)
+  def get_top_tracks(self, artist_id: str) -> List[Track]:
+    key = f"artist:top_tracks:{artist_id}"
+    load = lambda: self._load(key, lambda d: self.converter.deserialize(Track, d), CacheConfig.top_tracks)
+    cached = load()
+    if cached is not None:
+      return cached
 
-    for i in range(0, len(uncached_ids), SpotifyConfig.max_album_batch):
-      batch = uncached_ids[i:i+SpotifyConfig.max_album_batch]
-      logger.info(f"Caching Album Batch: {batch}")
+    def fetch() -> Optional[List[Track]]:
       try:
-        fetched = self.spotify.albums(batch)['albums']
-        converted = [self.converter.to_album(a) for a in fetched]
-        for album in converted:
-          self.redis.setex(f"album:{album.id}", CacheConfig.single_object, album.model_dump_json())
-        results.extend(converted)
+        logger.info(f"Caching Top Tracks: {artist_id}")
+        items = self._call(self.spotify.artist_top_tracks, artist_id)['tracks']
+        data = [self.converter.to_track(t) for t in items]
+        self._store(key, data, self.converter.serialize(data), CacheConfig.top_tracks)
+        return data
       except SpotifyException as e:
-        logger.warning(f"SpotifyException in get_albums: {e}")
-        continue
+        logger.warning(f"SpotifyException in get_top_tracks: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_top_tracks: {e}")
+      return None
 
-    return results
+    return sync_single_flight.do(key, fetch, load) or []
 
-  def get_artists(self, artist_ids: List[str]) -> List[Artist]:
-    keys = [f"artist:{aid}" for aid in artist_ids]
-    cached_data = self.redis.mget(keys)
+  def get_releases(self, artist_id: str) -> List[Album]:
+    key = f"artist:releases:{artist_id}"
+    load = lambda: self._load(key, lambda d: self.converter.deserialize(Album, d), CacheConfig.releases)
+    cached = load()
+    if cached is not None:
+      return cached
 
-    results = []
-    uncached_ids = []
+    def fetch() -> Optional[List[Album]]:
+      try:
+        logger.info(f"Caching Releases: {artist_id}")
+        items = self._call(
+          self.spotify.artist_albums,
+          artist_id,
+          include_groups='album,compilation,single,ep'
+        )['items']
+        data = [self.converter.to_album(a) for a in items]
+        self._store(key, data, self.converter.serialize(data), CacheConfig.releases)
+        return data
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_releases: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_releases: {e}")
+      return None
 
-    for artist_id, data in zip(artist_ids, cached_data):
-      if data:
-        results.append(Artist.model_validate_json(data))
-      else:
-        uncached_ids.append(artist_id)
+    return sync_single_flight.do(key, fetch, load) or []
 
-    for i in range(0, len(uncached_ids), SpotifyConfig.max_artist_batch):
-      batch = uncached_ids[i:i+SpotifyConfig.max_artist_batch]
-      logger.info(f"Caching Artist Batch: {batch}")
+  def get_album_tracks(self, album_id: str) -> List[Track]:
+    key = f"album:tracks:{album_id}"
+    load = lambda: self._load(key, lambda d: self.converter.deserialize(Track, d), CacheConfig.album_tracks)
+    cached = load()
+    if cached is not None:
+      return cached
+
+    def fetch() -> Optional[List[Track]]:
       try:
-        fetched = self.spotify.artists(batch)['artists']
-        converted = [self.converter.to_artist(a) for a in fetched]
-        for artist in converted:
-          self.redis.setex(f"artist:{artist.id}", CacheConfig.single_object, artist.model_dump_json())
-        results.extend(converted)
+        logger.info(f"Caching Album Tracks: {album_id}")
+        items = self._call(self.spotify.album_tracks, album_id)['items']
+        data = [self.converter.to_track(t, album_id) for t in items]
+        self._store(key, data, self.converter.serialize(data), CacheConfig.album_tracks)
+        return data
       except SpotifyException as e:
-        logger.warning(f"SpotifyException in get_artists: {e}")
-        continue
+        logger.warning(f"SpotifyException in get_album_tracks: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_album_tracks: {e}")
+      return None
 
-    return results
+    return sync_single_flight.do(key, fetch, load) or []
 
-  def get_top_tracks(self, artist_id: str) -> List[Track]:
-    key = f"artist:top_tracks:{artist_id}"
-    data = self.redis.get(key)
+
+class AsyncSpotifyCache:
+  """Non-blocking counterpart of SpotifyCache for use inside async routes.
+
+  Redis is accessed through the asyncio client, Spotipy calls run in worker
+  threads. At most SpotifyConfig.max_concurrency Spotify requests are in
+  flight per event loop.
+  """
+  _semaphores = weakref.WeakKeyDictionary()
+
+  def __init__(self, priority: Priority = "interactive"):
+    self.redis = redis_client_raw
+    self.spotify = SpotifyClient().get_spotify_client()
+    self.converter = DataConverter()
+    self.priority = priority
+
+  @classmethod
+  def _semaphore(cls) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = cls._semaphores.get(loop)
+    if semaphore is None:
+      semaphore = asyncio.Semaphore(SpotifyConfig.max_concurrency)
+      cls._semaphores[loop] = semaphore
+    return semaphore
+
+  async def _run(self, fn, *args, **kwargs):
+    async with self._semaphore():
+      return await asyncio.to_thread(fn, *args, **kwargs)
+
+  async def _call(self, fn, *args, **kwargs):
+    """Run a blocking Spotipy call in a thread, bounded by the semaphore and the global rate limit."""
+    return await rate_limiter.acall(self._run, fn, *args, priority=self.priority, **kwargs)
+
+  async def _load(self, key: str, decode: Callable[[str], Any], ttl: int):
+    """Look up a key in the local cache first, then in Redis."""
+    value = local_cache.get(key)
+    if value is not None:
+      return value
+
+    data = await self.redis.get(key)
     if data:
-      return self.converter.deserialize(Track, data)
+      value = decode(data)
+      local_cache.set(key, value, ttl)
+      return value
+    return None
+
+  async def _store(self, key: str, value, data: str, ttl: int):
+    await self.redis.setex(key, ttl, data)
+    local_cache.set(key, value, ttl)
+
+  async def _load_many(self, keys: List[str], decode: Callable[[str], Any], ttl: int) -> Dict[str, Any]:
+    """Look up keys in the local cache, then fetch the rest with a single MGET."""
+    found = local_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if not missing:
+      return found
+
+    for key, data in zip(missing, await self.redis.mget(missing)):
+      if data:
+        found[key] = decode(data)
+        local_cache.set(key, found[key], ttl)
+    return found
+
+  async def _store_many(self, entries: List[tuple]):
+    """Write (key, value, data, ttl) entries through a single Redis pipeline."""
+    if not entries:
+      return
+    async with self.redis.pipeline(transaction=False) as pipe:
+      for key, _, data, ttl in entries:
+        pipe.setex(key, ttl, data)
+      await pipe.execute()
+    for key, value, _, ttl in entries:
+      local_cache.set(key, value, ttl)
+
+  async def get_current_user(self, session_id: str) -> Optional[SpotifyUser]:
+    key = f"spotify:user:{session_id}"
+    data = await self.redis.get(key)
+
+    if data:
+      return SpotifyUser.model_validate_json(data)
 
     try:
-      logger.info(f"Caching Top Tracks: {artist_id}")
-      tracks = self.spotify.artist_top_tracks(artist_id)['tracks']
-      data = [self.converter.to_track(t) for t in tracks]
-      self.redis.setex(key, CacheConfig.top_tracks, self.converter.serialize(data))
+      sp = await asyncio.to_thread(SpotifyUserClient(session_id).get_spotify_client)
+      if sp is None:
+        return None
+      logger.info("Caching Spotify User")
+      data = self.converter.to_user(await self._call(sp.me))
+      await self.redis.setex(key, CacheConfig.single_object, data.model_dump_json())
       return data
     except SpotifyException as e:
-      logger.warning(f"SpotifyException in get_top_tracks: {e}")
+      logger.warning(f"SpotifyException in get_current_user: {e}")
     except Exception as e:
-      logger.error(f"Unhandled error in get_top_tracks: {e}")
-    return []
+      logger.error(f"Unhandled error in get_current_user: {e}")
+    return None
 
-  def get_releases(self, artist_id: str) -> List[Album]:
-    key = f"artist:releases:{artist_id}"
-    data = self.redis.get(key)
-    if data:
-      return self.converter.deserialize(Album, data)
+  async def get_track(self, track_id: str) -> Optional[Track]:
+    key = f"track:{track_id}"
+    cached = await self._load(key, lambda d: self.converter.deserialize_one(Track, d), CacheConfig.single_object)
+    if cached:
+      return cached
 
     try:
-      logger.info(f"Caching Releases: {artist_id}")
-      albums = self.spotify.artist_albums(
-        artist_id,
-        include_groups='album,compilation,single,ep'
-      )['items']
-      data = [self.converter.to_album(a) for a in albums]
-      self.redis.setex(key, CacheConfig.releases, self.converter.serialize(data))
+      logger.info(f"Caching Track: {track_id}")
+      track = await self._call(self.spotify.track, track_id)
+      data = self.converter.to_track(track)
+      await self._store(key, data, self.converter.serialize_one(data), CacheConfig.single_object)
       return data
     except SpotifyException as e:
-      logger.warning(f"SpotifyException in get_releases: {e}")
+      logger.warning(f"SpotifyException in get_track: {e}")
     except Exception as e:
-      logger.error(f"Unhandled error in get_releases: {e}")
-    return []
+      logger.error(f"Unhandled error in get_track: {e}")
+    return None
 
-  def get_album_tracks(self, album_id: str) -> List[Track]:
-    key = f"album:tracks:{album_id}"
-    data = self.redis.get(key)
+  async def get_tracks(self, track_ids: List[str]) -> Dict[str, Track]:
+    """
+    Tracks by id with one MGET; misses are fetched in batches of
+    SpotifyConfig.max_track_batch. Unknown ids are left out.
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    keys = [f"track:{tid}" for tid in track_ids]
+    load = lambda k: self._load_many(k, lambda d: self.converter.deserialize_one(Track, d), CacheConfig.single_object)
+    cached = await load(keys)
+
+    async def fetch_batch(batch: List[str]) -> List[dict]:
+      try:
+        logger.info(f"Caching Track Batch: {batch}")
+        return [t for t in (await self._call(self.spotify.tracks, batch))['tracks'] if t]
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_tracks: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_tracks: {e}")
+      return []
+
+    async def fetch(missing_keys: List[str]) -> Dict[str, Track]:
+      ids = [key.removeprefix("track:") for key in missing_keys]
+      batches = [
+        ids[i:i + SpotifyConfig.max_track_batch]
+        for i in range(0, len(ids), SpotifyConfig.max_track_batch)
+      ]
+      fetched = {
+        f"track:{track.id}": track
+        for tracks in await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+        for track in map(self.converter.to_track, tracks)
+      }
+      await self._store_many([
+        (key, track, self.converter.serialize_one(track), CacheConfig.single_object)
+        for key, track in fetched.items()
+      ])
+      return fetched
+
+    missing = [key for key in keys if key not in cached]
+    if missing:
+      cached.update(await single_flight.do_many(missing, fetch, load))
+
+    return {tid: cached[key] for tid, key in zip(track_ids, keys) if cached.get(key)}
+
+  def track_entries(self, tracks: List[Track], ttl: int) -> Tuple[List[tuple], Dict[str, Track]]:
+    """
+    _store_many entries making tracks resolvable by get_tracks for ttl seconds.
+    Tracks this worker has cached recently are still in Redis, possibly with a
+    shorter TTL: they are returned by key instead, to be EXPIREd to ttl.
+    """
+    tracks = {f"track:{track.id}": track for track in tracks}
+    known = local_cache.get_many(list(tracks))
+    entries = [
+      (key, track, self.converter.serialize_one(track), ttl)
+      for key, track in tracks.items() if key not in known
+    ]
+    return entries, {key: tracks[key] for key in known}
+
+  def expired_entries(self, known: Dict[str, Track], extended: List[int], ttl: int) -> List[tuple]:
+    """_store_many entries for the known tracks whose EXPIRE found no key, i.e. that left Redis meanwhile."""
+    return [
+      (key, track, self.converter.serialize_one(track), ttl)
+      for (key, track), found in zip(known.items(), extended) if not found
+    ]
+
+  async def store_tracks(self, tracks: List[Track], ttl: int):
+    entries, known = self.track_entries(tracks, ttl)
+    async with self.redis.pipeline(transaction=False) as pipe:
+      for key in known:
+        pipe.expire(key, ttl)
+      extended = await pipe.execute()
+    await self._store_many(entries + self.expired_entries(known, extended, ttl))
+
+  async def get_album(self, album_id: str) -> Optional[Album]:
+    key = f"album:{album_id}"
+    cached = await self._load(key, lambda d: self.converter.deserialize_one(Album, d), CacheConfig.single_object)
+    if cached:
+      return cached
 
-    if data:
-      return self.converter.deserialize(Track, data)
     try:
-      tracks = self.spotify.album_tracks(album_id)['items']
-      logger.info(f"Caching Album Tracks: {album_id}")
-      data = [self.converter.to_track(t, album_id) for t in tracks]
-      self.redis.setex(key, CacheConfig.album_tracks, self.converter.serialize(data))
+      logger.info(f"Caching Album: {album_id}")
+      album = await self._call(self.spotify.album, album_id)
+      data = self.converter.to_album(album)
+      await self._store(key, data, self.converter.serialize_one(data), CacheConfig.single_object)
       return data
     except SpotifyException as e:
-      logger.warning(f"SpotifyException in get_album_tracks: {e}")
+      logger.warning(f"SpotifyException in get_album: {e}")
     except Exception as e:
-      logger.error(f"Unhandled error in get_album_tracks: {e}")
-    return []
\ No newline at end of file
+      logger.error(f"Unhandled error in get_album: {e}")
+    return None
+
+  async def get_top_tracks(self, artist_id: str) -> List[Track]:
+    key = f"artist:top_tracks:{artist_id}"
+    load = lambda: self._load(key, lambda d: self.converter.deserialize(Track, d), CacheConfig.top_tracks)
+    cached = await load()
+    if cached is not None:
+      return cached
+
+    async def fetch() -> Optional[List[Track]]:
+      try:
+        logger.info(f"Caching Top Tracks: {artist_id}")
+        tracks = (await self._call(self.spotify.artist_top_tracks, artist_id))['tracks']
+        data = [self.converter.to_track(t) for t in tracks]
+        await self._store(key, data, self.converter.serialize(data), CacheConfig.top_tracks)
+        return data
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_top_tracks: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_top_tracks: {e}")
+      return None
+
+    return await single_flight.do(key, fetch, load) or []
+
+  async def get_releases(self, artist_id: str) -> List[Album]:
+    return (await self.get_releases_many([artist_id]))[artist_id]
+
+  async def get_album_tracks(self, album_id: str) -> List[Track]:
+    return (await self.get_album_tracks_many([album_id]))[album_id]
+
+  async def get_releases_many(self, artist_ids: List[str]) -> Dict[str, List[Album]]:
+    """
+    Releases of several artists with one MGET and one pipelined write.
+    Spotify has no batch endpoint for artist albums, misses are fetched concurrently.
+    Concurrent misses of the same artist are coalesced, see AsyncSingleFlight.
+    """
+    artist_ids = list(dict.fromkeys(artist_ids))
+    keys = {aid: f"artist:releases:{aid}" for aid in artist_ids}
+    load = lambda k: self._load_many(k, lambda d: self.converter.deserialize(Album, d), CacheConfig.releases)
+    cached = await load(list(keys.values()))
+
+    async def fetch_one(artist_id: str) -> Optional[List[Album]]:
+      try:
+        logger.info(f"Caching Releases: {artist_id}")
+        albums = (await self._call(
+          self.spotify.artist_albums,
+          artist_id,
+          include_groups='album,compilation,single,ep'
+        ))['items']
+        return [self.converter.to_album(a) for a in albums]
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_releases_many: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_releases_many: {e}")
+      return None
+
+    async def fetch(missing_keys: List[str]) -> Dict[str, Optional[List[Album]]]:
+      ids = [key.removeprefix("artist:releases:") for key in missing_keys]
+      fetched = dict(zip(missing_keys, await asyncio.gather(*(fetch_one(aid) for aid in ids))))
+      await self._store_many([
+        (key, releases, self.converter.serialize(releases), CacheConfig.releases)
+        for key, releases in fetched.items() if releases is not None
+      ])
+      return fetched
+
+    missing = [key for key in keys.values() if key not in cached]
+    if missing:
+      cached.update(await single_flight.do_many(missing, fetch, load))
+
+    return {aid: cached.get(keys[aid]) or [] for aid in artist_ids}
+
+  async def get_album_tracks_many(self, album_ids: List[str]) -> Dict[str, List[Track]]:
+    """
+    Tracks of several albums with one MGET and one pipelined write.
+    Misses are fetched as full albums in batches of SpotifyConfig.max_album_batch,
+    which also refreshes the cached album objects.
+    Concurrent misses of the same album are coalesced, see AsyncSingleFlight.
+    """
+    album_ids = list(dict.fromkeys(album_ids))
+    keys = {aid: f"album:tracks:{aid}" for aid in album_ids}
+    load = lambda k: self._load_many(k, lambda d: self.converter.deserialize(Track, d), CacheConfig.album_tracks)
+    cached = await load(list(keys.values()))
+
+    async def fetch_batch(batch: List[str]) -> List[dict]:
+      try:
+        logger.info(f"Caching Album Tracks Batch: {batch}")
+        return [a for a in (await self._call(self.spotify.albums, batch))['albums'] if a]
+      except SpotifyException as e:
+        logger.warning(f"SpotifyException in get_album_tracks_many: {e}")
+      except Exception as e:
+        logger.error(f"Unhandled error in get_album_tracks_many: {e}")
+      return []
+
+    async def fetch(missing_keys: List[str]) -> Dict[str, List[Track]]:
+      ids = [key.removeprefix("album:tracks:") for key in missing_keys]
+      batches = [
+        ids[i:i + SpotifyConfig.max_album_batch]
+        for i in range(0, len(ids), SpotifyConfig.max_album_batch)
+      ]
+
+      fetched = {}
+      entries = []
+      for albums in await asyncio.gather(*(fetch_batch(batch) for batch in batches)):
+        for album_data in albums:
+          album = self.converter.to_album(album_data)
+          tracks = [self.converter.to_track(t, album.id) for t in album_data['tracks']['items']]
+          fetched[f"album:tracks:{album.id}"] = tracks
+          entries.append((f"album:tracks:{album.id}", tracks, self.converter.serialize(tracks), CacheConfig.album_tracks))
+          entries.append((f"album:{album.id}", album, self.converter.serialize_one(album), CacheConfig.single_object))
+      await self._store_many(entries)
+      return fetched
+
+    missing = [key for key in keys.values() if key not in cached]
+    if missing:
+      cached.update(await single_flight.do_many(missing, fetch, load))
+
+    return {aid: cached.get(keys[aid]) or [] for aid in album_ids}
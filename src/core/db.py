@@ -1,5 +1,7 @@
 import logging
-from sqlalchemy import create_engine
+from collections import Counter
+from threading import Lock
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from src.database.models import Base
@@ -15,5 +17,28 @@ engine = create_engine(connection_string(), echo=False)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+class QueryCounter:
+  """Statements sent to the database by this worker, by their first keyword (SELECT, UPDATE, ...)."""
+
+  def __init__(self):
+    self._counts = Counter()
+    self._lock = Lock()
+
+  def __call__(self, conn, cursor, statement, parameters, context, executemany):
+    with self._lock:
+      self._counts[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+  def total(self) -> int:
+    return sum(self._counts.values())
+
+  def stats(self) -> dict:
+    with self._lock:
+      return {"total": sum(self._counts.values()), "statements": dict(self._counts)}
+
+
+query_counter = QueryCounter()
+event.listen(engine, "before_cursor_execute", query_counter)
+
 Base.metadata.create_all(engine)
 
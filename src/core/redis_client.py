@@ -2,4 +2,8 @@ import redis
 from src.config import RedisConfig
 
 redis_client = redis.asyncio.from_url(f"redis://{RedisConfig.host}:{RedisConfig.port}", decode_responses=True)
-redis_sync = redis.Redis(host=RedisConfig.host, port=RedisConfig.port, decode_responses=True)
\ No newline at end of file
+redis_sync = redis.Redis(host=RedisConfig.host, port=RedisConfig.port, decode_responses=True)
+
+# binary clients for values written by the CacheCodec
+redis_client_raw = redis.asyncio.from_url(f"redis://{RedisConfig.host}:{RedisConfig.port}", decode_responses=False)
+redis_sync_raw = redis.Redis(host=RedisConfig.host, port=RedisConfig.port, decode_responses=False)
\ No newline at end of file
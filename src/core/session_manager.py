@@ -1,15 +1,19 @@
 import uuid
-import json
 import logging
 from json import JSONDecodeError
 from fastapi import Request, Response
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from redis.exceptions import NoScriptError, ResponseError
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from src.config import SessionConfig
-from src.core.redis_client import redis_client
+from src.config import CacheConfig, SessionConfig
+from src.core import SessionCodec
+from src.core.LatencyHistogram import LatencyHistogram
+from src.core.LocalCache import local_cache
+from src.core.redis_client import redis_client_raw
+from src.core.SpotifyCache import AsyncSpotifyCache, Track
 from src.models.PlaylistEditor import PlaylistEditor
-from src.models.PlaylistFactory import PlaylistFactory
+from src.models.PlaylistFactory import PlaylistFactory, UserGenre
 
 logger = logging.getLogger("SessionManager")
 logger.setLevel(logging.DEBUG)
@@ -23,16 +27,210 @@ COOKIE_PARAMS = dict(
     max_age=SessionConfig.ttl,
 )
 
+# SessionResponse sections, versioned per session:
+# graph: genre_data and graph, artists: pools and sampled artists, factory, user
+SECTIONS = ("graph", "artists", "factory", "user")
+
+# Parts of a session a route can load; "meta" (id, genre order) is always loaded.
+PARTS = ("genres", "playlist")
+
+# Writes fields whose version is still the one that was read, all or none.
+# KEYS[1]: session hash. ARGV: ttl, number of fields, then field, expected version,
+# value ("" deletes the field and its version) per field, then number of sections, then section, increment.
+# Returns {1, field, version (0 if deleted), ..., "section:<name>", version, ...} or {0, conflicting field}.
+STORE_FIELDS = """
+if redis.call('type', KEYS[1]).ok == 'string' then
+  redis.call('del', KEYS[1])
+end
+
+local n = tonumber(ARGV[2])
+for i = 3, 2 + 3 * n, 3 do
+  local current = tonumber(redis.call('hget', KEYS[1], 'v:' .. ARGV[i]) or '0')
+  if current ~= tonumber(ARGV[i + 1]) then
+    return {0, ARGV[i]}
+  end
+end
+
+local result = {1}
+for i = 3, 2 + 3 * n, 3 do
+  table.insert(result, ARGV[i])
+  if ARGV[i + 2] == '' then
+    -- the version goes with the field, so the field can be written again from version 0
+    redis.call('hdel', KEYS[1], ARGV[i], 'v:' .. ARGV[i])
+    table.insert(result, 0)
+  else
+    redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 2])
+    table.insert(result, redis.call('hincrby', KEYS[1], 'v:' .. ARGV[i], 1))
+  end
+end
+
+local s = 3 + 3 * n
+for i = s + 1, s + 2 * tonumber(ARGV[s]), 2 do
+  table.insert(result, 'section:' .. ARGV[i])
+  table.insert(result, redis.call('hincrby', KEYS[1], 'section:' .. ARGV[i], ARGV[i + 1]))
+end
+
+redis.call('expire', KEYS[1], ARGV[1])
+return result
+"""
+
+_store_fields = redis_client_raw.register_script(STORE_FIELDS)
+
+# Time spent on session I/O per request, by operation, see /api/stats/session
+session_latency = {operation: LatencyHistogram() for operation in ("load", "store", "create")}
+
+
+class SessionConflict(Exception):
+  """A session field this request changed was changed by another request since it was loaded."""
+
+  def __init__(self, session_id: str, field: str):
+    super().__init__(f"Session {session_id} was changed concurrently: {field}")
+    self.session_id = session_id
+    self.field = field
+
 
 class SessionData(BaseModel):
   id: str
   factory: PlaylistFactory = Field(default_factory=PlaylistFactory)
   playlist: Optional[PlaylistEditor] = None
+  versions: Dict[str, int] = Field(default_factory=dict) # per SessionResponse section
+
+  # loaded parts, and the version and stored payload of every loaded field
+  _parts: Set[str] = PrivateAttr(default_factory=lambda: set(PARTS))
+  _fields: Dict[str, Tuple[int, bytes]] = PrivateAttr(default_factory=dict)
+  _genre_order: List[int] = PrivateAttr(default_factory=list)
+  _bumped: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+  def bump(self, *sections: str):
+    """Mark SessionResponse sections as changed."""
+    for section in sections:
+      self.versions[section] = self.versions.get(section, 0) + 1
+      self._bumped[section] = self._bumped.get(section, 0) + 1
+
+
+def genre_field(genre_id: int) -> str:
+  return f"genre:{genre_id}"
+
+
+def pack_tracks(doc: dict, track_lists: Iterable[Tuple[dict, str, Iterable[Track]]]) -> List[Track]:
+  """Replace track lists in doc by positions in doc["track_ids"], every id stored once."""
+  track_ids: Dict[str, int] = {}
+  tracks = []
+  for container, field, track_list in track_lists:
+    container[field] = [track_ids.setdefault(track.id, len(track_ids)) for track in track_list]
+    tracks.extend(track_list)
+  doc["track_ids"] = list(track_ids)
+  return tracks
+
+
+def encode_genre(genre: UserGenre) -> Tuple[bytes, List[Track]]:
+  doc = genre.model_dump(mode="json", exclude={"tracks": {"sampled"}})
+  # sets in a fixed order, so an unchanged genre encodes to the bytes it was loaded from
+  if doc["artists"] is not None:
+    doc["artists"]["sampled"] = sorted(doc["artists"]["sampled"])
+  track_lists = []
+  if genre.tracks is not None:
+    track_lists.append((doc["tracks"], "sampled", sorted(genre.tracks.sampled, key=lambda track: track.id)))
+  tracks = pack_tracks(doc, track_lists)
+  return SessionCodec.encode(doc), tracks
+
+
+def encode_playlist(session_data: SessionData) -> Tuple[bytes, List[Track]]:
+  doc = {}
+  track_lists = []
+  for name, playlist in (("factory", session_data.factory.playlist), ("session", session_data.playlist)):
+    doc[name] = playlist.model_dump(mode="json", exclude={"tracks"}) if playlist is not None else None
+    if playlist is not None:
+      track_lists.append((doc[name], "tracks", playlist.tracks))
+  tracks = pack_tracks(doc, track_lists)
+  return SessionCodec.encode(doc), tracks
+
+
+def encode_fields(session_data: SessionData) -> Tuple[Dict[str, bytes], List[Track]]:
+  """Hash fields of the loaded parts of a session, and the tracks they reference."""
+  loaded = session_data._parts
+  meta = session_data.model_dump(mode="json", exclude={"factory", "playlist", "versions"})
+  meta["genres"] = list(session_data.factory.genres) if "genres" in loaded else session_data._genre_order
+  fields = {"meta": SessionCodec.encode(meta)}
+  tracks = []
+
+  if "playlist" in loaded:
+    fields["playlist"], playlist_tracks = encode_playlist(session_data)
+    tracks.extend(playlist_tracks)
+
+  if "genres" in loaded:
+    for genre_id, genre in session_data.factory.genres.items():
+      fields[genre_field(genre_id)], genre_tracks = encode_genre(genre)
+      tracks.extend(genre_tracks)
+  return fields, tracks
+
+
+async def decode_fields(session_id: str, stored: Dict[str, bytes], parts: Iterable[str]) -> SessionData:
+  """SessionData from hash fields, resolving the track ids of all fields with one bulk lookup."""
+  docs = {
+    field: SessionCodec.decode(data)[1] for field, data in stored.items()
+    if data is not None and not field.startswith(("v:", "section:"))
+  }
+  meta = dict(docs["meta"])
+  genre_order = meta.pop("genres")
+
+  track_ids = list(dict.fromkeys(track_id for doc in docs.values() for track_id in doc.get("track_ids", ())))
+  found = await AsyncSpotifyCache().get_tracks(track_ids)
+  if len(found) < len(track_ids):
+    logger.warning(f"Session {session_id}: {len(track_ids) - len(found)} tracks could not be resolved")
+
+  def resolve(doc: dict, container: dict, field: str):
+    # positions refer to the track_ids of the field the container is stored in
+    ids = doc["track_ids"]
+    container[field] = [found[ids[i]] for i in container[field] if ids[i] in found]
+
+  genres = {}
+  if "genres" in parts:
+    stored_ids = [int(field.removeprefix("genre:")) for field in docs if field.startswith("genre:")]
+    for genre_id in genre_order + [genre_id for genre_id in stored_ids if genre_id not in genre_order]:
+      doc = docs.get(genre_field(genre_id))
+      if doc is None:
+        continue
+      if doc.get("tracks") is not None:
+        resolve(doc, doc["tracks"], "sampled")
+      genres[genre_id] = doc
 
+  playlists = {"factory": None, "session": None}
+  if "playlist" in parts and "playlist" in docs:
+    doc = docs["playlist"]
+    for name in playlists:
+      if doc[name] is not None:
+        resolve(doc, doc[name], "tracks")
+      playlists[name] = doc[name]
 
-async def refresh_ttl_and_cookie(session_id: str, response: Response):
-  logger.debug(f"Refreshed session TTL and cookie: {session_id}")
-  await redis_client.expire(session_id, SessionConfig.ttl)
+  session_data = SessionData.model_validate({
+    **meta,
+    "factory": {"genres": genres, "playlist": playlists["factory"]},
+    "playlist": playlists["session"],
+    "versions": {section: int(stored.get(f"section:{section}") or 0) for section in SECTIONS},
+  })
+  session_data._parts = set(parts)
+  session_data._genre_order = genre_order
+  session_data._fields = {field: (int(stored.get(f"v:{field}") or 0), stored[field]) for field in docs}
+  return session_data
+
+
+async def load_legacy_session(data: bytes) -> SessionData:
+  """A session stored as a single string, as JSON or as one compact document."""
+  version, doc = SessionCodec.decode(data)
+  if version == 0:
+    return SessionData(**doc)
+
+  track_ids = doc.pop("track_ids")
+  found = await AsyncSpotifyCache().get_tracks(track_ids)
+  lists = [(genre["tracks"], "sampled") for genre in doc["factory"]["genres"].values() if genre.get("tracks") is not None]
+  lists += [(playlist, "tracks") for playlist in (doc["factory"].get("playlist"), doc.get("playlist")) if playlist is not None]
+  for container, field in lists:
+    container[field] = [found[track_ids[i]] for i in container[field] if track_ids[i] in found]
+  return SessionData.model_validate(doc)
+
+
+def set_session_cookie(session_id: str, response: Response):
   response.set_cookie(value= session_id, **COOKIE_PARAMS)
 
 async def create_session(response: Response) -> SessionData:
@@ -40,41 +238,105 @@ async def create_session(response: Response) -> SessionData:
   session_id = str(uuid.uuid4())
   session_data = SessionData(id=session_id)
   await store_session(session_data)
-  await refresh_ttl_and_cookie(session_id, response)
+  set_session_cookie(session_id, response)
   logger.info(f"Created session {session_id}")
   return session_data
 
 
-async def create_session_once(session_id: str) -> SessionData:
+async def create_session_once(session_id: str, parts: Iterable[str] = PARTS) -> SessionData:
   """
   Create a session with the given ID only if it does not already exist in Redis.
   If the session exists, load and return the existing one.
   """
   session_data = SessionData(id=session_id)
-  session_json = session_data.model_dump_json()
-  was_set = await redis_client.setnx(session_id, session_json)
-  if was_set:
-    await redis_client.expire(session_id, SessionConfig.ttl)
+  try:
+    with session_latency["create"].time():
+      await store_session(session_data, timed=False)
     logger.info(f"Created new session: {session_id}")
     return session_data
-  else:
+  except SessionConflict:
     # Session exists: load and return existing
-    existing = await redis_client.get(session_id)
-    if existing:
-      session_json = json.loads(existing)
+    try:
       logger.debug(f"Session {session_id} already exists, loaded from redis.")
-      return SessionData(**session_json)
-    else:
-      # Edge case: key disappeared after setnx failed -> create new session recursively
+      return await get_session_from_id(session_id, parts, refresh=True)
+    except ValueError:
+      # Edge case: key disappeared after the conflict -> create new session recursively
       logger.warning(f"Race condition detected, retrying session creation for {session_id}")
-      return await create_session_once(str(uuid.uuid4()))
+      return await create_session_once(str(uuid.uuid4()), parts)
 
-async def store_session(session_data: SessionData):
-  """Stores validated session data in Redis."""
+async def store_session(session_data: SessionData, timed: bool = True):
+  """
+  Writes the fields of the session that changed since it was loaded, and
+  the tracks they reference, in one pipelined round trip.
+  Raises SessionConflict if another request changed one of them meanwhile.
+  """
+  if not timed:
+    return await _store_session(session_data)
+  with session_latency["store"].time():
+    return await _store_session(session_data)
+
+
+async def _run_store(session_id: str, args: list, entries: List[tuple], known: Dict[str, Track], ttl: int):
+  """Result of the store script, and for each known track whether its EXPIRE found it."""
+  async with redis_client_raw.pipeline(transaction=False) as pipe:
+    for key, _, data, entry_ttl in entries:
+      pipe.setex(key, entry_ttl, data)
+    for key in known:
+      pipe.expire(key, ttl)
+    pipe.evalsha(_store_fields.sha, 1, session_id, *args)
+    results = await pipe.execute(raise_on_error=False)
+  return results[-1], results[len(entries):-1]
+
+
+async def _store_session(session_data: SessionData):
   session_id = session_data.id
-  session_json = session_data.model_dump_json()  # Convert to dictionary
-  await redis_client.setex(session_id, SessionConfig.ttl, session_json)
-  logger.debug(f"Stored session in redis: {session_id}")
+  fields, tracks = encode_fields(session_data)
+  loaded = session_data._fields
+  writes = {field: data for field, data in fields.items() if loaded.get(field, (0, None))[1] != data}
+  if "genres" in session_data._parts:
+    writes.update({field: b"" for field in loaded if field.startswith("genre:") and field not in fields})
+  bumped = session_data._bumped
+  if not writes and not bumped:
+    return
+
+  # every track the session references lives at least as long as the session
+  tracks_ttl = max(CacheConfig.session_tracks, SessionConfig.ttl)
+  cache = AsyncSpotifyCache()
+  entries, known = cache.track_entries(tracks, tracks_ttl)
+  args = [SessionConfig.ttl, len(writes)]
+  for field, data in writes.items():
+    args += [field, loaded.get(field, (0, None))[0], data]
+  args.append(len(bumped))
+  for section, increment in bumped.items():
+    args += [section, increment]
+
+  result, extended = await _run_store(session_id, args, entries, known, tracks_ttl)
+  if isinstance(result, NoScriptError):
+    # script cache was flushed, e.g. by a Redis restart
+    await redis_client_raw.script_load(STORE_FIELDS)
+    result, _ = await _run_store(session_id, args, [], {}, tracks_ttl)
+  if isinstance(result, Exception):
+    raise result
+  for key, track, _, ttl in entries:
+    local_cache.set(key, track, ttl)
+  evicted = [track for track, found in zip(known.values(), extended) if not found]
+  if evicted:
+    # left Redis since this worker cached them
+    await cache.store_tracks(evicted, tracks_ttl)
+
+  if result[0] == 0:
+    raise SessionConflict(session_id, result[1].decode())
+
+  for name, version in zip(result[1::2], result[2::2]):
+    name = name.decode()
+    if name.startswith("section:"):
+      session_data.versions[name.removeprefix("section:")] = version
+    elif writes[name]:
+      loaded[name] = (version, writes[name])
+    else:
+      loaded.pop(name, None)
+  bumped.clear()
+  logger.debug(f"Stored session in redis: {session_id} {list(writes)}")
 
 
 async def get_session(request: Request, response: Response) -> SessionData:
@@ -83,23 +345,35 @@ async def get_session(request: Request, response: Response) -> SessionData:
     Refreshes TTL if session exists, or creates a new one if missing or invalid.
     Sets or refreshes the session cookie.
   """
+  return await _get_session(request, response, PARTS)
+
+
+def session_with(*parts: str):
+  """Dependency like get_session that loads only the given PARTS; stores write only those."""
+  async def dependency(request: Request, response: Response) -> SessionData:
+    return await _get_session(request, response, parts)
+  return dependency
+
+
+async def _get_session(request: Request, response: Response, parts: Iterable[str]) -> SessionData:
+  # one round trip: load + TTL refresh for existing sessions, the store script for new ones
   session_id = request.cookies.get(COOKIE_PARAMS["key"])
   if not session_id:
     session_id = str(uuid.uuid4())
-    session_data = await create_session_once(session_id)
-    await refresh_ttl_and_cookie(session_id, response)
+    session_data = await create_session_once(session_id, parts)
+    set_session_cookie(session_id, response)
     logger.info("No session_id cookie found. Created new session.")
     return session_data
 
   try:
-    session_data = await get_session_from_id(session_id)
+    session_data = await get_session_from_id(session_id, parts, refresh=True)
   except (ValueError, JSONDecodeError) as e:
     response.delete_cookie(COOKIE_PARAMS["key"])
     session_id = str(uuid.uuid4()) # new session id
-    session_data = await create_session_once(session_id)
+    session_data = await create_session_once(session_id, parts)
     logger.info(f"Session invalid, created new session: {session_id} {e}")
 
-  await refresh_ttl_and_cookie(session_id, response)
+  set_session_cookie(session_id, response)
   return session_data
 
 async def get_session_id(request: Request) -> Optional[str]:
@@ -108,19 +382,47 @@ async def get_session_id(request: Request) -> Optional[str]:
   logger.debug(f"Retrieved session_id from cookie: {session_id}")
   return session_id
 
-async def get_session_from_id(session_id: str) -> SessionData:
-  """Retrieves and validates session data from Redis."""
-  session_data = await redis_client.get(session_id)
-  if session_data:
-    session_dict = json.loads(session_data)
-    logger.debug(f"Loaded session from redis: {session_id}")
-    return SessionData(**session_dict)
-  else:
+async def get_session_from_id(session_id: str, parts: Iterable[str] = PARTS, refresh: bool = False) -> SessionData:
+  """
+  Retrieves and validates the given parts of a session from Redis.
+  With refresh, the TTL is reset in the same round trip.
+  """
+  with session_latency["load"].time():
+    return await _load_session(session_id, tuple(parts), refresh)
+
+
+async def _load_session(session_id: str, parts: Tuple[str, ...], refresh: bool) -> SessionData:
+  names = ["meta", "v:meta"] + [f"section:{section}" for section in SECTIONS]
+  if "playlist" in parts:
+    names += ["playlist", "v:playlist"]
+  async with redis_client_raw.pipeline(transaction=False) as pipe:
+    if "genres" in parts:
+      pipe.hgetall(session_id)
+    else:
+      pipe.hmget(session_id, names)
+    if refresh:
+      pipe.expire(session_id, SessionConfig.ttl)
+    stored = (await pipe.execute(raise_on_error=False))[0]
+
+  if isinstance(stored, ResponseError):
+    # stored as a single string by an earlier version, rewritten as a hash by the next store
+    data = await redis_client_raw.get(session_id)
+    logger.debug(f"Loaded legacy session from redis: {session_id}")
+    return await load_legacy_session(data)
+  if isinstance(stored, Exception):
+    raise stored
+  if isinstance(stored, list):
+    stored = dict(zip(names, stored))
+
+  stored = {field.decode() if isinstance(field, bytes) else field: data for field, data in stored.items()}
+  if not stored.get("meta"):
     logger.debug(f"Session not found in redis: {session_id}")
     raise ValueError("Session not found")
+  logger.debug(f"Loaded session from redis: {session_id} {parts}")
+  return await decode_fields(session_id, stored, parts)
 
 
 async def delete_session(session_id: str):
   """Delete session data."""
-  await redis_client.delete(session_id)
-  logger.info(f"Deleted session: {session_id}")
\ No newline at end of file
+  await redis_client_raw.delete(session_id)
+  logger.info(f"Deleted session: {session_id}")
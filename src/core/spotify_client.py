@@ -1,4 +1,6 @@
 import logging
+import requests
+from urllib3.util.retry import Retry
 from spotipy import Spotify
 from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth, SpotifyOauthError
 from spotipy.cache_handler import CacheHandler, RedisCacheHandler
@@ -8,6 +10,31 @@ from src.config import SpotifyConfig, SessionConfig
 logger = logging.getLogger("SpotifyClient")
 logging.basicConfig(level=logging.INFO)
 
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+def app_session() -> requests.Session:
+  """
+  Session like spotipy's own, but urllib3 retries only server errors: with
+  respect_retry_after_header it would also sleep through 429s that carry
+  Retry-After, hiding them from the SpotifyRateLimiter.
+  """
+  retry = Retry(
+    total=Spotify.max_retries,
+    connect=None,
+    read=False,
+    allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+    status=Spotify.max_retries,
+    backoff_factor=0.3,
+    status_forcelist=RETRY_STATUS_CODES,
+    respect_retry_after_header=False,
+  )
+  adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+  session = requests.Session()
+  session.mount('http://', adapter)
+  session.mount('https://', adapter)
+  return session
+
 
 class NoCacheHandler(CacheHandler):
   def get_cached_token(self):
@@ -26,7 +53,8 @@ class SpotifyClient:
     )
 
   def get_spotify_client(self):
-    return Spotify(auth_manager=self.auth_manager)
+    # 429s are not retried inside spotipy, they are scheduled by the SpotifyRateLimiter
+    return Spotify(auth_manager=self.auth_manager, requests_session=app_session(), status_forcelist=RETRY_STATUS_CODES)
 
 
 class SpotifyUserClient:
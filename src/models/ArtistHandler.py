@@ -1,16 +1,28 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+import sys
+import time
+import logging
+import numpy as np
+from pydantic import BaseModel, Field
+from threading import Lock
+from typing import List, Dict, Optional, Iterable
 import json
 
-from sqlalchemy.orm import joinedload
+from sqlalchemy import JSON, DateTime, Integer, cast, column, select, update, values
 from datetime import datetime, timedelta
 
 from random import random
-from src.config import CacheConfig
+from src.config import CacheConfig, SpotifyConfig
 from src.core.db import SessionLocal
-from src.database.models import Genre, ArtistInGenre
+from src.database.models import Genre, ArtistInGenre, Artist as ArtistRow
+from src.core.GenreGraph import GenreGraph
+from src.core.LocalCache import local_cache
+from src.core.PoolRefresher import pool_refresher
 from src.core.redis_client import redis_sync
 from src.core.spotify_client import SpotifyClient
+from src.core.RateLimiter import Priority, rate_limiter
+from src.models.ObjectSampling import AliasTable, SamplingConfig, CombinedFilter, Segments
+
+logger = logging.getLogger("ArtistHandler")
 
 
 class Artist(BaseModel):
@@ -22,12 +34,108 @@ class Artist(BaseModel):
   popularity: int
 
 
+class StringTable:
+  """Process-wide interned strings, so columns can refer to them by index."""
+
+  def __init__(self):
+    self.values: List[str] = []
+    self._index: Dict[str, int] = {}
+    self._lock = Lock()
+
+  def intern(self, values: Iterable[str]) -> np.ndarray:
+    with self._lock:
+      return np.array(
+        [self._index[v] if v in self._index else self._add(v) for v in values],
+        dtype=np.int32
+      )
+
+  def _add(self, value: str) -> int:
+    self._index[value] = len(self.values)
+    self.values.append(sys.intern(value))
+    return self._index[value]
+
+  def lookup(self, indices: np.ndarray) -> List[str]:
+    return [self.values[i] for i in indices]
+
+
+strings = StringTable()
+
+
+class ArtistColumns:
+  """
+  An ArtistPool as one NumPy array per attribute, for vectorized filters
+  and samplers. Names and Spotify ids are indices into the string table.
+  """
+  numeric = ("id", "popularity", "bouncyness", "organicness")
+
+  def __init__(self, artists: List[Artist]):
+    self.id = np.array([a.id for a in artists], dtype=np.int64)
+    self.popularity = np.array([a.popularity for a in artists], dtype=np.float64)
+    self.bouncyness = np.array([a.bouncyness for a in artists], dtype=np.float64)
+    self.organicness = np.array([a.organicness for a in artists], dtype=np.float64)
+    self.name = strings.intern(a.name for a in artists)
+    self.spotify_id = strings.intern(a.spotify_id for a in artists)
+
+  @classmethod
+  def concat(cls, parts: List["ArtistColumns"]) -> "ArtistColumns":
+    columns = cls.__new__(cls)
+    for attr in cls.numeric + ("name", "spotify_id"):
+      setattr(columns, attr, np.concatenate([getattr(part, attr) for part in parts]))
+    return columns
+
+  def __len__(self) -> int:
+    return len(self.id)
+
+  def column(self, attr: str) -> np.ndarray:
+    if attr not in self.numeric:
+      raise ValueError(f"Unknown artist attribute: {attr}")
+    return getattr(self, attr)
+
+  def ids(self, rows) -> List[int]:
+    return self.id[rows].tolist()
+
+  def spotify_ids(self, rows) -> List[str]:
+    return strings.lookup(self.spotify_id[rows])
+
+  def rows_of(self, artist_ids: Iterable[int]) -> np.ndarray:
+    """Boolean mask of the rows whose id is in artist_ids."""
+    return np.isin(self.id, np.fromiter(artist_ids, dtype=np.int64))
+
+
 class ArtistPool(BaseModel):
   genre_id: int
   name: str
   bouncyness: float
   organicness: float
   artists: List[Artist]
+  version: int = Field(default_factory=time.time_ns) # changes whenever the pool is rebuilt
+
+  @property
+  def built_at(self) -> float:
+    return self.version / 1e9
+
+  def columns(self) -> ArtistColumns:
+    """Columnar view of the artists, built once per pool version in this worker."""
+    key = f"pool:columns:{self.genre_id}@{self.version}"
+    columns = local_cache.get(key)
+    if columns is None:
+      columns = ArtistColumns(self.artists)
+      local_cache.set(key, columns, CacheConfig.artist_pool)
+    return columns
+
+  def alias_table(self, config: SamplingConfig) -> AliasTable:
+    """Filtered rows and sampling weights of config, built once per pool version and config."""
+    key = f"pool:weights:{self.genre_id}@{self.version}#{config.weights_key()}"
+    table = local_cache.get(key)
+    if table is None:
+      table = config.alias_table(self.columns())
+      local_cache.set(key, table, CacheConfig.artist_pool)
+    return table
+
+  def sample(self, config: SamplingConfig, seed: Optional[int] = None) -> List[int]:
+    """Ids of config.sampler.n_samples distinct artists."""
+    rows = self.alias_table(config).sample(np.random.default_rng(seed), config.sampler.n_samples)
+    return self.columns().ids(rows)
 
 
 class ArtistHandler:
@@ -38,42 +146,83 @@ class ArtistHandler:
   b_min = 10
   b_max = 1500
 
-  def __init__(self):
+  def __init__(self, priority: Priority = "interactive"):
     self.spotify = SpotifyClient().get_spotify_client()
+    self.priority = priority
 
   @staticmethod
   def load_pool_to_redis(pool: ArtistPool):
     redis_sync.setex(f"pool:genre:{int(pool.genre_id)}", CacheConfig.artist_pool, pool.model_dump_json())
+    pool_refresher.built(pool.genre_id, pool.built_at)
 
   @staticmethod
   def load_pool_from_redis(genre_id) -> Optional[ArtistPool]:
     pool_data = redis_sync.get(f"pool:genre:{int(genre_id)}")
     return ArtistPool(**json.loads(pool_data)) if pool_data else None
 
+  def get_pools(self, genre_ids: List[int]) -> Dict[int, ArtistPool]:
+    """Pools of several genres, the cached ones with one MGET."""
+    if not genre_ids:
+      return {}
+    stored = redis_sync.mget([f"pool:genre:{int(genre_id)}" for genre_id in genre_ids])
+    pools = {genre_id: ArtistPool(**json.loads(data)) for genre_id, data in zip(genre_ids, stored) if data}
+    return self._serve(genre_ids, pools)
+
+  @staticmethod
+  def sample_pools(pools: Dict[int, ArtistPool], config: SamplingConfig, seed: Optional[int] = None) -> Dict[int, List[int]]:
+    """Ids of config.sampler.n_samples artists per pool, all pools filtered and weighted in one pass."""
+    if not pools:
+      return {}
+    parts = [pool.columns() for pool in pools.values()]
+    columns = ArtistColumns.concat(parts)
+    segments = Segments(np.repeat(np.arange(len(parts)), [len(part) for part in parts]), len(parts))
+    mask = CombinedFilter(filters=config.filters).mask(columns) if config.filters else None
+    rows = config.sampler.sample_segments(columns, segments, mask, seed)
+    return {genre_id: columns.ids(genre_rows) for genre_id, genre_rows in zip(pools, rows)}
+
   def get_pool(self, genre_id: int) -> ArtistPool:
-    with SessionLocal() as session:
-      genre = session.query(Genre).get(genre_id)
-      pool = self.load_pool_from_redis(genre_id)
-      if not pool:
-        artists = self.get_and_update_artists(genre_id)
-        pool = ArtistPool(
-          genre_id=genre_id,
-          artists=artists,
-          name=genre.name,
-          bouncyness=(genre.bouncy_value - self.b_min) / (self.b_max - self.b_min) ,
-          organicness=(genre.organic_value - self.o_min) / (self.o_max - self.o_min),
-        )
-        self.load_pool_to_redis(pool)
-        print("created Pool")
-      return pool
+    pool = self.load_pool_from_redis(genre_id)
+    return self._serve([genre_id], {genre_id: pool} if pool else {})[genre_id]
+
+  def _serve(self, genre_ids: List[int], pools: Dict[int, ArtistPool]) -> Dict[int, ArtistPool]:
+    """
+    Stale-while-revalidate: stale pools are returned and queued for the pool
+    refresher. Missing ones are built here, from the DB only while the
+    refresher runs, which then brings their artists up to date.
+    """
+    pool_refresher.touch(genre_ids)
+    missing = [genre_id for genre_id in genre_ids if genre_id not in pools]
+    refresher_alive = bool(missing) and pool_refresher.alive()
+    for genre_id in missing:
+      pools[genre_id] = self.build_pool(genre_id, update_artists=not refresher_alive)
+    pool_refresher.request(
+      genre_id for genre_id in genre_ids
+      if (genre_id in missing and refresher_alive) or pool_refresher.is_stale(pools[genre_id].built_at)
+    )
+    return {genre_id: pools[genre_id] for genre_id in genre_ids}
+
+  def build_pool(self, genre_id: int, update_artists: bool = True, stale_days: int = CacheConfig.scrape_time_delta_days) -> ArtistPool:
+    """Builds the pool of a genre and stores it in Redis; genre metadata comes from the GenreGraph."""
+    genre = GenreGraph().get_genre(genre_id)
+    artists = self.get_and_update_artists(genre_id, stale_days) if update_artists else self.get_artists(genre_id)
+    pool = ArtistPool(
+      genre_id=genre_id,
+      artists=artists,
+      name=genre["name"],
+      bouncyness=(genre["bouncy_raw"] - self.b_min) / (self.b_max - self.b_min) ,
+      organicness=(genre["organic_raw"] - self.o_min) / (self.o_max - self.o_min),
+    )
+    self.load_pool_to_redis(pool)
+    logger.info(f"Built pool {genre_id}: {len(artists)} artists")
+    return pool
 
 
   def fetch_artists(self, spotify_ids: List[str]) -> Dict[str, dict]:
     all_artists = []
-    for i in range(0, len(spotify_ids), 50):
-      batch = spotify_ids[i:i + 50]
-      sp_artists = self.spotify.artists(batch)['artists']
-      all_artists.extend(sp_artists)
+    for i in range(0, len(spotify_ids), SpotifyConfig.max_artist_batch):
+      batch = spotify_ids[i:i + SpotifyConfig.max_artist_batch]
+      sp_artists = rate_limiter.call(self.spotify.artists, batch, priority=self.priority)['artists']
+      all_artists.extend(a for a in sp_artists if a)
     return {
       a["id"]: {
         "popularity": a.get("popularity", 0),
@@ -83,45 +232,90 @@ class ArtistHandler:
       for a in all_artists
     }
 
-  def get_and_update_artists(self, genre_id: int) -> List[Artist]:
-    cutoff = datetime.now() - timedelta(days=CacheConfig.scrape_time_delta_days)
-    with SessionLocal() as session:
-      genre = (
-        session.query(Genre)
-        .options(joinedload(Genre.artists).joinedload(ArtistInGenre.artist))
-        .filter_by(id=genre_id)
-        .first()
+  @staticmethod
+  def _select_artists(session, genre_id: int) -> list:
+    """(id, spotify_id, name, popularity, modified_at, bouncy_value, organic_value) rows of a genre's artists."""
+    return session.execute(
+      select(
+        ArtistRow.id, ArtistRow.spotify_id, ArtistRow.name, ArtistRow.popularity, ArtistRow.modified_at,
+        ArtistInGenre.bouncy_value, ArtistInGenre.organic_value
       )
+      .join(ArtistInGenre, ArtistInGenre.artist_id == ArtistRow.id)
+      .where(ArtistInGenre.genre_id == genre_id)
+    ).all()
 
-      artists_to_update = [
-        link.artist.spotify_id for link in genre.artists
-        if not link.artist.popularity or link.artist.modified_at < cutoff
-      ]
+  def _pool_artists(self, rows: list, popularity: Dict[int, int]) -> List[Artist]:
+    artists = [
+      Artist(
+        id=row.id,
+        spotify_id=row.spotify_id,
+        name=row.name,
+        bouncyness=row.bouncy_value,
+        organicness=row.organic_value,
+        popularity=popularity.get(row.id, row.popularity) or 0
+      ) for row in rows
+    ]
+    return self.normalize_coordinates(artists)
+
+  def get_artists(self, genre_id: int) -> List[Artist]:
+    """Artists of a genre as stored, without refreshing stale ones."""
+    with SessionLocal() as session:
+      return self._pool_artists(self._select_artists(session, genre_id), {})
+
+  def get_and_update_artists(self, genre_id: int, stale_days: int = CacheConfig.scrape_time_delta_days) -> List[Artist]:
+    """Artists of a genre, refreshing those stale for stale_days from Spotify with one bulk UPDATE."""
+    cutoff = datetime.now() - timedelta(days=stale_days)
+    with SessionLocal() as session:
+      rows = self._select_artists(session, genre_id)
+
+      artists_to_update = list(dict.fromkeys(
+        row.spotify_id for row in rows
+        if not row.popularity or row.modified_at < cutoff
+      ))
 
       spotify_data = self.fetch_artists(artists_to_update)
 
-      for link in genre.artists:
-        artist = link.artist
-        data = spotify_data.get(artist.spotify_id)
-        if data:
-          artist.popularity = data["popularity"]
-          artist.followers = data["followers"]
-          artist.spotify_genres = data["spotify_genres"]
-          artist.modified_at = datetime.now()
-
-      session.commit()
-
-      artists = [
-        Artist(
-          id=l.artist.id,
-          spotify_id=l.artist.spotify_id,
-          name=l.artist.name,
-          bouncyness=l.bouncy_value,
-          organicness=l.organic_value,
-          popularity=l.artist.popularity or 0
-        ) for l in genre.artists
+      now = datetime.now()
+      updates = [
+        {
+          "id": row.id,
+          "popularity": data["popularity"],
+          "followers": data["followers"],
+          "spotify_genres": data["spotify_genres"],
+          "modified_at": now,
+        }
+        for row in rows if (data := spotify_data.get(row.spotify_id))
       ]
-    return self.normalize_coordinates(artists)
+      if updates:
+        session.execute(self._bulk_update(updates))
+        session.commit()
+
+    return self._pool_artists(rows, {values["id"]: values["popularity"] for values in updates})
+
+  @staticmethod
+  def _bulk_update(updates: List[dict]):
+    """
+    One UPDATE ... FROM (VALUES ...) for all rows. An executemany would go out
+    as one UPDATE per row, i.e. one round trip each, with psycopg2.
+    """
+    refreshed = values(
+      column("id", Integer), column("popularity", Integer), column("followers", Integer),
+      column("spotify_genres", JSON), column("modified_at", DateTime),
+      name="refreshed"
+    ).data([
+      (u["id"], u["popularity"], u["followers"], u["spotify_genres"], u["modified_at"]) for u in updates
+    ])
+    # VALUES columns are typed from their literals, and as text where they are all NULL
+    assignments = {
+      name: cast(refreshed.c[name], getattr(ArtistRow, name).type)
+      for name in ("popularity", "followers", "spotify_genres", "modified_at")
+    }
+    return (
+      update(ArtistRow)
+      .where(ArtistRow.id == refreshed.c.id)
+      .values(assignments)
+      .execution_options(synchronize_session=False)
+    )
 
   @staticmethod
   def normalize_coordinates(artists: List[Artist]) -> List[Artist]:
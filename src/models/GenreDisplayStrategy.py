@@ -1,13 +1,16 @@
 import networkx as nx
 from networkx.readwrite import json_graph
-from networkx.drawing.nx_agraph import graphviz_layout
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Set
+from typing import List, Optional, Tuple, Set
+from weakref import WeakKeyDictionary
 
 from src.config import Settings
 from src.database.models import RelationshipTypeEnum
-from src.models.SessionResponse import Genre, GenreRelationship, Coordinate
-from src.core.GenreGraph import GenreGraph
+from src.models.SessionResponse import Genre, GenreRelationship, Coordinate, GenreGraphDelta, Rescale
+from src.core.GenreCSR import GenreCSR
+from src.core.GenreGraph import GenreGraph, GenreGraphSnapshot
+from src.core.LayoutCache import layout_cache
+from src.core.LayoutEngine import Layout, get_layout_engine
 
 
 class DisplayStrategy(ABC):
@@ -19,143 +22,250 @@ class DisplayStrategy(ABC):
   def generate_data(self) -> dict:
     return dict()
 
-  def generate_layout(self, graph):
-    return graphviz_layout(graph, prog="neato")
+  def __init__(self, engine: Optional[str] = None):
+    self.engine = get_layout_engine(engine or Settings.layout_engine)
 
-  def get_json_layout(self, graph):
+  def pinned_positions(self, graph) -> Optional[Layout]:
+    """Nodes the layout engine must keep in place."""
+    return None
+
+  def generate_layout(self, graph, seed: Optional[Layout] = None):
+    pinned = self.pinned_positions(graph) if self.engine.pins else None
+    return self.engine.layout(graph, seed, pinned)
+
+  def layout_key(self, graph) -> str:
+    return layout_cache.key(graph.graph.get("version", ""), graph.nodes, f"{type(self).__name__}:{self.engine.name}")
+
+  def graph_state(self, graph) -> str:
+    """Names what a client was sent for graph: "<graph version>.<layout hash>"."""
+    return f"{graph.graph.get('version', '')}.{self.layout_key(graph)[len(layout_cache.prefix):]}"
+
+  def cached_layout(self, graph, session_id: Optional[str] = None) -> Layout:
+    """Layout of graph from the layout cache, computed from the session's previous layout on a miss."""
+    key = self.layout_key(graph)
+    layout = layout_cache.get(key)
+    if layout is None:
+      seed = layout_cache.last(session_id) if session_id else None
+      layout = self.generate_layout(graph, seed)
+      layout_cache.set(key, layout)
+    if session_id:
+      layout_cache.set_last(session_id, key)
+    return layout
+
+  def get_json_layout(self, graph, session_id: Optional[str] = None):
     if not graph.nodes:
       return {}
 
     if len(graph.nodes) == 1:
       return {graph.nodes[0]: (0.5, 0.5)}
 
-    layout = self.generate_layout(graph)
+    layout = self.cached_layout(graph, session_id)
     return self.normalize_layout(layout)
 
-  def to_json(self, selected: Set[int], expanded: Set[int], highlight: int = None):
+  def to_json(self, selected: Set[int], expanded: Set[int], highlight: int = None, session_id: Optional[str] = None):
     subgraph = self.generate_subgraph(selected, expanded, highlight)
 
     node_edges = json_graph.node_link_data(subgraph)
-    layout = self.get_json_layout(subgraph)
+    layout = self.get_json_layout(subgraph, session_id)
     data = self.generate_data()
     return {"graph": node_edges, "layout": layout, "data": data}
 
-  def to_GenreGraphData(self, selected: Set[int], expanded: Set[int], highlight: int = None) -> Tuple[List[Genre], List[GenreRelationship], dict]:
+  def to_GenreGraphData(self, selected: Set[int], expanded: Set[int], highlight: int = None, session_id: Optional[str] = None) -> Tuple[List[Genre], List[GenreRelationship], dict]:
     subgraph = self.generate_subgraph(selected, expanded, highlight)
-    node_edges = json_graph.node_link_data(subgraph)
-    layout = self.get_json_layout(subgraph)
-
-    genres = [
-      Genre(
-        id=genre["id"],
-        name=genre["name"],
-        has_subgenre=genre["has_subgenre"],
-        is_selectable=genre["is_spotify_genre"],
-        bouncyness=genre["bouncy_value"],
-        organicness=genre["organic_value"],
-      )
-      for genre in node_edges.get("nodes", [])
-    ]
+    return self.graph_data(subgraph, session_id)
+
+  def graph_data(self, subgraph, session_id: Optional[str] = None) -> Tuple[List[Genre], List[GenreRelationship], dict]:
+    layout = self.get_json_layout(subgraph, session_id)
+
+    genres = [self.to_genre({"id": node, **data}) for node, data in subgraph.nodes(data=True)]
     relations = [
       GenreRelationship(
-        source=rel["source"],
-        target=rel["target"],
-        type=rel["type"]
+        source=source,
+        target=target,
+        type=data["type"]
       )
-      for rel in node_edges.get("links", [])
+      for source, target, data in subgraph.edges(data=True)
     ]
-    layout = {
+    return genres, relations, self.round_layout(layout)
+
+  def graph_delta(self, subgraph, base: str, session_id: Optional[str] = None) -> Optional[GenreGraphDelta]:
+    """
+    Changes from the graph state base (see graph_state) to subgraph, None if
+    base is unknown, evicted or from another graph version.
+    """
+    version, _, digest = base.partition(".")
+    if version != subgraph.graph.get("version") or not digest:
+      return None
+    previous = layout_cache.peek(f"{layout_cache.prefix}{digest}")
+    if previous is None:
+      return None
+
+    G = GenreGraph.current().G
+    if G.graph.get("version") != version:
+      return None
+    before = G.subgraph(previous)
+    old_edges = {(u, v): d["type"] for u, v, d in before.edges(data=True)}
+    new_edges = {(u, v): d["type"] for u, v, d in subgraph.edges(data=True)}
+    layout, rescale = self.layout_delta(previous, subgraph, session_id)
+
+    return GenreGraphDelta(
+      base=base,
+      state=self.graph_state(subgraph),
+      added_genres=[self.to_genre({"id": n, **subgraph.nodes[n]}) for n in subgraph.nodes if n not in previous],
+      removed_genres=[n for n in previous if n not in subgraph],
+      added_relationships=[
+        GenreRelationship(source=u, target=v, type=t) for (u, v), t in new_edges.items() if old_edges.get((u, v)) != t
+      ],
+      removed_relationships=[
+        GenreRelationship(source=u, target=v, type=t) for (u, v), t in old_edges.items() if new_edges.get((u, v)) != t
+      ],
+      layout=layout,
+      rescale=rescale
+    )
+
+  def layout_delta(self, previous: Layout, subgraph, session_id: Optional[str] = None) -> Tuple[dict, Optional[Rescale]]:
+    """
+    Coordinates of the genres whose raw position differs from previous, and
+    the rescale that maps the client's coordinates of the others, which were
+    normalized to the bounding box of previous, to the new bounding box.
+    """
+    if len(previous) < 2 or len(subgraph.nodes) < 2:
+      return self.round_layout(self.get_json_layout(subgraph, session_id)), None
+    current = self.cached_layout(subgraph, session_id)
+    old_frame, frame = self.layout_frame(previous), self.layout_frame(current)
+    moved = {n: pos for n, pos in current.items() if previous.get(n) != tuple(pos)}
+    layout = self.round_layout(self.normalize_layout(moved, frame)) if moved else {}
+    if old_frame == frame:
+      return layout, None
+    (old_x, old_w, old_y, old_h), (x, w, y, h) = old_frame, frame
+    return layout, Rescale(scale_x=old_w / w, offset_x=(old_x - x) / w, scale_y=old_h / h, offset_y=(old_y - y) / h)
+
+  @staticmethod
+  def to_genre(genre: dict) -> Genre:
+    return Genre(
+      id=genre["id"],
+      name=genre["name"],
+      has_subgenre=genre["has_subgenre"],
+      is_selectable=genre["is_spotify_genre"],
+      bouncyness=genre["bouncy_value"],
+      organicness=genre["organic_value"],
+    )
+
+  @staticmethod
+  def round_layout(layout: dict) -> dict:
+    return {
       genre_id: Coordinate(x=round(pos["x"], Settings.decimal_precision), y=round(pos["y"], Settings.decimal_precision))
       for genre_id, pos in layout.items()
     }
 
-    return genres, relations, layout
-
   @staticmethod
-  def normalize_layout(layout: dict) -> dict:
+  def layout_frame(layout: dict) -> Tuple[float, float, float, float]:
+    """x_min, width, y_min and height of the layout's bounding box."""
     x_coords = [genre[0] for genre in layout.values()]
     y_coords = [genre[1] for genre in layout.values()]
 
     x_min, x_max = min(x_coords), max(x_coords)
     y_min, y_max = min(y_coords), max(y_coords)
+    return x_min, x_max - x_min, y_min, y_max - y_min
+
+  @classmethod
+  def normalize_layout(cls, layout: dict, frame: Optional[Tuple[float, float, float, float]] = None) -> dict:
+    """Coordinates in [0, 1] relative to frame, the layout's own bounding box by default."""
+    x_min, width, y_min, height = frame or cls.layout_frame(layout)
 
     return {
       node_id:
-        {"x": (x - x_min) / (x_max - x_min),
-         "y": (y - y_min) / (y_max - y_min)}
+        {"x": (x - x_min) / width,
+         "y": (y - y_min) / height}
       for node_id, (x, y) in layout.items()}
 
 
 
 class StartingGenresStrategy(DisplayStrategy):
   #starting_genres = {1, 3, 5, 20, 99, 114, 151, 379, 523, 6598, 1804}
-  starting_genres = set(GenreGraph.roots)
+  # Roots of the SUBGENRE_OF graph plus the genres between them, per graph snapshot
+  _starting_genres = WeakKeyDictionary()
+
+  @classmethod
+  def starting_genres_for(cls, snapshot: GenreGraphSnapshot) -> Set[int]:
+    genres = cls._starting_genres.get(snapshot)
+    if genres is None:
+      roots = list(snapshot.roots)
+      inter_genres = cls.get_subgenres_between(
+        roots, roots,
+        RelationshipTypeEnum.SUBGENRE_OF.value, snapshot)
+      genres = set(roots) | inter_genres
+      cls._starting_genres[snapshot] = genres
+    return genres
 
   @classmethod
   def initialize_starting_genres(cls):
-    genres = list(cls.starting_genres)
-    inter_genres = cls.get_subgenres_between(
-      genres, genres,
-      RelationshipTypeEnum.SUBGENRE_OF.value)
-    cls.starting_genres = cls.starting_genres.union(inter_genres)
+    cls.starting_genres_for(GenreGraph.current())
+
+  def pinned_positions(self, graph) -> Optional[Layout]:
+    """Starting genres stay where the layout of the starting genres alone puts them."""
+    snapshot = GenreGraph.current()
+    starting_genres = self.starting_genres_for(snapshot)
+    if len(starting_genres) < 2:
+      return None
+    key = layout_cache.key(snapshot.version, starting_genres, f"home:{self.engine.name}")
+    home = layout_cache.get(key)
+    if home is None:
+      home = self.engine.layout(snapshot.G.subgraph(starting_genres))
+      layout_cache.set(key, home)
+    return {node: home[node] for node in graph.nodes if node in home}
+
+  @staticmethod
+  def get_subgenres_between(source: list[int], target: list[int], graph_type=None, snapshot: GenreGraphSnapshot = None) -> set[int]:
+    """Genres on one shortest path from each source to each target genre, over graph_type edges only."""
+    reachability = (snapshot or GenreGraph.current()).reachability(graph_type)
+    return reachability.shortest_paths(source, target)
 
   @staticmethod
-  def get_subgenres_between(source: list[int], target: list[int], graph_type=None) -> set[int]:
-    nodes = set()
-    for source_id in source:
-      for target_id in target:
-        with GenreGraph(graph_type) as G:
-          try:
-            path = nx.shortest_path(G, source=source_id, target=target_id)
-          except Exception as e:
-            path = []
-          nodes = nodes | set(path)
-    return nodes
+  def get_shortest_paths_to(source: list[int], target: int, graph_type=None, snapshot: GenreGraphSnapshot = None) -> set[int]:
+    """Genres on one shortest path from each source genre to the target genre."""
+    return (snapshot or GenreGraph.current()).adjacency(graph_type).shortest_paths_to(source, target)
 
   @staticmethod
-  def prune_descendants(graph: nx.DiGraph, expanded: set[int], nodes: set[int]) -> set[int]:
-    all_descendants = set()
-    for node in set(graph.nodes()) - expanded:
-      stack = [node]
-      while stack:
-        current = stack.pop()
-        if current in all_descendants:
-          continue
-        all_descendants.add(current)
-        stack.extend(graph.successors(current))
+  def prune_descendants(graph: GenreCSR, expanded: set[int], nodes: set[int]) -> set[int]:
+    unexpanded = graph.present.copy()
+    unexpanded[graph.index(expanded)] = False
+    all_descendants = graph.ids(graph.reachable(graph.node_ids[unexpanded].tolist()))
     return nodes - all_descendants
 
   def generate_subgraph(self, selected: Set[int], expanded: Set[int], highlight: int = None) -> nx.DiGraph:
-    all_nodes = self.starting_genres | selected | expanded
+    # Pin one snapshot so a concurrent reload cannot mix two graphs in one response
+    snapshot = GenreGraph.current()
+    starting_genres = self.starting_genres_for(snapshot)
+    all_nodes = starting_genres | selected | expanded
 
     # Add subgenres between starting genres
     all_nodes |= self.get_subgenres_between(
-      list(all_nodes), list(all_nodes), RelationshipTypeEnum.SUBGENRE_OF.value
+      list(all_nodes), list(all_nodes), RelationshipTypeEnum.SUBGENRE_OF.value, snapshot
     )
 
     if isinstance(highlight, int):
-      all_nodes |= self.get_subgenres_between(list(self.starting_genres), [highlight])
+      # over all relationship types, where the closure would pull in whole cycles: shortest paths only
+      all_nodes |= self.get_shortest_paths_to(list(starting_genres), highlight, snapshot=snapshot)
 
     # Add paths from starting genres to selected genres
     if selected:
       all_nodes |= self.get_subgenres_between(
-        list(self.starting_genres), list(selected), RelationshipTypeEnum.SUBGENRE_OF.value
+        list(starting_genres), list(selected), RelationshipTypeEnum.SUBGENRE_OF.value, snapshot
       )
 
     if expanded:
       all_nodes |= self.get_subgenres_between(
-        list(self.starting_genres), list(expanded), RelationshipTypeEnum.SUBGENRE_OF.value
+        list(starting_genres), list(expanded), RelationshipTypeEnum.SUBGENRE_OF.value, snapshot
       )
 
     # Add children of expanded nodes
-    with GenreGraph(RelationshipTypeEnum.SUBGENRE_OF.value) as G:
-      for node in expanded:
-        if G.has_node(node):
-          all_nodes.update(G.successors(node))
+    G = snapshot.adjacency(RelationshipTypeEnum.SUBGENRE_OF.value)
+    for node in expanded:
+      all_nodes.update(G.successors(node))
 
-      self.prune_descendants(G, expanded, all_nodes)
+    self.prune_descendants(G, expanded, all_nodes)
 
-    with GenreGraph() as G:
-      return G.subgraph(all_nodes)
+    return snapshot.G.subgraph(all_nodes)
 
 StartingGenresStrategy.initialize_starting_genres()
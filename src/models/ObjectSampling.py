@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from pydantic import BaseModel, Field
 from typing import List, Optional, Any, Union, Literal
 import numpy as np
+import hashlib
 import random
 import logging
 
@@ -9,15 +10,142 @@ import logging
 logger = logging.getLogger("ObjectSampling")
 logging.basicConfig(level=logging.INFO)
 
+
+class ItemColumns:
+  """Column view of a list of objects, for the vectorized filters and samplers."""
+  def __init__(self, items: List[Any]):
+    self.items = items
+    self._columns = {}
+
+  def __len__(self) -> int:
+    return len(self.items)
+
+  def column(self, attr: str) -> np.ndarray:
+    if attr not in self._columns:
+      self._columns[attr] = np.array([getattr(item, attr) for item in self.items], dtype=np.float64)
+    return self._columns[attr]
+
+
+class AliasTable:
+  """
+  Walker's alias table over a fixed distribution of rows: after an O(n)
+  build, every draw is O(1), so it pays off for distributions drawn from repeatedly.
+  """
+  # rejection rounds for distinct draws before falling back to np.random.choice
+  max_rounds = 8
+
+  def __init__(self, rows: np.ndarray, probs: np.ndarray):
+    self.rows = rows
+    self.probs = probs
+    self.support = int(np.count_nonzero(probs))
+    n = len(rows)
+    scaled = probs * n
+    self.accept = np.ones(n)
+    self.alias = np.arange(n)
+
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+      s, l = small.pop(), large.pop()
+      self.accept[s] = scaled[s]
+      self.alias[s] = l
+      scaled[l] -= 1.0 - scaled[s]
+      (small if scaled[l] < 1.0 else large).append(l)
+    # leftovers are 1 up to rounding, unless a row without weight is left over
+    empty = probs <= 0
+    if empty.any() and self.support:
+      self.alias[empty & (self.alias == np.arange(n))] = np.argmax(probs)
+      self.accept[empty] = 0.0
+
+  def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+    """size rows, with replacement."""
+    slots = rng.integers(0, len(self.rows), size=size)
+    keep = rng.random(size) < self.accept[slots]
+    return self.rows[np.where(keep, slots, self.alias[slots])]
+
+  def sample(self, rng: np.random.Generator, k: int) -> np.ndarray:
+    """
+    k distinct rows, distributed like successive draws without replacement:
+    draws with replacement and rejects the rows already drawn.
+    """
+    k = min(k, self.support)
+    if k <= 0:
+      return self.rows[:0]
+    chosen = {}
+    for _ in range(self.max_rounds):
+      chosen.update(dict.fromkeys(self.draw(rng, 2 * (k - len(chosen)) + 4).tolist()))
+      if len(chosen) >= k:
+        return np.fromiter(chosen, dtype=self.rows.dtype, count=k)
+
+    # most of the mass is drawn already, renormalize over the rest
+    drawn = np.fromiter(chosen, dtype=self.rows.dtype, count=len(chosen))
+    left = ~np.isin(self.rows, drawn) & (self.probs > 0)
+    total = self.probs[left].sum()
+    if total <= 0:
+      # only rounding mass left: the rest uniformly from the undrawn rows with weight
+      probs = np.full(np.count_nonzero(left), 1 / np.count_nonzero(left))
+    else:
+      probs = self.probs[left] / total
+    rest = rng.choice(self.rows[left], size=k - len(drawn), replace=False, p=probs)
+    return np.concatenate([drawn, rest])
+
+class Segments:
+  """
+  Consecutive rows grouped into segments (e.g. the artist pools of several
+  genres in one array), with per-segment reductions.
+  """
+  def __init__(self, ids: np.ndarray, n: int):
+    self.ids = ids # segment of every row, ascending
+    self.n = n
+    self.counts = np.bincount(ids, minlength=n)
+    self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+
+  def take(self, rows: np.ndarray) -> "Segments":
+    return Segments(self.ids[rows], self.n)
+
+  def sum(self, values: np.ndarray) -> np.ndarray:
+    return np.bincount(self.ids, weights=values, minlength=self.n)
+
+  def reduce(self, ufunc: np.ufunc, values: np.ndarray, empty: float) -> np.ndarray:
+    result = np.full(self.n, empty, dtype=np.float64)
+    present = self.counts > 0
+    if len(values):
+      result[present] = ufunc.reduceat(values, self.starts[present])
+    return result
+
+  def order(self, keys: np.ndarray) -> np.ndarray:
+    """
+    Rows grouped by segment, by ascending key within each segment. Keys are
+    scaled into [0, 0.5] per segment and offset by the segment, so one
+    argsort does what a lexsort over (key, segment) does at several times the cost.
+    """
+    lo = self.reduce(np.minimum, keys, 0.0)[self.ids]
+    span = self.reduce(np.maximum, keys, 0.0)[self.ids] - lo
+    scaled = np.divide(keys - lo, 2 * span, out=np.zeros_like(keys), where=span > 0)
+    return np.argsort(self.ids + scaled)
+
+  def positions(self, order: np.ndarray) -> np.ndarray:
+    """Position of every row of order (grouped by segment) within its segment."""
+    return np.arange(len(order)) - self.starts[self.ids[order]]
+
+  def normalize(self, weights: np.ndarray) -> np.ndarray:
+    """Weights divided by their segment's total, segments without weight stay 0."""
+    totals = self.sum(weights)[self.ids]
+    return np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
 ### FILTERING
 
 class Filter(BaseModel, ABC):
-  """Abstract base class for filters applied to item lists."""
+  """Abstract base class for filters applied to item lists or columns."""
   def __call__(self, items) -> list:
     return self.apply(items)
 
+  def apply(self, items: list):
+    return [item for item, keep in zip(items, self.mask(ItemColumns(items))) if keep]
+
   @abstractmethod
-  def apply(self, items):
+  def mask(self, columns) -> np.ndarray:
+    """Boolean array, True for the rows that pass."""
     pass
 
 
@@ -27,22 +155,25 @@ class AttributeFilter(Filter):
   min: Optional[float] = None
   max: Optional[float] = None
 
-  def apply(self, items: list):
-    return [
-      item for item in items
-      if (self.min is None or getattr(item, self.attr) >= self.min)
-      and (self.max is None or getattr(item, self.attr) <= self.max)
-    ]
+  def mask(self, columns) -> np.ndarray:
+    values = columns.column(self.attr)
+    keep = np.ones(len(values), dtype=bool)
+    if self.min is not None:
+      keep &= values >= self.min
+    if self.max is not None:
+      keep &= values <= self.max
+    return keep
 
 
 class CombinedFilter(Filter):
   """Combines multiple AttributeFilters sequentially."""
   filters: List[AttributeFilter]
 
-  def apply(self, items: list):
+  def mask(self, columns) -> np.ndarray:
+    keep = np.ones(len(columns), dtype=bool)
     for f in self.filters:
-      items = f(items)
-    return items
+      keep &= f.mask(columns)
+    return keep
 
 FilterTypes = Union[AttributeFilter, CombinedFilter]
 
@@ -94,31 +225,65 @@ class AttributeWeightedSampling(SamplingStrategy):
     return random.choices(items, weights=w, k=1)[0] if sum(w) > 0 else random.choice(items)
 
   def log(self, items):
-    vals = np.array([max(getattr(item, self.attr), 1e-6) for item in items])
-    logs = np.log(vals)
-    logs = logs if self.higher_is_better else -logs
-    weights = np.power(logs, self.alpha)
-    return items, weights.tolist()
+    return items, self.log_weights(ItemColumns(items).column(self.attr)).tolist()
 
   def softmax(self, items):
-    vals = np.array([getattr(item, self.attr) for item in items])
-    vals = vals if self.higher_is_better else -vals
-    vals = (vals - np.min(vals)) / (np.ptp(vals) + 1e-8)  # scale to [0,1]
-    vals *= self.alpha # sharpen
-    exp_vals = np.exp(vals - np.max(vals))  # stability
-    weights = exp_vals / np.sum(exp_vals)
-    return items, weights.tolist()
+    return items, self.softmax_weights(ItemColumns(items).column(self.attr)).tolist()
 
   def rank_based(self, items):
-    attr_values = np.array([getattr(item, self.attr) for item in items])
-    sort_idx = np.argsort(attr_values)
-    if not self.higher_is_better:
-      sort_idx = sort_idx[::-1]  # Reverse if needed
-
+    sort_idx = self.rank_order(ItemColumns(items).column(self.attr))
     sorted_items = [items[i] for i in sort_idx]
     weights = np.power(np.arange(1, len(items) + 1), self.alpha)
     return sorted_items, weights.tolist()
 
+  def log_weights(self, values: np.ndarray) -> np.ndarray:
+    logs = np.log(np.maximum(values, 1e-6))
+    logs = logs if self.higher_is_better else -logs
+    # negative logs have no real power and are no valid weight
+    return np.power(np.maximum(logs, 0), self.alpha)
+
+  def softmax_weights(self, values: np.ndarray) -> np.ndarray:
+    vals = values if self.higher_is_better else -values
+    vals = (vals - np.min(vals)) / (np.ptp(vals) + 1e-8)  # scale to [0,1]
+    vals = vals * self.alpha # sharpen
+    exp_vals = np.exp(vals - np.max(vals))  # stability
+    return exp_vals / np.sum(exp_vals)
+
+  def rank_order(self, values: np.ndarray) -> np.ndarray:
+    """Row indices from the lowest to the highest ranked row."""
+    sort_idx = np.argsort(values, kind="stable")
+    return sort_idx if self.higher_is_better else sort_idx[::-1]
+
+  def weights(self, values: np.ndarray) -> np.ndarray:
+    """Weight per row, in row order, summing to 1 (or all 0)."""
+    if len(values) == 0:
+      return np.zeros(0)
+    if self.mode == "log":
+      weights = self.log_weights(values)
+    elif self.mode == "softmax":
+      weights = self.softmax_weights(values)
+    else:
+      weights = np.empty(len(values))
+      weights[self.rank_order(values)] = np.power(np.arange(1, len(values) + 1), self.alpha)
+    total = np.sum(weights)
+    return weights / total if total > 0 else weights
+
+  def segment_weights(self, values: np.ndarray, segments: Segments) -> np.ndarray:
+    """weights() of every segment of values at once."""
+    if self.mode == "log":
+      weights = self.log_weights(values)
+    elif self.mode == "softmax":
+      vals = values if self.higher_is_better else -values
+      lo = segments.reduce(np.minimum, vals, 0.0)[segments.ids]
+      hi = segments.reduce(np.maximum, vals, 0.0)[segments.ids]
+      vals = (vals - lo) / (hi - lo + 1e-8) * self.alpha
+      weights = np.exp(vals - max(self.alpha, 0))  # stability, cancelled by normalize
+    else:
+      order = segments.order(values if self.higher_is_better else -values)
+      weights = np.empty(len(values))
+      weights[order] = np.power(segments.positions(order) + 1.0, self.alpha)
+    return segments.normalize(weights)
+
   def apply(self, items: List[Any], seed: Optional[int] = None) -> Any:
     if seed is not None:
       random.seed(seed)
@@ -137,56 +302,82 @@ class WeightedCombinedSampler(SamplingStrategy):
   n_samples: int = 1
 
   def apply(self, items: List[Any], seed: Optional[int] = None) -> List[Any]:
-    if seed is not None:
-      random.seed(seed)
-    logger.info(f"Combined sampling from {len(self.samplers)} samplers.")
+    return [items[i] for i in self.sample_rows(ItemColumns(items), seed=seed)]
 
-    n = len(items)
-    combined_weights = np.zeros(n)
-
-    # Normalize sampler weights
+  def combined_weights(self, columns, rows: np.ndarray) -> np.ndarray:
+    """Weighted sum of the samplers' normalized weights of the given rows."""
     sampler_weights = (
       np.array(self.weights) / sum(self.weights)
       if self.weights else np.ones(len(self.samplers)) / len(self.samplers)
     )
-
+    combined = np.zeros(len(rows))
     for sampler, w in zip(self.samplers, sampler_weights):
-      if sampler.mode == "log":
-        _, weights = sampler.log(items)
-        indices = list(range(n))
-      elif sampler.mode == "softmax":
-        _, weights = sampler.softmax(items)
-        indices = list(range(n))
-      else:  # rank-based
-        sorted_attr = np.array([getattr(item, sampler.attr) for item in items])
-        sort_idx = np.argsort(sorted_attr)
-        if not sampler.higher_is_better:
-          sort_idx = sort_idx[::-1]
-        weights = (np.arange(1, n + 1) ** sampler.alpha).tolist()
-        indices = sort_idx.tolist()
-
-      weights = np.array(weights)
-      if np.sum(weights) > 0:
-        weights = weights / np.sum(weights)
-
-      # Map weights back to original item indices
-      temp_weights = np.zeros(n)
-      for idx, w_val in zip(indices, weights):
-        temp_weights[idx] = w_val
-
-      combined_weights += w * temp_weights
-
-    n = min(self.n_samples, len(items))
-    if np.sum(combined_weights) == 0:
+      combined += w * sampler.weights(columns.column(sampler.attr)[rows])
+    return combined
+
+  def row_probs(self, columns, mask: Optional[np.ndarray] = None):
+    """
+    The rows of columns (anything with len() and column(attr) -> np.ndarray)
+    where mask is True, and their probabilities.
+    """
+    rows = np.arange(len(columns)) if mask is None else np.flatnonzero(mask)
+    combined_weights = self.combined_weights(columns, rows)
+    total = np.sum(combined_weights)
+    if total == 0:
       logger.warning("Combined weights sum to zero; falling back to random sample.")
-      return random.sample(items, n)
-    else:
-      probs = combined_weights / np.sum(combined_weights)
-      indices = np.random.choice(len(items), size=n, replace=False, p=probs)
-      return [items[i] for i in indices]
+      return rows, np.full(len(rows), 1 / len(rows)) if len(rows) else combined_weights
+    return rows, combined_weights / total
+
+  def sample_segments(self, columns, segments: Segments, mask: Optional[np.ndarray] = None, seed: Optional[int] = None) -> List[np.ndarray]:
+    """
+    sample_rows for every segment of columns in one pass: the samplers'
+    weights are computed per segment, and the n_samples rows of every
+    segment are the top keys log(p) + Gumbel noise within it, which is
+    distributed like successive draws without replacement.
+    """
+    rows = np.arange(len(columns)) if mask is None else np.flatnonzero(mask)
+    segments = segments.take(rows)
+    sampler_weights = (
+      np.array(self.weights) / sum(self.weights)
+      if self.weights else np.ones(len(self.samplers)) / len(self.samplers)
+    )
+    combined = np.zeros(len(rows))
+    for sampler, w in zip(self.samplers, sampler_weights):
+      combined += w * sampler.segment_weights(columns.column(sampler.attr)[rows], segments)
+    # segments without weight are sampled uniformly
+    uniform = (segments.sum(combined) == 0)[segments.ids]
+    combined[uniform] = 1.0
+
+    # rows without weight are never drawn, so they take no positions either
+    eligible = np.flatnonzero(combined > 0)
+    rows, combined, segments = rows[eligible], combined[eligible], segments.take(eligible)
+
+    rng = np.random.default_rng(seed)
+    keys = np.log(combined) + rng.gumbel(size=len(rows))
+    order = segments.order(-keys)
+    chosen = order[segments.positions(order) < self.n_samples]
+    return np.split(rows[chosen], np.cumsum(np.bincount(segments.ids[chosen], minlength=segments.n))[:-1])
+
+  def sample_rows(self, columns, mask: Optional[np.ndarray] = None, seed: Optional[int] = None) -> np.ndarray:
+    """Draws n_samples distinct rows of columns, restricted to the rows where mask is True."""
+    logger.info(f"Combined sampling from {len(self.samplers)} samplers.")
+    rows, probs = self.row_probs(columns, mask)
+    n = min(self.n_samples, int(np.count_nonzero(probs)))
+    if n <= 0:
+      return rows[:0]
+    return np.random.default_rng(seed).choice(rows, size=n, replace=False, p=probs)
 
 
 class SamplingConfig(BaseModel):
   """Configuration for sampling with optional filters and a sampler."""
   filters: Optional[List[AttributeFilter]] = Field(default_factory=list)
-  sampler: WeightedCombinedSampler
\ No newline at end of file
+  sampler: WeightedCombinedSampler
+
+  def weights_key(self) -> str:
+    """Hash of everything that determines the sampling weights, i.e. all but n_samples."""
+    data = self.model_dump_json(include={"filters": True, "sampler": {"samplers": True, "weights": True}})
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+  def alias_table(self, columns) -> AliasTable:
+    mask = CombinedFilter(filters=self.filters).mask(columns) if self.filters else None
+    return AliasTable(*self.sampler.row_probs(columns, mask))
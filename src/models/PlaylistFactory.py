@@ -1,12 +1,12 @@
 import logging
 from spotipy import Spotify
-from typing import Set, Dict, Optional, Literal, List
+from typing import AsyncIterator, Set, Dict, Optional, Literal, List, Tuple
 from pydantic import BaseModel, Field
 
 from src.models.ArtistHandler import ArtistHandler
-from src.models.ObjectSampling import SamplingConfig, CombinedFilter, WeightedCombinedSampler, AttributeFilter
+from src.models.ObjectSampling import SamplingConfig, WeightedCombinedSampler, AttributeFilter
 from src.models.PlaylistEditor import PlaylistEditor
-from src.models.SongSampler import SongSamplerConfig, SAMPLERS, CombinedSamplerConfig
+from src.models.SongSampler import SongSamplerConfig, SAMPLERS, CombinedSamplerConfig, CombinedSongSampler
 from src.core.GenreGraph import GenreGraph
 from src.core.SpotifyCache import Track
 
@@ -107,6 +107,20 @@ class PlaylistFactory(BaseModel):
   def sample_artists(self, genre_id: int, config: SamplingConfig, reset: bool=True):
     """Sample artists for a genre with given SamplingConfig."""
     logger.info(f"Sampling Artists: {genre_id}")
+    genre = self._artist_sampling(genre_id, config, reset)
+    pool = ArtistHandler().get_pool(genre_id)
+    genre.artists.sampled.update(pool.sample(config))
+
+  def sample_artists_batch(self, genre_ids: List[int], config: SamplingConfig, reset: bool=True):
+    """sample_artists for several genres, sampled together in one pass."""
+    logger.info(f"Sampling Artists: {genre_ids}")
+    genres = [self._artist_sampling(genre_id, config, reset) for genre_id in genre_ids]
+    sampled = ArtistHandler.sample_pools(ArtistHandler().get_pools(genre_ids), config)
+    for genre in genres:
+      genre.artists.sampled.update(sampled[genre.id])
+
+  def _artist_sampling(self, genre_id: int, config: SamplingConfig, reset: bool) -> UserGenre:
+    """The genre, added if needed, with config as its artist sampling config."""
     if genre_id not in self.genres:
       self.add_genre(genre_id)
 
@@ -120,12 +134,7 @@ class PlaylistFactory(BaseModel):
 
     if reset:
       genre.artists.sampled.clear()
-
-    pool = ArtistHandler().get_pool(genre_id)
-    artists = CombinedFilter(filters=config.filters)(pool.artists) if config.filters else pool.artists
-
-    artist_ids = set(a.id for a in config.sampler.apply(artists))
-    genre.artists.sampled.update(artist_ids)
+    return genre
 
   def sampled_artists(self, genre_id: Optional[int] = None) -> Dict[int, list]:
     """Return sampled artist IDs for selected genres (or specific genre)."""
@@ -133,7 +142,7 @@ class PlaylistFactory(BaseModel):
       return {genre_id: list(self.genres[genre_id].artists.sampled)}
     return {genre.id: list(genre.artists.sampled) for genre in self.genres.values() if genre.selected and genre.artists}
 
-  def sample_tracks(self, genre_id: int, sampler_config: SongSamplerConfig, reset: bool=True):
+  async def sample_tracks(self, genre_id: int, sampler_config: SongSamplerConfig, reset: bool=True):
     """Sample tracks for a genre with given SongSamplerConfig config."""
     logger.info(f"Sampling Tracks: {genre_id}")
     genre: UserGenre = self.genres[genre_id]
@@ -142,17 +151,35 @@ class PlaylistFactory(BaseModel):
       genre.tracks = SampledTracks(sampler=sampler_config)
     else:
       genre.tracks.sampler = sampler_config
-    pool = ArtistHandler().get_pool(genre_id)
-
-    artist_ids = [a.spotify_id for a in pool.artists if a.id in self.genres[genre_id].artists.sampled]
+    columns = ArtistHandler().get_pool(genre_id).columns()
+    artist_ids = columns.spotify_ids(columns.rows_of(self.genres[genre_id].artists.sampled))
     sampler = SAMPLERS[sampler_config.type](config=sampler_config)
-    tracks = sampler.sample(artist_ids)
+    tracks = await sampler.sample(artist_ids)
 
     if reset:
       genre.tracks.sampled.clear()
 
     genre.tracks.sampled.update(tracks)
 
+  async def stream_tracks(self, genre_id: int, sampler_config: CombinedSamplerConfig, reset: bool=True) -> AsyncIterator[Tuple[str, dict]]:
+    """sample_tracks, yielding the sampler's progress and track events; the genre is updated when done."""
+    logger.info(f"Streaming Tracks: {genre_id}")
+    genre: UserGenre = self.genres[genre_id]
+
+    if genre.tracks is None:
+      genre.tracks = SampledTracks(sampler=sampler_config)
+    else:
+      genre.tracks.sampler = sampler_config
+    columns = ArtistHandler().get_pool(genre_id).columns()
+    artist_ids = columns.spotify_ids(columns.rows_of(self.genres[genre_id].artists.sampled))
+    sampler = CombinedSongSampler(config=sampler_config)
+    async for event, data in sampler.stream(artist_ids):
+      if event == "done":
+        if reset:
+          genre.tracks.sampled.clear()
+        genre.tracks.sampled.update(data["tracks"])
+      yield event, data
+
   def sampled_tracks(self, genre_id: Optional[int] = None) -> Set[Track]:
     """Return sampled tracks for selected genres (or specific genre)."""
     sampled_genres = [genre for genre in self.genres.values() if genre.selected and genre.tracks]
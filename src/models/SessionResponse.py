@@ -20,6 +20,12 @@ class Genre(BaseModel):
   has_subgenre: bool
   is_selectable: bool
 
+class GenreSearchResult(BaseModel):
+  id: int
+  name: str
+  score: float
+  is_selectable: bool
+
 class GenreSelectionData(BaseModel):
   selected: List[int] = []
   expanded: List[int] = []
@@ -41,9 +47,31 @@ class GenreGraphData(BaseModel):
   relationships: List[GenreRelationship]
   layout: Dict[int, Coordinate]
 
+class Rescale(BaseModel):
+  """Maps coordinates to another bounding box: x * scale_x + offset_x, y * scale_y + offset_y."""
+  scale_x: float
+  offset_x: float
+  scale_y: float
+  offset_y: float
+
+class GenreGraphDelta(BaseModel):
+  """Changes to apply to the client's graph state base to get to state."""
+  base: str
+  state: str
+  added_genres: List[Genre] = []
+  removed_genres: List[int] = []
+  added_relationships: List[GenreRelationship] = []
+  removed_relationships: List[GenreRelationship] = []
+  layout: Dict[int, Coordinate] = {} # new and moved genres
+  rescale: Optional[Rescale] = None # for the other genres, when the layout's bounding box changed
+
 class SessionResponse(BaseModel):
-  genre_data: GenreData = GenreData()
+  genre_data: Optional[GenreData] = GenreData()
   graph: Optional[GenreGraphData] = None
+  graph_delta: Optional[GenreGraphDelta] = None # instead of graph and genre_data.genres, see X-Graph-State
+  graph_state: Optional[str] = None
   artists: Optional[ArtistMapData] = None
   factory: Optional[PlaylistFactory] = None
   user: Optional[SpotifyUser] = None
+  tags: Dict[str, str] = {} # section -> tag, send back in X-Section-Tags
+  unchanged: List[str] = [] # sections left out because the client's tag matched
@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
-from src.core.SpotifyCache import Album, Track, SpotifyCache, Release, AlbumType
-from typing import Dict, List, Literal, Set, Union, Annotated, Optional
+from src.core.SpotifyCache import Album, Track, AsyncSpotifyCache, Release, AlbumType
+from typing import AsyncIterator, Dict, List, Literal, Set, Tuple, Union, Annotated, Optional
 from collections import defaultdict
 from datetime import datetime
 import numpy as np
+import asyncio
 import math
 import random
 from pydantic import BaseModel, field_validator, Field
@@ -22,7 +23,7 @@ class SongSamplerConfig(BaseModel):
 class SongSampler(ABC):
   def __init__(self, config: SongSamplerConfig) -> None:
     self.config = config
-    self.sp = SpotifyCache()
+    self.sp = AsyncSpotifyCache()
 
 
   @staticmethod
@@ -32,21 +33,29 @@ class SongSampler(ABC):
     contains_keywords = any(keyword in name for keyword in NON_CORE_KEYWORDS)
     return from_main_artist and not contains_keywords
 
-  def sample(self, artist_ids: List[str], num: int = 5) -> Set[Track]:
+  async def core_releases(self, artist_ids: List[str], core_only: bool) -> List[Album]:
+    """Releases of all artists, fetched concurrently, optionally core releases only."""
+    by_artist = await self.sp.get_releases_many(artist_ids)
+    return [
+      release for artist_id in artist_ids
+      for release in by_artist.get(artist_id) or [] if not core_only or self.is_core_release(release, artist_id)
+    ]
+
+  async def sample(self, artist_ids: List[str], num: int = 5) -> Set[Track]:
     if not artist_ids or num <= 0:
       return set()
 
     if num < len(artist_ids):
-      return self.sample_evenly_across_artists(artist_ids, num)
+      return await self.sample_evenly_across_artists(artist_ids, num)
     else:
-      return self.sample_multiple_per_artist(artist_ids, num)
+      return await self.sample_multiple_per_artist(artist_ids, num)
 
   @abstractmethod
-  def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
+  async def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
     raise NotImplementedError
 
   @abstractmethod
-  def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
+  async def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
     raise NotImplementedError
 
 
@@ -54,24 +63,26 @@ class TopSongsConfig(SongSamplerConfig):
   type: Literal["top_songs"] = "top_songs"
 
 class TopSongsSampler(SongSampler):
-  def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
+  async def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
     sampled_artists = random.sample(artist_ids, num)
     sampled_tracks = set()
 
-    for artist_id in sampled_artists:
-      top_tracks = self.sp.get_top_tracks(artist_id)
+    top_tracks_per_artist = await asyncio.gather(*(self.sp.get_top_tracks(aid) for aid in sampled_artists))
+    for top_tracks in top_tracks_per_artist:
       if top_tracks:
         sampled_tracks.add(random.choice(top_tracks))
 
     return sampled_tracks
 
-  def sample_multiple_per_artist(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
+  async def sample_multiple_per_artist(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
     if num > len(artist_ids) * 10:
       num = len(artist_ids) * 10
 
+    unique_ids = list(set(artist_ids))
+    top_tracks_per_artist = await asyncio.gather(*(self.sp.get_top_tracks(aid) for aid in unique_ids))
     artist_to_tracks = {
-      artist_id: set(self.sp.get_top_tracks(artist_id))
-      for artist_id in set(artist_ids)
+      artist_id: set(top_tracks)
+      for artist_id, top_tracks in zip(unique_ids, top_tracks_per_artist)
     }
     available_artists = [aid for aid, tracks in artist_to_tracks.items() if tracks]
 
@@ -93,25 +104,23 @@ class RandomReleaseConfig(SongSamplerConfig):
   type: Literal["random_release"] = "random_release"
 
 class RandomReleaseSongSampler(SongSampler):
-  def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
+  async def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
     sampled_artists = random.sample(artist_ids, num)
+    artist_to_releases = await self.sp.get_releases_many(sampled_artists)
+
+    chosen_releases = [random.choice(releases) for releases in artist_to_releases.values() if releases]
+    album_to_tracks = await self.sp.get_album_tracks_many([release.id for release in chosen_releases])
 
     sampled_tracks = set()
-    for artist_id in sampled_artists:
-      releases = self.sp.get_releases(artist_id)
-      if not releases:
-        continue
-      release = random.choice(releases)
-      track = random.choice(self.sp.get_album_tracks(release.id))
-      sampled_tracks.add(track)
+    for release in chosen_releases:
+      tracks = album_to_tracks.get(release.id)
+      if tracks:
+        sampled_tracks.add(random.choice(tracks))
 
     return sampled_tracks
 
-  def sample_multiple_per_artist(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
-    artist_to_releases = {
-      artist_id: self.sp.get_releases(artist_id)
-      for artist_id in set(artist_ids)
-    }
+  async def sample_multiple_per_artist(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
+    artist_to_releases = await self.sp.get_releases_many(list(set(artist_ids)))
     available_artists = [aid for aid, releases in artist_to_releases.items() if releases]
 
     if not available_artists:
@@ -121,7 +130,7 @@ class RandomReleaseSongSampler(SongSampler):
     while len(sampled_tracks) < num and max_iter > 0:
       artist_id = available_artists[max_iter % len(available_artists)]
       release = random.choice(artist_to_releases[artist_id])
-      tracks = self.sp.get_album_tracks(release.id)
+      tracks = await self.sp.get_album_tracks(release.id)
       if tracks:
         track = random.choice(tracks)
         sampled_tracks.add(track)
@@ -142,11 +151,8 @@ class AlbumClusterSampler(SongSampler):
       clusters[release.type].append(release)
     return dict(clusters)
 
-  def sample_from_release_clusters(self, artist_ids: List[str], num: int = 5, max_iter: int = 1000) -> Set[Track]:
-    releases = [
-      release for artist_id in artist_ids
-      for release in self.sp.get_releases(artist_id) or [] if not self.config.core_only or self.is_core_release(release, artist_id)
-    ]
+  async def sample_from_release_clusters(self, artist_ids: List[str], num: int = 5, max_iter: int = 1000) -> Set[Track]:
+    releases = await self.core_releases(artist_ids, self.config.core_only)
     if not releases:
       return set()
 
@@ -155,11 +161,13 @@ class AlbumClusterSampler(SongSampler):
     if not filtered:
       return set()
 
+    album_to_tracks = await self.sp.get_album_tracks_many([r.id for rs in filtered.values() for r in rs])
+
     sampled_tracks = set()
     while len(sampled_tracks) < num and max_iter > 0:
       release_type = random.choice(list(filtered))
       release = random.choice(filtered[release_type])
-      tracks = self.sp.get_album_tracks(release.id) or []
+      tracks = album_to_tracks.get(release.id) or []
       tracks = [track for track in tracks if not self.config.core_only or self.is_core_release(track)]
       if tracks:
         sampled_tracks.add(random.choice(tracks))
@@ -167,13 +175,13 @@ class AlbumClusterSampler(SongSampler):
 
     return sampled_tracks
 
-  def sample_evenly_across_artists(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
+  async def sample_evenly_across_artists(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
     sampled_artists = random.sample(artist_ids, num)
-    sampled_tracks = self.sample_from_release_clusters(sampled_artists, num=num)
+    sampled_tracks = await self.sample_from_release_clusters(sampled_artists, num=num)
     return sampled_tracks
 
-  def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
-    sampled_tracks = self.sample_from_release_clusters(artist_ids, num=num)
+  async def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
+    sampled_tracks = await self.sample_from_release_clusters(artist_ids, num=num)
     return sampled_tracks
 
 class FullTrackPoolConfig(SongSamplerConfig):
@@ -181,13 +189,11 @@ class FullTrackPoolConfig(SongSamplerConfig):
   core_only: bool
 
 class FullTrackPoolSampler(SongSampler):
-  def sample_from_full_track_pool(self, artist_ids: List[str], num: int) -> Set[Track]:
-    releases = [
-      release for artist_id in artist_ids
-      for release in self.sp.get_releases(artist_id) or [] if not self.config.core_only or self.is_core_release(release, artist_id)
-    ]
+  async def sample_from_full_track_pool(self, artist_ids: List[str], num: int) -> Set[Track]:
+    releases = await self.core_releases(artist_ids, self.config.core_only)
+    album_to_tracks = await self.sp.get_album_tracks_many([release.id for release in releases])
     tracks = set(
-      track for release in releases for track in self.sp.get_album_tracks(release.id)
+      track for release in releases for track in album_to_tracks.get(release.id, [])
       if not self.config.core_only or self.is_core_release(track)
     )
 
@@ -199,11 +205,11 @@ class FullTrackPoolSampler(SongSampler):
 
     return random.sample(list(tracks), num)
 
-  def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
-    return self.sample_from_full_track_pool(artist_ids, num=num)
+  async def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
+    return await self.sample_from_full_track_pool(artist_ids, num=num)
 
-  def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
-    return self.sample_from_full_track_pool(artist_ids, num=num)
+  async def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
+    return await self.sample_from_full_track_pool(artist_ids, num=num)
 
 class NearestReleaseDateConfig(SongSamplerConfig):
   type: Literal["nearest_release_date"] = "nearest_release_date"
@@ -242,11 +248,8 @@ class NearestReleaseDateSampler(SongSampler):
     indices = np.random.choice(len(items), size=1, replace=False, p=probs)
     return [items[i] for i in indices][0]
 
-  def sample_by_target_release_date(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
-    releases: List[Album] = [
-      release for artist_id in artist_ids
-      for release in self.sp.get_releases(artist_id) or [] if not self.config.core_only or self.is_core_release(release, artist_id)
-    ]
+  async def sample_by_target_release_date(self, artist_ids: List[str], num: int, max_iter: int=1000) -> Set[Track]:
+    releases: List[Album] = await self.core_releases(artist_ids, self.config.core_only)
     weights: List[float] = [
       self.compute_weight(self.parse_release_date_flexible(r.release_date))
       for r in releases
@@ -258,7 +261,7 @@ class NearestReleaseDateSampler(SongSampler):
     sampled_tracks = set()
     while len(sampled_tracks) < num and max_iter > 0:
       release = self.weighted_sample_no_replace(releases, weights)
-      tracks = self.sp.get_album_tracks(release.id) or []
+      tracks = await self.sp.get_album_tracks(release.id) or []
       if tracks:
         track = random.choice(tracks)
         sampled_tracks.add(track)
@@ -266,11 +269,11 @@ class NearestReleaseDateSampler(SongSampler):
 
     return sampled_tracks
 
-  def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
-    return self.sample_by_target_release_date(artist_ids, num=num)
+  async def sample_multiple_per_artist(self, artist_ids: List[str], num: int) -> Set[Track]:
+    return await self.sample_by_target_release_date(artist_ids, num=num)
 
-  def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
-    return self.sample_by_target_release_date(artist_ids, num=num)
+  async def sample_evenly_across_artists(self, artist_ids: List[str], num: int) -> Set[Track]:
+    return await self.sample_by_target_release_date(artist_ids, num=num)
 
 
 
@@ -298,7 +301,7 @@ class CombinedSongSampler:
   def __init__(self, config: CombinedSamplerConfig):
     self.config = config
 
-  def sample(self, artist_ids: List[str], num: Optional[int] = None) -> Set[Track]:
+  async def sample(self, artist_ids: List[str], num: Optional[int] = None) -> Set[Track]:
     if self.config.n_samples and not num:
       num = self.config.n_samples
     num = 1 if num is None else num
@@ -309,7 +312,7 @@ class CombinedSongSampler:
       sampler_cls = SAMPLERS[pair.strategy.type]
       sampler: SongSampler = sampler_cls(config=pair.strategy)
       portion = round(num * (pair.weight / total_weight))
-      tracks = sampler.sample(artist_ids, portion)
+      tracks = await sampler.sample(artist_ids, portion)
       sampled_tracks.update(tracks)
 
     # collect missing samples
@@ -321,7 +324,7 @@ class CombinedSongSampler:
         sampler_cls = SAMPLERS[pair.strategy.type]
         sampler: SongSampler = sampler_cls(config=pair.strategy)
         # Sample one additional track
-        additional_track = sampler.sample(artist_ids, 1)
+        additional_track = await sampler.sample(artist_ids, 1)
         sampled_tracks.update(additional_track)
       iterations += 1
 
@@ -331,6 +334,63 @@ class CombinedSongSampler:
 
     return sampled_tracks
 
+  @staticmethod
+  def allocate(artist_ids: List[str], num: int) -> Dict[str, int]:
+    """Tracks per artist: one each for num random artists, or num spread evenly over all artists."""
+    if num <= 0 or not artist_ids:
+      return {}
+    if num < len(artist_ids):
+      return {artist_id: 1 for artist_id in random.sample(artist_ids, num)}
+    per_artist, extra = divmod(num, len(artist_ids))
+    lucky = set(random.sample(artist_ids, extra))
+    return {artist_id: per_artist + (artist_id in lucky) for artist_id in artist_ids}
+
+  async def stream(self, artist_ids: List[str], num: Optional[int] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Like sample, but yields ("artist", progress) and ("tracks", new tracks)
+    events as each artist resolves, and ("done", all tracks) at the end.
+    Every strategy samples its portion per artist, so the first tracks are
+    ready after a single artist's lookups.
+    """
+    if self.config.n_samples and not num:
+      num = self.config.n_samples
+    num = 1 if num is None else num
+    sampled_tracks = set()
+    total_weight = sum(strategy.weight for strategy in self.config.strategies)
+
+    tasks = []
+    for pair in self.config.strategies:
+      sampler: SongSampler = SAMPLERS[pair.strategy.type](config=pair.strategy)
+      portion = round(num * (pair.weight / total_weight))
+      for artist_id, quota in self.allocate(artist_ids, portion).items():
+        tasks.append(asyncio.ensure_future(self._sample_artist(sampler, artist_id, quota)))
+
+    try:
+      for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        artist_id, tracks = await task
+        yield "artist", {"artist_id": artist_id, "done": done, "total": len(tasks)}
+        new_tracks = [track for track in tracks if track not in sampled_tracks][:num - len(sampled_tracks)]
+        sampled_tracks.update(new_tracks)
+        if new_tracks:
+          yield "tracks", {"tracks": new_tracks}
+    finally:
+      for task in tasks:
+        task.cancel()
+
+    # collect missing samples
+    if len(sampled_tracks) < num:
+      missing = await self.sample(artist_ids, num - len(sampled_tracks))
+      new_tracks = [track for track in missing if track not in sampled_tracks][:num - len(sampled_tracks)]
+      sampled_tracks.update(new_tracks)
+      if new_tracks:
+        yield "tracks", {"tracks": new_tracks}
+
+    yield "done", {"tracks": sampled_tracks}
+
+  @staticmethod
+  async def _sample_artist(sampler: SongSampler, artist_id: str, num: int) -> Tuple[str, Set[Track]]:
+    return artist_id, await sampler.sample([artist_id], num)
+
 SAMPLERS = {
   "top_songs": TopSongsSampler,
   "random_release": RandomReleaseSongSampler,
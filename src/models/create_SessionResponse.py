@@ -1,42 +1,99 @@
-from src.core.SpotifyCache import SpotifyCache
+import hashlib
+from fastapi import Header
+from typing import Dict, Optional
+
+from src.core.GenreGraph import GenreGraph
+from src.core.PoolRefresher import pool_refresher
+from src.core.SpotifyCache import AsyncSpotifyCache
 from src.models.ArtistHandler import ArtistHandler
 from src.models.GenreDisplayStrategy import StartingGenresStrategy
 from src.models.SessionResponse import SessionResponse, ArtistMapData, GenreGraphData, GenreData, GenreSelectionData
-from src.core.session_manager import SessionData
+from src.core.session_manager import SECTIONS, SessionData
+
+
+def section_tags(session: SessionData) -> Dict[str, str]:
+  """
+  Opaque tag per section, changes whenever the section's version is bumped,
+  and for graph and artists also when the genre graph or a pool is rebuilt.
+  """
+  graph_version = GenreGraph.current().version
+  tags = {}
+  for section in SECTIONS:
+    version = f"{session.id}:{section}:{session.versions.get(section, 0)}"
+    if section == "graph":
+      version += f":{graph_version}"
+    elif section == "artists":
+      # the pool refresher rebuilds pools without touching any session
+      version += f":{pool_refresher.built_at(session.factory.selected_genres())}"
+    tags[section] = hashlib.sha1(version.encode()).hexdigest()[:16]
+  return tags
+
+
+def known_sections(x_section_tags: Optional[str] = Header(None)) -> Dict[str, str]:
+  """Parses the X-Section-Tags request header: 'graph=<tag>, artists=<tag>, ...'."""
+  known = {}
+  for item in (x_section_tags or "").split(","):
+    section, _, tag = item.strip().partition("=")
+    if section and tag:
+      known[section] = tag.strip('"')
+  return known
 
 
-async def create_SessionResponse(session: SessionData) -> SessionResponse:
+def graph_base(x_graph_state: Optional[str] = Header(None)) -> Optional[str]:
+  """The graph state the client has, from the graph_state of an earlier response."""
+  return x_graph_state
+
+
+async def create_SessionResponse(session: SessionData, known: Optional[Dict[str, str]] = None, graph_base: Optional[str] = None) -> SessionResponse:
+  """
+  Full response, or with known section tags from the client only the
+  sections that changed since; unchanged ones are None and not computed.
+  With the client's graph state as graph_base, the graph is sent as a delta.
+  """
   if not session:
     session = SessionData(id="temp")
 
+  tags = section_tags(session)
+  unchanged = [section for section in SECTIONS if known and known.get(section) == tags[section]]
+
   f = session.factory
   selected_genres = f.selected_genres()
   expanded_genres = f.expanded_genres()
 
-  genres, relations, layout = StartingGenresStrategy().to_GenreGraphData(
-    selected=set(selected_genres),
-    expanded=set(expanded_genres),
-    highlight=-1
-  )
-  genre_graph_data = GenreGraphData(relationships=relations, layout=layout)
-  genre_data = GenreData(
-    genres=genres,
-    state=GenreSelectionData(
-      selected=selected_genres,
-      expanded=expanded_genres,
-      highlight=-1
+  genre_data = genre_graph_data = graph_delta = graph_state = None
+  if "graph" not in unchanged:
+    strategy = StartingGenresStrategy()
+    subgraph = strategy.generate_subgraph(set(selected_genres), set(expanded_genres), -1)
+    graph_state = strategy.graph_state(subgraph)
+    if graph_base:
+      graph_delta = strategy.graph_delta(subgraph, graph_base, session.id)
+    genres = []
+    if graph_delta is None:
+      genres, relations, layout = strategy.graph_data(subgraph, session.id)
+      genre_graph_data = GenreGraphData(relationships=relations, layout=layout)
+    genre_data = GenreData(
+      genres=genres,
+      state=GenreSelectionData(
+        selected=selected_genres,
+        expanded=expanded_genres,
+        highlight=-1
+      )
     )
-  )
 
   artist_map = True
   artist_data = None
-  if artist_map:
-    pools = []
-    for genre_id in selected_genres:
-      pool = ArtistHandler().get_pool(genre_id)
-      pools.append(pool)
+  if artist_map and "artists" not in unchanged:
+    pools = list(ArtistHandler().get_pools(selected_genres).values())
     artist_data = ArtistMapData(pools=pools, sampled=f.sampled_artists() or {})
 
-  user = SpotifyCache().get_current_user(session.id)
+  user = None
+  if "user" not in unchanged:
+    user = await AsyncSpotifyCache().get_current_user(session.id)
+
+  factory = f if "factory" not in unchanged else None
 
-  return SessionResponse(genre_data=genre_data, graph=genre_graph_data, artists=artist_data, factory=f, user=user)
\ No newline at end of file
+  return SessionResponse(
+    genre_data=genre_data, graph=genre_graph_data, graph_delta=graph_delta, graph_state=graph_state,
+    artists=artist_data, factory=factory, user=user,
+    tags=tags, unchanged=unchanged
+  )
\ No newline at end of file
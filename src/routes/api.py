@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
-from src.routes import graph, artists, playlist, sample
+from src.routes import graph, artists, playlist, sample, stats, jobs
 
 router = APIRouter(prefix="/api", default_response_class=JSONResponse)
 
@@ -11,4 +11,8 @@ router.include_router(artists.router)
 
 router.include_router(playlist.router)
 
-router.include_router(sample.router)
\ No newline at end of file
+router.include_router(sample.router)
+
+router.include_router(stats.router)
+
+router.include_router(jobs.router)
\ No newline at end of file
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 
 from src.models.clientData import GraphUpdate
-from src.models.create_SessionResponse import create_SessionResponse
+from src.models.SessionResponse import GenreSearchResult
+from src.models.create_SessionResponse import create_SessionResponse, known_sections, graph_base
 from src.core.GenreGraph import GenreGraph
 from src.core.session_manager import get_session, store_session, SessionData
 
@@ -11,7 +13,8 @@ router = APIRouter(prefix="/graph", default_response_class=JSONResponse)
 
 
 @router.post("/update")
-async def update_graph(request: GraphUpdate, session: SessionData = Depends(get_session)):
+async def update_graph(request: GraphUpdate, session: SessionData = Depends(get_session), known: Dict[str, str] = Depends(known_sections),
+                       base: Optional[str] = Depends(graph_base)):
   action = request.action
   f = session.factory
 
@@ -45,13 +48,25 @@ async def update_graph(request: GraphUpdate, session: SessionData = Depends(get_
 
   f.remove_unexplored()
 
+  if action != "highlight":
+    session.bump("graph", "artists", "factory")
   await store_session(session)
-  response = await create_SessionResponse(session)
+  response = await create_SessionResponse(session, known, base)
   return response
 
+@router.get("/search")
+async def search_genres(q: str, limit: int = Query(10, ge=1, le=50)) -> List[GenreSearchResult]:
+  graph = GenreGraph()
+  results = []
+  for genre_id, score in graph.search(q, limit):
+    genre = graph.get_genre(genre_id)
+    results.append(GenreSearchResult(id=genre_id, name=genre["name"], score=score, is_selectable=genre["is_spotify_genre"]))
+  return results
+
 @router.get("/current_state")
-async def get_current_graph(session: SessionData = Depends(get_session)):
-  response = await create_SessionResponse(session)
+async def get_current_graph(session: SessionData = Depends(get_session), known: Dict[str, str] = Depends(known_sections),
+                            base: Optional[str] = Depends(graph_base)):
+  response = await create_SessionResponse(session, known, base)
   return response
 
 
@@ -0,0 +1,43 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from src.core.JobQueue import Job, job_queue
+from src.core.session_manager import session_with, SessionData
+from src.models.ObjectSampling import SamplingConfig
+from src.routes.sample import track_sampler
+
+router = APIRouter(prefix="/jobs", default_response_class=JSONResponse)
+
+# Queued counterparts of /sample and /playlist: they answer with the job at
+# once, the work is done by src/scripts/job_worker.py.
+
+@router.post("/sample/artists/{genre_id}", status_code=202)
+async def sample_artists(genre_id: int, config: SamplingConfig, session: SessionData = Depends(session_with())) -> Job:
+  return await job_queue.submit("sample_artists", session.id, {"genre_id": genre_id, "config": config.model_dump()})
+
+@router.post("/sample/tracks/{genre_id}", status_code=202)
+async def sample_tracks(genre_id: int, request: Request, session: SessionData = Depends(session_with())) -> Job:
+  sampler = track_sampler(await request.json())
+  return await job_queue.submit("sample_tracks", session.id, {"genre_id": genre_id, "sampler": sampler.model_dump()})
+
+@router.post("/playlist/update", status_code=202)
+async def update_playlist(request: Request, session: SessionData = Depends(session_with())) -> Job:
+  data = await request.json() if await request.body() else {}
+  name: Optional[str] = data.get("name") or None
+  return await job_queue.submit("update_playlist", session.id, {"name": name})
+
+async def session_job(job_id: str, session: SessionData) -> Job:
+  job = await job_queue.get(job_id)
+  if job is None or job.session_id != session.id:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return job
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, session: SessionData = Depends(session_with())) -> Job:
+  return await session_job(job_id, session)
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str, session: SessionData = Depends(session_with())) -> Job:
+  job = await session_job(job_id, session)
+  return await job_queue.cancel(job.id)
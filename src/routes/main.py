@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from fastapi.responses import HTMLResponse
 import logging
 
-from src.core.session_manager import get_session
+from src.core.session_manager import session_with
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,7 +11,7 @@ logging.basicConfig(
 router = APIRouter()
 
 @router.get("/", response_class=HTMLResponse)
-def home(session=Depends(get_session)):
+def home(session=Depends(session_with())):
     with open("src/templates/home.html") as f:
         return f.read()
 
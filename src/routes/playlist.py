@@ -2,7 +2,7 @@ from fastapi import APIRouter, Request, Depends
 from fastapi.responses import JSONResponse
 
 from src.models.PlaylistEditor import PlaylistEditor
-from src.core.session_manager import get_session, store_session, SessionData
+from src.core.session_manager import get_session, session_with, store_session, SessionData
 from src.core.spotify_client import SpotifyUserClient
 
 router = APIRouter(prefix="/playlist", default_response_class=JSONResponse)
@@ -22,6 +22,7 @@ async def create_playlist(request: Request, session: SessionData = Depends(get_s
   factory.playlist.set_spotify(sp)
   factory.update_playlist()
 
+  session.bump("factory")
   await store_session(session)
 
   return factory.playlist.to_frontend()
@@ -33,11 +34,12 @@ async def update_playlist(session: SessionData = Depends(get_session)):
   factory = session.factory
   factory.playlist.set_spotify(sp)
   factory.update_playlist()
+  session.bump("factory")
   await store_session(session)
   return factory.playlist.to_frontend()
 
 @router.get("/current")
-async def get_current_playlist(session: SessionData = Depends(get_session)):
+async def get_current_playlist(session: SessionData = Depends(session_with("playlist"))):
   return session.factory.playlist.to_frontend() if session.factory.playlist else None
 
 
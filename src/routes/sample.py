@@ -1,27 +1,78 @@
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import JSONResponse
+import json
+import logging
+from typing import AsyncIterator, Dict
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from src.models.ObjectSampling import SamplingConfig
 from src.models.SongSampler import CombinedSamplerConfig, StrategyWeightPair, RandomReleaseConfig
-from src.models.create_SessionResponse import create_SessionResponse
+from src.models.create_SessionResponse import create_SessionResponse, known_sections
 from src.core.session_manager import get_session, store_session, SessionData
 
+logger = logging.getLogger("SampleRouter")
+
 router = APIRouter(prefix="/sample", default_response_class=JSONResponse)
 
 @router.post("/artists/{genre_id}")
-async def sample_artists(genre_id: int, config: SamplingConfig, session: SessionData = Depends(get_session)):
+async def sample_artists(genre_id: int, config: SamplingConfig, session: SessionData = Depends(get_session), known: Dict[str, str] = Depends(known_sections)):
   print(config.model_dump_json(indent=2))
   session.factory.sample_artists(genre_id, config)
+  session.bump("artists", "factory")
+  await store_session(session)
+  return await create_SessionResponse(session, known)
+
+@router.post("/artists")
+async def sample_selected_artists(config: SamplingConfig, session: SessionData = Depends(get_session), known: Dict[str, str] = Depends(known_sections)):
+  """Sample artists for all selected genres at once."""
+  session.factory.sample_artists_batch(session.factory.selected_genres(), config)
+  session.bump("artists", "factory")
   await store_session(session)
-  return await create_SessionResponse(session)
+  return await create_SessionResponse(session, known)
+
+def track_sampler(data: dict) -> CombinedSamplerConfig:
+  sampler = CombinedSamplerConfig.model_validate(data['sampler'])  # full manual parsing
+  if not sampler.strategies:
+    sampler.strategies.append(StrategyWeightPair(strategy=RandomReleaseConfig(), weight=1))
+  return sampler
+
+def sse_event(event: str, data) -> str:
+  return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
 
 @router.post("/tracks/{genre_id}")
-async def sample_artists(genre_id: int, request: Request, session: SessionData = Depends(get_session)):
-    data = await request.json()
-    sampler = CombinedSamplerConfig.model_validate(data['sampler'])  # full manual parsing
-    if not sampler.strategies:
-        sampler.strategies.append(StrategyWeightPair(strategy=RandomReleaseConfig(), weight=1))
+async def sample_artists(genre_id: int, request: Request, session: SessionData = Depends(get_session), known: Dict[str, str] = Depends(known_sections)):
+    sampler = track_sampler(await request.json())
 
-    session.factory.sample_tracks(genre_id, sampler)
+    await session.factory.sample_tracks(genre_id, sampler)
+    session.bump("factory")
     await store_session(session)
-    return await create_SessionResponse(session)
+    return await create_SessionResponse(session, known)
+
+
+@router.post("/tracks/{genre_id}/stream")
+async def stream_tracks(genre_id: int, request: Request, response: Response,
+                        session: SessionData = Depends(get_session), known: Dict[str, str] = Depends(known_sections)):
+  """
+  Server-sent events while sampling tracks: "artist" progress and "tracks" as
+  each artist resolves, then "done" with the SessionResponse once the final
+  set is stored in the session.
+  """
+  sampler = track_sampler(await request.json())
+
+  async def events() -> AsyncIterator[str]:
+    try:
+      async for event, data in session.factory.stream_tracks(genre_id, sampler):
+        if event != "done":
+          yield sse_event(event, data)
+      session.bump("factory")
+      await store_session(session)
+      yield sse_event("done", await create_SessionResponse(session, known))
+    except Exception as e:
+      logger.exception(f"Streaming tracks failed: {genre_id}")
+      yield sse_event("error", {"detail": str(e)})
+
+  stream = StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+  # a returned Response replaces the injected one, with the session cookie get_session set on it
+  for cookie in response.headers.getlist("set-cookie"):
+    stream.headers.append("set-cookie", cookie)
+  return stream
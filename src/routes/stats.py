@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.core.db import query_counter
+from src.core.LayoutCache import layout_cache
+from src.core.LocalCache import local_cache
+from src.core.SingleFlight import single_flight
+from src.core.RateLimiter import rate_limiter
+from src.core.session_manager import session_latency
+
+router = APIRouter(prefix="/stats", default_response_class=JSONResponse)
+
+
+@router.get("/cache")
+async def get_cache_stats():
+  """Hit/miss counters of this worker's in-process cache, per key family."""
+  return local_cache.stats()
+
+
+@router.get("/singleflight")
+async def get_single_flight_stats():
+  """Spotify fetches performed vs. coalesced into another caller's fetch."""
+  return single_flight.stats()
+
+
+@router.get("/ratelimit")
+async def get_rate_limit_stats():
+  """Spotify calls granted/throttled per priority lane, 429s and retries of this worker."""
+  return rate_limiter.stats()
+
+
+@router.get("/layout")
+async def get_layout_stats():
+  """Graph layout cache hits/misses and LRU evictions of this worker."""
+  return layout_cache.stats()
+
+@router.get("/session")
+async def get_session_stats():
+  """Latency histograms of session loads, stores and creations in this worker."""
+  return {operation: histogram.stats() for operation, histogram in session_latency.items()}
+
+
+@router.get("/db")
+async def get_db_stats():
+  """Database statements sent by this worker since it started."""
+  return query_counter.stats()
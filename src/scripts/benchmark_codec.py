@@ -0,0 +1,73 @@
+import json
+import random
+import string
+import timeit
+
+from src.core.CacheCodec import CODECS, decode, msgpack
+from src.core.SpotifyCache import Album, ImageObject, Track
+
+
+def random_id() -> str:
+  return "".join(random.choices(string.ascii_letters + string.digits, k=22))
+
+
+def make_tracks(n: int, n_artists: int = 3) -> list:
+  artists = [random_id() for _ in range(n_artists)]
+  album_id = random_id()
+  return [
+    Track(
+      id=random_id(),
+      name=f"Track {i}",
+      artist_ids=random.sample(artists, k=random.randint(1, n_artists)),
+      album_id=album_id,
+      duration=random.randint(60000, 400000),
+      popularity=random.randint(0, 100)
+    ) for i in range(n)
+  ]
+
+
+def make_albums(n: int, n_artists: int = 2) -> list:
+  artists = [random_id() for _ in range(n_artists)]
+  return [
+    Album(
+      id=random_id(),
+      name=f"Album {i}",
+      type=random.choice(["album", "single", "ep", "compilation"]),
+      release_date=f"{random.randint(1960, 2024)}-0{random.randint(1, 9)}-1{random.randint(0, 9)}",
+      total_tracks=random.randint(1, 20),
+      artist_ids=artists,
+      images=[ImageObject(url=f"https://i.scdn.co/image/{random_id()}", width=w, height=w) for w in (640, 300, 64)],
+      popularity=None
+    ) for i in range(n)
+  ]
+
+
+def benchmark(label: str, items: list, repeat: int = 200):
+  cls = type(items[0])
+  print(f"\n{label} ({len(items)} items)")
+  print(f"{'codec':<10} {'bytes/key':>10} {'encode µs':>10} {'decode µs':>10}")
+
+  # format and decoder before the codec layer: json.loads + model_validate per item
+  data = json.dumps([item.model_dump() for item in items])
+  decode_time = timeit.timeit(lambda: [cls.model_validate(item) for item in json.loads(data)], number=repeat) / repeat
+  print(f"{'before':<10} {len(data.encode()):>10} {'':>10} {decode_time * 1e6:>10.1f}")
+
+  for name, codec in CODECS.items():
+    if name == "msgpack" and msgpack is None:
+      continue
+    data = codec.encode(items)
+    encode_time = timeit.timeit(lambda: codec.encode(items), number=repeat) / repeat
+    decode_time = timeit.timeit(lambda: decode(cls, data), number=repeat) / repeat
+    print(f"{name:<10} {len(data):>10} {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f}")
+
+
+def main() -> None:
+  random.seed(0)
+  benchmark("album:tracks", make_tracks(12))
+  benchmark("album:tracks (large)", make_tracks(50))
+  benchmark("artist:releases", make_albums(20))
+  benchmark("artist:releases (discography)", make_albums(200), repeat=50)
+
+
+if __name__ == '__main__':
+  main()
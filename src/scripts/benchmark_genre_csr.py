@@ -0,0 +1,113 @@
+import random
+import timeit
+import tracemalloc
+from collections import deque
+
+import networkx as nx
+
+from src.core.GenreCSR import GenreCSR
+from src.core.GenreGraph import GenreGraph
+from src.database.models import RelationshipTypeEnum
+
+SUBGENRE_OF = RelationshipTypeEnum.SUBGENRE_OF.value
+
+
+def retained(build) -> int:
+  """Bytes still allocated after build() returns."""
+  tracemalloc.start()
+  obj = build()
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del obj
+  return size
+
+
+def nx_depths(S: nx.DiGraph, roots: list) -> dict:
+  depths = {}
+  for root in roots:
+    queue = deque([(root, 0)])
+    while queue:
+      node, depth = queue.popleft()
+      if node not in depths:
+        depths[node] = depth
+      for neighbor in S.neighbors(node):
+        if neighbor not in depths:
+          queue.append((neighbor, depth + 1))
+  return depths
+
+
+def nx_prune(graph: nx.DiGraph, expanded: set) -> set:
+  all_descendants = set()
+  for node in set(graph.nodes()) - expanded:
+    stack = [node]
+    while stack:
+      current = stack.pop()
+      if current in all_descendants:
+        continue
+      all_descendants.add(current)
+      stack.extend(graph.successors(current))
+  return all_descendants
+
+
+def csr_prune(graph: GenreCSR, expanded: set) -> set:
+  unexpanded = graph.present.copy()
+  unexpanded[graph.index(expanded)] = False
+  return graph.ids(graph.reachable(graph.node_ids[unexpanded].tolist()))
+
+
+def row(label: str, nx_fn, csr_fn, repeat: int):
+  nx_time = timeit.timeit(nx_fn, number=repeat) / repeat
+  csr_time = timeit.timeit(csr_fn, number=repeat) / repeat
+  print(f"{label:<22} {nx_time * 1e6:>10.1f} {csr_time * 1e6:>10.1f} {nx_time / csr_time:>8.1f}x")
+
+
+def main() -> None:
+  random.seed(0)
+  snapshot = GenreGraph.current()
+  S, C = snapshot.graph(SUBGENRE_OF), snapshot.adjacency(SUBGENRE_OF)
+  nodes = list(S.nodes)
+  roots = list(snapshot.roots)
+  pairs = [random.sample(nodes, 2) for _ in range(100)]
+  expanded = set(random.sample(nodes, 10))
+
+  print(f"{snapshot.G.number_of_nodes()} genres, {snapshot.G.number_of_edges()} relationships")
+  print(f"resident: networkx {retained(lambda: nx.DiGraph(snapshot.G)) / 1024:.0f} kB, "
+        f"csr {retained(lambda: GenreCSR.build(snapshot.G)) / 1024:.0f} kB "
+        f"(arrays {snapshot.adjacency().nbytes / 1024:.0f} kB)\n")
+
+  print(f"{'query':<22} {'nx µs':>10} {'csr µs':>10} {'speedup':>9}")
+  row("successors", lambda: [list(S.successors(n)) for n in expanded], lambda: [C.successors(n) for n in expanded], 200)
+  row("descendants(root)", lambda: [nx.descendants(S, r) for r in roots], lambda: [C.descendants([r]) for r in roots], 20)
+  row("ancestors", lambda: [nx.ancestors(S, a) for a, _ in pairs], lambda: [C.ancestors([a]) for a, _ in pairs], 20)
+  row("descendants(all roots)", lambda: set().union(*(nx.descendants(S, r) for r in roots)), lambda: C.descendants(roots), 20)
+  row("prune_descendants", lambda: nx_prune(S, expanded), lambda: csr_prune(C, expanded), 20)
+  row("depth BFS", lambda: nx_depths(S, roots), lambda: C.depths(roots), 20)
+
+  def nx_paths():
+    for a, b in pairs:
+      try:
+        nx.shortest_path(S, a, b)
+      except nx.NetworkXNoPath:
+        pass
+
+  row("shortest_path x100", nx_paths, lambda: [C.shortest_path(a, b) for a, b in pairs], 5)
+
+  # get_subgenres_between over the starting genres plus a selection, as in generate_subgraph
+  between = roots + random.sample(nodes, 20)
+  R = snapshot.reachability(SUBGENRE_OF)
+
+  def nx_between():
+    found = set()
+    for a in between:
+      for b in between:
+        try:
+          found |= set(nx.shortest_path(S, a, b))
+        except nx.NetworkXNoPath:
+          pass
+    return found
+
+  row(f"subgenres_between {len(between)}²", nx_between, lambda: R.shortest_paths(between, between), 5)
+
+
+if __name__ == '__main__':
+  main()
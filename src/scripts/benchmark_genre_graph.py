@@ -0,0 +1,64 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from threading import Lock
+
+import networkx as nx
+
+from src.core.GenreGraph import GenreGraph, GenreGraphSnapshot
+from src.database.models import RelationshipTypeEnum
+
+SUBGENRE_OF = RelationshipTypeEnum.SUBGENRE_OF.value
+
+
+def read_request(snapshot: GenreGraphSnapshot, lock, sources: list, targets: list) -> int:
+  """The reads of one graph request: a get_genre per node and the shortest paths between them."""
+  nodes = set()
+  for source in sources:
+    for target in targets:
+      # before: every read took the class-wide lock
+      with lock:
+        try:
+          nodes |= set(nx.shortest_path(snapshot.graph(SUBGENRE_OF), source=source, target=target))
+        except Exception:
+          pass
+  for node in nodes:
+    with lock:
+      snapshot.G.nodes[node]
+  return len(nodes)
+
+
+def run(threads: int, lock, workload: list, snapshot: GenreGraphSnapshot) -> float:
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=threads) as pool:
+    list(pool.map(lambda args: read_request(snapshot, lock, *args), workload))
+  return len(workload) / (time.perf_counter() - start)
+
+
+def main() -> None:
+  random.seed(0)
+  snapshot = GenreGraph.current()
+  roots = list(snapshot.roots)
+  nodes = list(snapshot.graph(SUBGENRE_OF).nodes)
+  workload = [(roots, random.sample(nodes, k=3)) for _ in range(500)]
+
+  print(f"{snapshot.G.number_of_nodes()} genres, {len(workload)} requests")
+  print(f"{'threads':>7} {'locked req/s':>13} {'lock-free req/s':>16}")
+  for threads in (1, 2, 4, 8):
+    locked = run(threads, Lock(), workload, snapshot)
+    free = run(threads, nullcontext(), workload, snapshot)
+    print(f"{threads:>7} {locked:>13.0f} {free:>16.0f}")
+
+  # Readers keep working while the graph is rebuilt and swapped in
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=5) as pool:
+    reload = pool.submit(GenreGraph.reload)
+    served = sum(1 for _ in pool.map(lambda args: read_request(GenreGraph.current(), nullcontext(), *args), workload))
+    reload.result()
+  print(f"\nreload: {served} requests served during {time.perf_counter() - start:.2f}s, "
+        f"snapshot swapped: {GenreGraph.current() is not snapshot}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,61 @@
+import random
+import time
+
+import numpy as np
+
+from src.core.GenreGraph import GenreGraph
+from src.core.LayoutEngine import LAYOUT_ENGINES, graph_distances, stress
+
+
+def grow_subgraph(G, size: int, rng: random.Random):
+  """Connected-ish subgraph of about size genres, grown breadth first from random genres."""
+  nodes, frontier = set(), []
+  candidates = list(G.nodes)
+  while len(nodes) < size:
+    if not frontier:
+      frontier = [rng.choice(candidates)]
+    node = frontier.pop(0)
+    if node in nodes:
+      continue
+    nodes.add(node)
+    frontier.extend(n for n in list(G.successors(node)) + list(G.predecessors(node)) if n not in nodes)
+  return G.subgraph(nodes)
+
+
+def measure(engine, graph, D, **kwargs):
+  start = time.perf_counter()
+  try:
+    layout = engine.layout(graph, **kwargs)
+  except (ImportError, OSError) as e:
+    return None, None
+  elapsed = time.perf_counter() - start
+  positions = np.array([layout[node] for node in graph.nodes])
+  return elapsed, stress(positions, D)
+
+
+def main() -> None:
+  rng = random.Random(0)
+  G = GenreGraph.current().G
+  sizes = [size for size in (50, 100, 250, 500, 1000) if size <= G.number_of_nodes()]
+
+  print(f"{'nodes':>6} {'engine':<8} {'cold ms':>9} {'stress':>8} {'warm ms':>9} {'stress':>8} {'moved':>7}")
+  for size in sizes:
+    graph = grow_subgraph(G, size, rng)
+    D = graph_distances(graph)
+    # warm start: the layout of the graph before ~5% of its genres were added
+    previous = graph.subgraph(list(graph.nodes)[:int(size * 0.95)])
+
+    for name, engine in LAYOUT_ENGINES.items():
+      cold, cold_stress = measure(engine, graph, D)
+      if cold is None:
+        print(f"{size:>6} {name:<8} {'n/a':>9}")
+        continue
+      seed = engine.layout(previous)
+      warm, warm_stress = measure(engine, graph, D, seed=seed)
+      layout = engine.layout(graph, seed=seed)
+      moved = np.median([np.hypot(layout[n][0] - seed[n][0], layout[n][1] - seed[n][1]) for n in seed])
+      print(f"{size:>6} {name:<8} {cold * 1e3:>9.1f} {cold_stress:>8.4f} {warm * 1e3:>9.1f} {warm_stress:>8.4f} {moved:>7.1f}")
+
+
+if __name__ == '__main__':
+  main()
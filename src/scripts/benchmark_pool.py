@@ -0,0 +1,33 @@
+import timeit
+
+from src.core.db import query_counter
+from src.core.GenreGraph import GenreGraph
+from src.models.ArtistHandler import ArtistHandler
+
+
+def benchmark(label: str, genre_ids: list, repeat: int = 100):
+  handler = ArtistHandler()
+  handler.get_pools(genre_ids) # warm the cache, builds missing pools
+
+  queries = query_counter.total()
+  single = timeit.timeit(lambda: handler.get_pool(genre_ids[0]), number=repeat) / repeat
+  batch = timeit.timeit(lambda: handler.get_pools(genre_ids), number=repeat) / repeat
+  warm_queries = query_counter.total() - queries
+
+  artists = sum(len(pool.artists) for pool in handler.get_pools(genre_ids).values())
+  print(f"\n{label} ({artists} artists)")
+  print(f"{'get_pool µs':>12} {'get_pools µs':>13} {'DB queries':>11}")
+  print(f"{single * 1e6:>12.1f} {batch * 1e6:>13.1f} {warm_queries:>11}")
+
+
+def main() -> None:
+  genre_ids = [
+    genre_id for genre_id, genre in GenreGraph().snapshot.G.nodes(data=True)
+    if genre["is_spotify_genre"]
+  ]
+  benchmark("1 genre", genre_ids[:1])
+  benchmark("20 genres", genre_ids[:20])
+
+
+if __name__ == '__main__':
+  main()
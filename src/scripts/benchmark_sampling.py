@@ -0,0 +1,75 @@
+import random
+import timeit
+
+from src.models.ArtistHandler import Artist, ArtistHandler, ArtistPool
+from src.models.ObjectSampling import AttributeFilter, AttributeWeightedSampling, CombinedFilter, SamplingConfig, WeightedCombinedSampler
+from src.scripts.benchmark_codec import random_id
+
+
+def make_pool(genre_id: int, n_artists: int) -> ArtistPool:
+  return ArtistPool(
+    genre_id=genre_id, name=f"Genre {genre_id}", bouncyness=random.random(), organicness=random.random(),
+    artists=[
+      Artist(
+        id=genre_id * 100000 + i, spotify_id=random_id(), name=f"Artist {i}",
+        bouncyness=random.random(), organicness=random.random(), popularity=random.randint(0, 100)
+      ) for i in range(n_artists)
+    ]
+  )
+
+
+SAMPLER = WeightedCombinedSampler(
+  samplers=[
+    AttributeWeightedSampling(attr="popularity", higher_is_better=True, mode="rank"),
+    AttributeWeightedSampling(attr="bouncyness", higher_is_better=False, mode="softmax", alpha=2.0),
+    AttributeWeightedSampling(attr="organicness", higher_is_better=True, mode="log"),
+  ],
+  weights=[2, 1, 1],
+  n_samples=20
+)
+FILTER = CombinedFilter(filters=[
+  AttributeFilter(attr="popularity", min=10),
+  AttributeFilter(attr="bouncyness", max=0.9),
+])
+CONFIG = SamplingConfig(filters=FILTER.filters, sampler=SAMPLER)
+
+
+def benchmark(label: str, pools: list, repeat: int = 20):
+  print(f"\n{label}")
+  print(f"{'pool':<9} {'filter+sample µs':>17}")
+
+  # list of pydantic artists, columns built per call
+  def from_lists():
+    for pool in pools:
+      SAMPLER.apply(FILTER(pool.artists))
+
+  # columns cached per pool version
+  def from_columns():
+    for pool in pools:
+      columns = pool.columns()
+      SAMPLER.sample_rows(columns, FILTER.mask(columns))
+
+  # alias tables cached per pool version and config
+  def from_alias_tables():
+    for pool in pools:
+      pool.sample(CONFIG)
+
+  # all pools filtered and weighted in one pass
+  def batch():
+    ArtistHandler.sample_pools({pool.genre_id: pool for pool in pools}, CONFIG)
+
+  from_alias_tables()
+  for name, run in (("list", from_lists), ("columns", from_columns), ("alias", from_alias_tables), ("batch", batch)):
+    seconds = timeit.timeit(run, number=repeat) / repeat
+    print(f"{name:<9} {seconds * 1e6:>17.1f}")
+
+
+def main() -> None:
+  random.seed(0)
+  benchmark("1 genre x 500 artists", [make_pool(0, 500)])
+  benchmark("20 genres x 500 artists", [make_pool(i, 500) for i in range(20)])
+  benchmark("20 genres x 3000 artists", [make_pool(i, 3000) for i in range(20)])
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import random
+import timeit
+
+from src.config import CacheConfig
+from src.core.SpotifyCache import AsyncSpotifyCache
+from src.core.session_manager import PARTS, SessionData, decode_fields, encode_fields
+from src.models.PlaylistEditor import PlaylistEditor
+from src.models.PlaylistFactory import SampledArtists, SampledTracks, UserGenre
+from src.scripts.benchmark_codec import make_tracks
+
+
+def make_session(n_genres: int, tracks_per_genre: int) -> SessionData:
+  """A heavy user: every genre sampled, all sampled tracks in the playlist."""
+  session = SessionData(id="benchmark")
+  for genre_id in range(n_genres):
+    tracks = make_tracks(tracks_per_genre, n_artists=10)
+    session.factory.genres[genre_id] = UserGenre(
+      id=genre_id, name=f"Genre {genre_id}", selected=True,
+      artists=SampledArtists(sampled=set(random.sample(range(10000), 50))),
+      tracks=SampledTracks(sampled=set(tracks))
+    )
+  session.factory.playlist = PlaylistEditor(id="playlist", name="Benchmark", tracks=list(session.factory.sampled_tracks()))
+  return session
+
+
+def benchmark(label: str, session: SessionData, repeat: int = 50):
+  print(f"\n{label}")
+  print(f"{'format':<8} {'bytes':>9} {'encode µs':>10} {'decode µs':>10}")
+
+  data = session.model_dump_json()
+  encode_time = timeit.timeit(session.model_dump_json, number=repeat) / repeat
+  decode_time = timeit.timeit(lambda: SessionData(**json.loads(data)), number=repeat) / repeat
+  print(f"{'before':<8} {len(data.encode()):>9} {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f}")
+
+  # hash fields; tracks are written once, later loads resolve them from the in-process cache
+  fields, tracks = encode_fields(session)
+  loop = asyncio.new_event_loop()
+  loop.run_until_complete(AsyncSpotifyCache().store_tracks(tracks, CacheConfig.session_tracks))
+  encode_time = timeit.timeit(lambda: encode_fields(session), number=repeat) / repeat
+  decode_time = timeit.timeit(lambda: loop.run_until_complete(decode_fields(session.id, fields, PARTS)), number=repeat) / repeat
+  size = sum(len(data) for data in fields.values())
+  print(f"{'compact':<8} {size:>9} {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f}")
+
+  # a request that changes one genre writes only that field
+  genre_id, genre = next(iter(session.factory.genres.items()))
+  genre.selected = not genre.selected
+  changed, _ = encode_fields(session)
+  written = sum(len(data) for field, data in changed.items() if fields.get(field) != data)
+  genre.selected = not genre.selected
+  print(f"{'one genre changed':<18} {written:>9} bytes written")
+  loop.close()
+
+
+def main() -> None:
+  random.seed(0)
+  benchmark("light: 3 genres x 10 tracks", make_session(3, 10))
+  benchmark("heavy: 20 genres x 50 tracks", make_session(20, 50))
+
+
+if __name__ == '__main__':
+  main()
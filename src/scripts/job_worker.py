@@ -0,0 +1,27 @@
+import asyncio
+import logging
+import multiprocessing
+
+from src.config import JobConfig
+
+
+def run_worker() -> None:
+  # imported per process so each one opens its own Redis and DB connections
+  from src.core.JobWorker import JobWorker
+  logging.basicConfig(level=logging.INFO)
+  asyncio.run(JobWorker().run())
+
+
+def main() -> None:
+  processes = [multiprocessing.Process(target=run_worker, name=f"job-worker-{i}") for i in range(JobConfig.workers)]
+  for process in processes:
+    process.start()
+  try:
+    for process in processes:
+      process.join()
+  except KeyboardInterrupt:
+    for process in processes:
+      process.terminate()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,37 @@
+import time
+import logging
+
+from src.config import CacheConfig, PoolConfig
+from src.core.PoolRefresher import pool_refresher
+from src.models.ArtistHandler import ArtistHandler
+
+logger = logging.getLogger("PoolRefresher")
+
+
+def refresh(handler: ArtistHandler) -> int:
+  """One pass: rebuilds the pools that are due, refreshing artists that go stale within the margin."""
+  stale_days = max(CacheConfig.scrape_time_delta_days - PoolConfig.stale_margin_days, 0)
+  due = pool_refresher.due()
+  for genre_id in due:
+    pool_refresher.heartbeat()
+    try:
+      handler.build_pool(genre_id, stale_days=stale_days)
+    except Exception:
+      logger.exception(f"Refreshing pool {genre_id} failed")
+  return len(due)
+
+
+def main() -> None:
+  logging.basicConfig(level=logging.INFO)
+  handler = ArtistHandler(priority="background")
+  while True:
+    pool_refresher.heartbeat()
+    started = time.monotonic()
+    refreshed = refresh(handler)
+    if refreshed:
+      logger.info(f"Refreshed {refreshed} pools in {time.monotonic() - started:.1f}s")
+    time.sleep(PoolConfig.interval)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,33 @@
+import networkx as nx
+
+from src.core.GenreCSR import GenreCSR
+from src.core.GenreReachability import GenreReachability
+from src.database.models import RelationshipTypeEnum
+
+SUBGENRE_OF = RelationshipTypeEnum.SUBGENRE_OF.value
+INFLUENCED_BY = RelationshipTypeEnum.INFLUENCED_BY.value
+
+
+def reachability() -> GenreReachability:
+  G = nx.DiGraph()
+  # 1 -> 2 -> 3 -> 4 and a detour 1 -> 5 -> 6 -> 4
+  for u, v in [(1, 2), (2, 3), (3, 4), (1, 5), (5, 6), (6, 4)]:
+    G.add_edge(u, v, type=SUBGENRE_OF)
+  # influence cycle through 2 and 7, and a shortcut 1 -> 4
+  for u, v in [(2, 7), (7, 2), (1, 4)]:
+    G.add_edge(u, v, type=INFLUENCED_BY)
+  return GenreReachability.build(GenreCSR.build(G), SUBGENRE_OF)
+
+
+def test_shortest_paths_follow_one_edge_type():
+  R = reachability()
+  assert R.shortest_paths([1], [4]) in ({1, 2, 3, 4}, {1, 5, 6, 4})
+  assert R.shortest_paths([1], [3, 6]) == {1, 2, 3, 5, 6}
+  assert R.shortest_paths([4], [1]) == set()
+
+
+def test_closure_ignores_other_edge_types():
+  R = reachability()
+  assert R.between([1], [4]) == {1, 2, 3, 4, 5, 6}
+  assert not R.reaches(2, 7)
+  assert not R.reaches(7, 2)
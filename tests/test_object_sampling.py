@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.models.ObjectSampling import (
+  AttributeFilter, AttributeWeightedSampling, ItemColumns, SamplingConfig, Segments, WeightedCombinedSampler
+)
+
+
+def popularity_columns(popularities) -> ItemColumns:
+  return ItemColumns([SimpleNamespace(popularity=p) for p in popularities])
+
+
+def log_sampler(n_samples: int) -> WeightedCombinedSampler:
+  return WeightedCombinedSampler(
+    samplers=[AttributeWeightedSampling(attr="popularity", higher_is_better=True, mode="log")],
+    n_samples=n_samples
+  )
+
+
+def test_segments_skip_rows_without_weight():
+  # popularity 0 and 1 have no log weight, leaving four eligible rows
+  columns = popularity_columns([0, 0, 0, 1, 10, 50, 90, 99])
+  sampler = log_sampler(3)
+  segments = Segments(np.zeros(len(columns), dtype=np.int64), 1)
+
+  runs = 2000
+  batch, single = np.zeros(len(columns)), np.zeros(len(columns))
+  for seed in range(runs):
+    [rows] = sampler.sample_segments(columns, segments, seed=seed)
+    assert len(rows) == 3
+    batch[rows] += 1
+    single[sampler.sample_rows(columns, seed=seed)] += 1
+
+  assert not batch[:4].any()
+  assert np.abs(batch - single).max() / runs < 0.05
+
+
+def test_empty_samples_when_filters_remove_every_row():
+  columns = popularity_columns([5, 10, 20])
+  sampler = log_sampler(3)
+  config = SamplingConfig(filters=[AttributeFilter(attr="popularity", min=50)], sampler=sampler)
+  rng = np.random.default_rng(0)
+
+  assert len(config.alias_table(columns).sample(rng, 3)) == 0
+  assert len(sampler.sample_rows(columns, np.zeros(len(columns), dtype=bool))) == 0
+  assert len(sampler.sample_rows(popularity_columns([]))) == 0
+  assert len(config.alias_table(popularity_columns([5, 10, 20])).sample(rng, 0)) == 0
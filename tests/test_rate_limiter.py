@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from spotipy import SpotifyException
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.config import SpotifyConfig
+from src.core import RateLimiter
+from src.core.RateLimiter import SpotifyRateLimiter
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+  server = fakeredis.FakeServer()
+  monkeypatch.setattr(RateLimiter, "redis_sync", fakeredis.FakeRedis(server=server))
+  monkeypatch.setattr(RateLimiter, "redis_client", fakeredis.FakeAsyncRedis(server=server))
+  return SpotifyRateLimiter()
+
+
+def rate_limited(retry_after: float):
+  def call():
+    raise SpotifyException(429, -1, "rate limited", headers={"Retry-After": str(retry_after)})
+  return call
+
+
+def test_long_ban_blocks_all_workers_without_retry(limiter):
+  ban = SpotifyConfig.max_retry_wait + 60
+  with pytest.raises(SpotifyException):
+    limiter.call(rate_limited(ban))
+  assert RateLimiter.redis_sync.pttl(limiter.block_key) > SpotifyConfig.max_retry_wait * 1000
+  assert limiter.stats()["failed"] == 1
+
+
+def test_async_long_ban_blocks_all_workers_without_retry(limiter):
+  async def call():
+    rate_limited(SpotifyConfig.max_retry_wait + 60)()
+
+  with pytest.raises(SpotifyException):
+    asyncio.run(limiter.acall(call))
+  assert RateLimiter.redis_sync.pttl(limiter.block_key) > SpotifyConfig.max_retry_wait * 1000
+
+
+def test_shorter_ban_keeps_longer_block(limiter):
+  limiter._block_all(600)
+  limiter._block_all(5)
+  assert RateLimiter.redis_sync.pttl(limiter.block_key) > 5000
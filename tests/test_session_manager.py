@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.config import CacheConfig
+from src.core import SpotifyCache, session_manager
+from src.core.LocalCache import local_cache
+from src.core.session_manager import create_session_once, get_session_from_id, store_session
+from src.core.SpotifyCache import AsyncSpotifyCache, Track
+from src.models.PlaylistFactory import SampledTracks, UserGenre
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+  client = fakeredis.FakeAsyncRedis(decode_responses=False)
+  monkeypatch.setattr(session_manager, "redis_client_raw", client)
+  monkeypatch.setattr(SpotifyCache, "redis_client_raw", client)
+  return client
+
+
+def add_genre(session, genre_id: int):
+  session.factory.genres[genre_id] = UserGenre(id=genre_id, name=f"genre {genre_id}")
+
+
+def test_genre_can_be_added_again_after_removal(redis):
+  async def run():
+    session = await create_session_once("session")
+    add_genre(session, 2)
+    await store_session(session)
+
+    session = await get_session_from_id("session")
+    session.factory.remove_genre(2)
+    await store_session(session)
+    assert not await redis.hexists("session", "v:genre:2")
+
+    session = await get_session_from_id("session")
+    add_genre(session, 2)
+    await store_session(session)
+
+    assert list((await get_session_from_id("session")).factory.genres) == [2]
+
+  asyncio.run(run())
+
+
+def test_cached_tracks_live_as_long_as_the_session(redis):
+  async def run():
+    track = Track(id="t1", name="track", artist_ids=["a1"], album_id="al1", duration=1000, popularity=1)
+    # fetched by get_tracks: in Redis with the short TTL, and in this worker's cache
+    await AsyncSpotifyCache().store_tracks([track], CacheConfig.single_object)
+
+    session = await create_session_once("session")
+    add_genre(session, 2)
+    session.factory.genres[2].tracks = SampledTracks(sampled={track})
+    await store_session(session)
+    assert await redis.ttl("track:t1") > CacheConfig.single_object
+
+    # evicted from Redis while still cached here: written again
+    await redis.delete("track:t1")
+    session = await get_session_from_id("session")
+    session.factory.genres[2].expanded = True
+    await store_session(session)
+    assert await redis.ttl("track:t1") > CacheConfig.single_object
+
+    local_cache.clear()
+    assert [t.id for t in (await get_session_from_id("session")).factory.genres[2].tracks.sampled] == ["t1"]
+
+  asyncio.run(run())
@@ -0,0 +1,51 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.config import SpotifyConfig
+from src.core import SingleFlight, SpotifyCache
+from src.core.LocalCache import local_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+  server = fakeredis.FakeServer()
+  monkeypatch.setattr(SingleFlight, "redis_sync", fakeredis.FakeRedis(server=server, decode_responses=True))
+  monkeypatch.setattr(SpotifyCache, "redis_sync_raw", fakeredis.FakeRedis(server=server))
+  monkeypatch.setattr(SpotifyCache, "sync_single_flight", SingleFlight.SingleFlight(
+    lock_ttl_ms=SingleFlight.LOCK_TTL_MS, poll_interval_ms=10
+  ))
+  monkeypatch.setattr(SpotifyCache.SpotifyCache, "_call", lambda self, fn, *args, **kwargs: fn(*args, **kwargs))
+  for key in ("artist:a1", "artist:a2"):
+    local_cache.delete(key)
+  return SpotifyCache.SpotifyCache()
+
+
+def test_lock_outlives_rate_limit_backoff():
+  assert SingleFlight.LOCK_TTL_MS > SpotifyConfig.max_retry_wait * 1000
+
+
+def test_concurrent_sync_misses_fetch_once(cache):
+  calls = []
+  started = threading.Event()
+
+  def artists(ids):
+    calls.append(ids)
+    started.set()
+    time.sleep(0.2)
+    return {"artists": [{"id": aid, "name": aid, "images": [], "genres": [], "popularity": 1} for aid in ids]}
+
+  cache.spotify = type("Spotify", (), {"artists": staticmethod(artists)})
+
+  with ThreadPoolExecutor(4) as pool:
+    first = pool.submit(cache.get_artists, ["a1", "a2"])
+    started.wait()
+    others = [pool.submit(cache.get_artists, ["a2", "a1"]) for _ in range(3)]
+    results = [first.result()] + [future.result() for future in others]
+
+  assert calls == [["a1", "a2"]]
+  assert all(sorted(a.id for a in artists) == ["a1", "a2"] for artists in results)